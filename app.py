@@ -3,16 +3,19 @@
 Flask web interface for Archaeological Site Extraction with GEE Integration
 """
 
-from flask import Flask, render_template
+from flask import Flask, render_template, request, g
 import sys
 import os
 import logging
+import time
 
 from config import Config
-from services.gee_service import initialize_gee
+from services.gee_service import gee_ready
 from routes.extraction_routes import extraction_bp
 from routes.gee_routes import gee_bp
 from routes.analysis_routes import analysis_bp
+from routes.status_routes import status_bp
+from utils.metrics import REQUEST_SECONDS, reset_metrics_directory
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -25,9 +28,22 @@ log.setLevel(logging.ERROR)
 app.register_blueprint(extraction_bp)
 app.register_blueprint(gee_bp)
 app.register_blueprint(analysis_bp)
+app.register_blueprint(status_bp)
 
-# Initialize GEE on startup
-GEE_INITIALIZED = initialize_gee()
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Endpoint names keep label cardinality bounded (unknown paths -> '')
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - g.request_start,
+        endpoint=request.endpoint or '',
+        method=request.method,
+        status=response.status_code
+    )
+    return response
 
 @app.route('/')
 def index():
@@ -39,7 +55,9 @@ if __name__ == '__main__':
         print("Create a .env file with: GEMINI_API_KEY=your-key-here")
         sys.exit(1)
     
-    if not GEE_INITIALIZED:
+    reset_metrics_directory()
+    
+    if not gee_ready():
         print("\nWARNING: Google Earth Engine not initialized!")
         print("GEE download features will not work.")
         print("Please configure gee_service_account.json")
@@ -0,0 +1,101 @@
+"""
+Count Earth Engine round trips made by extract_gee_data.
+
+Runs the per-band and batched extraction paths against the fake ``ee``
+module with a simulated per-request latency, then compares the JSON bytes
+transferred by the 'full' (download) and 'preview' band profiles. Finally
+checks that every channel comes back on the exact output grid, including
+coarse, odd-sized and tiled cells, with no local resampling.
+
+    python -m benchmarks.bench_gee_roundtrips --latency 0.25
+"""
+
+import argparse
+import time
+
+from benchmarks import fake_ee
+
+fake_ee.install()
+
+from config import Config
+from services import gee_service
+
+def run(batch_requests, latency, repeat, profile='full'):
+    Config.GEE_CONFIG['batch_requests'] = batch_requests
+    fake_ee.counter.reset(latency=latency)
+    
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = gee_service.extract_gee_data(
+            -9.960822, -67.497608, 'benchmark', profile=profile
+        )
+    elapsed = (time.perf_counter() - start) / repeat
+    
+    return {
+        'round_trips': fake_ee.counter.calls // repeat,
+        'bytes': fake_ee.counter.bytes // repeat,
+        'seconds_per_site': elapsed,
+        'channels': sorted(data['channels']),
+        'shape': data['channels']['B4'].shape,
+    }
+
+# (cell_size_km, pixels_per_km): native, coarse (30 m DEM > pixel), odd, tiled
+SHAPE_CASES = [(1.0, 100), (1.0, 10), (2.5, 37), (0.35, 3), (6.0, 100)]
+
+def check_shapes():
+    """Assert server-side reprojection yields grid_shape for every channel"""
+    fake_ee.counter.reset(latency=0)
+    results = []
+    
+    for cell_size_km, pixels_per_km in SHAPE_CASES:
+        expected = gee_service.grid_shape(cell_size_km, pixels_per_km)
+        data = gee_service.extract_gee_data(
+            -9.960822, -67.497608, 'benchmark', cell_size_km, pixels_per_km
+        )
+        for name, array in data['channels'].items():
+            assert array.shape == expected, (name, array.shape, expected)
+        
+        bounds = gee_service.grid_bounds(-9.960822, -67.497608, cell_size_km)
+        tiles = len(gee_service.plan_tiles(bounds, expected))
+        results.append((cell_size_km, pixels_per_km, expected, tiles))
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help='Simulated seconds per getInfo round trip')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    original = Config.GEE_CONFIG['batch_requests']
+    try:
+        per_band = run(False, args.latency, args.repeat)
+        batched = run(True, args.latency, args.repeat)
+        preview = run(True, args.latency, args.repeat, profile='preview')
+    finally:
+        Config.GEE_CONFIG['batch_requests'] = original
+    
+    assert per_band['channels'] == batched['channels']
+    
+    for label, result in (('per-band', per_band), ('batched', batched)):
+        print(f"{label:>9}: {result['round_trips']} round trips, "
+              f"{result['seconds_per_site'] * 1000:.1f} ms/site, "
+              f"shape {result['shape']}")
+    
+    overview = {'B2', 'B3', 'B4', 'NDVI', 'NDWI', 'BSI', 'DEM', 'Slope'}
+    assert overview <= set(preview['channels'])
+    
+    print()
+    for label, result in (('full', batched), ('preview', preview)):
+        print(f"{label:>9}: {result['bytes'] / 1024:.0f} KiB JSON, "
+              f"{len(result['channels'])} channels, "
+              f"{result['seconds_per_site'] * 1000:.1f} ms/site")
+    
+    print()
+    for cell_size_km, pixels_per_km, shape, tiles in check_shapes():
+        print(f"{cell_size_km:>5g} km @ {pixels_per_km:>3} px/km: {shape} "
+              f"in {tiles} tile{'s' if tiles > 1 else ''}, no resampling")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Compare the spectral index engine with the original per-index functions.
+
+Computes NDVI, NDWI and BSI on synthetic Sentinel-2 bands with the removed
+calculate_ndvi/ndwi/bsi helpers and with utils.spectral_indices, checks the
+results match, and reports the best time and peak extra memory of each.
+
+    python -m benchmarks.bench_indices --sizes 100 1000 5000 --repeat 3
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from utils.spectral_indices import SPECTRAL_INDICES, compute_indices
+
+def legacy_ndvi(b8, b4):
+    numerator = b8 - b4
+    denominator = b8 + b4
+    ndvi = np.divide(numerator, denominator,
+                    out=np.zeros_like(numerator),
+                    where=denominator!=0)
+    return ndvi.astype(np.float32)
+
+def legacy_ndwi(b3, b8):
+    numerator = b3 - b8
+    denominator = b3 + b8
+    ndwi = np.divide(numerator, denominator,
+                    out=np.zeros_like(numerator),
+                    where=denominator!=0)
+    return ndwi.astype(np.float32)
+
+def legacy_bsi(b11, b4, b8, b2):
+    numerator = (b11 + b4) - (b8 + b2)
+    denominator = (b11 + b4) + (b8 + b2)
+    bsi = np.divide(numerator, denominator,
+                   out=np.zeros_like(numerator),
+                   where=denominator!=0)
+    return bsi.astype(np.float32)
+
+def legacy_indices(bands):
+    return {
+        'NDVI': legacy_ndvi(bands['B8'], bands['B4']),
+        'NDWI': legacy_ndwi(bands['B3'], bands['B8']),
+        'BSI': legacy_bsi(bands['B11'], bands['B4'], bands['B8'], bands['B2'])
+    }
+
+def synthetic_bands(size, seed=0):
+    """Sentinel-2 like reflectance values (scaled by 10000), with a few zeros"""
+    rng = np.random.default_rng(seed)
+    bands = {
+        band: rng.integers(0, 4000, (size, size)).astype(np.float32)
+        for band in ('B2', 'B3', 'B4', 'B8', 'B11', 'B12')
+    }
+    bands['B4'][0, :4] = 0
+    bands['B8'][0, :4] = 0
+    return bands
+
+def measure(func, repeat):
+    """Best wall time and peak traced allocation over repeat runs"""
+    best = float('inf')
+    peak = 0
+
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return best, peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        bands = synthetic_bands(size)
+        output_bytes = 3 * size * size * 4
+
+        legacy_time, legacy_peak, expected = measure(lambda: legacy_indices(bands), args.repeat)
+        engine_time, engine_peak, actual = measure(
+            lambda: compute_indices(bands, ['NDVI', 'NDWI', 'BSI']), args.repeat
+        )
+        all_time, all_peak, _ = measure(
+            lambda: compute_indices(bands, list(SPECTRAL_INDICES)), args.repeat
+        )
+
+        for name, array in expected.items():
+            assert actual[name].dtype == np.float32
+            assert np.allclose(actual[name], array, atol=1e-6), name
+
+        print(f"\n{size}x{size} pixels (NDVI, NDWI, BSI; outputs {output_bytes / 2**20:.1f} MiB)")
+        print(f"  legacy: {legacy_time * 1000:9.2f} ms  peak {legacy_peak / 2**20:8.1f} MiB")
+        print(f"  engine: {engine_time * 1000:9.2f} ms  peak {engine_peak / 2**20:8.1f} MiB  "
+              f"speedup {legacy_time / engine_time:.1f}x")
+        print(f"  all {len(SPECTRAL_INDICES)} registered: {all_time * 1000:9.2f} ms  "
+              f"peak {all_peak / 2**20:8.1f} MiB")
+
+if __name__ == '__main__':
+    main()
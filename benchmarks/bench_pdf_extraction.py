@@ -0,0 +1,135 @@
+"""
+Compare PDF text extraction strategies.
+
+Runs the original serial ``text +=`` loop, the in-process page generator,
+the process-pool mode and a warm page-cache pass on the bundled geoglyph
+paper and on a synthetic multi-page document.
+
+    python -m benchmarks.bench_pdf_extraction --pages 500
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from config import Config
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+LOREM = (
+    "The geoglyphs of Acre are ditched enclosures built between 2000 and 650 "
+    "years ago in what is now eastern Amazonia. Site {page} lies near 9 57 38 S "
+    "67 29 51 W and was mapped after deforestation exposed its earthworks. "
+)
+
+def write_synthetic_pdf(path, pages, lines_per_page=40):
+    """Write a minimal text-only PDF with the given number of pages"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    
+    for page in range(pages):
+        lines = [
+            f"BT /F1 9 Tf 40 {780 - 18 * i} Td ({LOREM.format(page=page)[:110]}) Tj ET"
+            for i in range(lines_per_page)
+        ]
+        stream = "\n".join(lines).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), pages
+    )
+    
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref
+    )
+    
+    Path(path).write_bytes(bytes(output))
+
+def legacy_extract(pdf_path):
+    """The original implementation, kept here as the baseline"""
+    import pypdf
+    
+    text = ""
+    with open(pdf_path, 'rb') as file:
+        reader = pypdf.PdfReader(file)
+        for i, page in enumerate(reader.pages):
+            page_text = page.extract_text() or ""
+            text += f"\n--- Page {i+1} ---\n"
+            text += page_text
+    return text
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def bench(label, pdf_path, cache_dir):
+    from utils import pdf_processor
+    
+    settings = Config.PDF_CONFIG
+    original = dict(settings)
+    results = {}
+    
+    try:
+        results['legacy'], baseline = timed(lambda: legacy_extract(pdf_path))
+        
+        settings.update(page_cache_path='', parallel_min_pages=10 ** 9)
+        results['generator'], text = timed(lambda: pdf_processor.extract_text_from_pdf(pdf_path))
+        assert text == baseline
+        
+        settings.update(parallel_min_pages=1)
+        pdf_processor.extract_text_from_pdf(pdf_path)  # warm up the process pool
+        results['process_pool'], text = timed(lambda: pdf_processor.extract_text_from_pdf(pdf_path))
+        assert text == baseline
+        
+        settings.update(page_cache_path=os.path.join(cache_dir, 'pages.sqlite3'))
+        pdf_processor._page_cache = None
+        pdf_processor.extract_text_from_pdf(pdf_path)
+        results['page_cache_hit'], text = timed(lambda: pdf_processor.extract_text_from_pdf(pdf_path))
+        assert text == baseline
+    finally:
+        settings.clear()
+        settings.update(original)
+        pdf_processor._page_cache = None
+    
+    print(f"\n{label}")
+    for name, seconds in results.items():
+        print(f"  {name:>15}: {seconds * 1000:9.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500,
+                        help='Page count of the synthetic document')
+    args = parser.parse_args()
+    
+    print(f"process pool workers: {Config.PDF_CONFIG['workers']}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for pdf_path in glob.glob(str(REPO_ROOT / '*geoglyph*.pdf')):
+            bench(Path(pdf_path).name, pdf_path, os.path.join(tmp, 'bundled'))
+        
+        synthetic = os.path.join(tmp, 'synthetic.pdf')
+        write_synthetic_pdf(synthetic, args.pages)
+        bench(f"synthetic ({args.pages} pages)", synthetic, os.path.join(tmp, 'synthetic'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare the pyplot and Pillow overview renderers.
+
+Renders the same synthetic channel stack with both paths, then measures a
+render-cache hit. Pass --output-dir to keep the PNGs for a visual check.
+
+    python -m benchmarks.bench_render --sizes 100 500 --repeat 5
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from config import Config
+from services import visualization_service
+
+def synthetic_channels(size, seed=0):
+    """Smooth, plausible-looking channel stack of size x size pixels"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    terrain = np.sin(6 * x) * np.cos(4 * y)
+    
+    def band(base, amplitude):
+        noise = rng.normal(0, amplitude * 0.1, (size, size))
+        return (base + amplitude * terrain + noise).astype(np.float32)
+    
+    channels = {
+        'B2': band(600, 150), 'B3': band(800, 200), 'B4': band(700, 250),
+        'B8': band(2500, 600), 'B11': band(1800, 300), 'B12': band(1100, 200),
+        'DEM': band(220, 40), 'Slope': np.abs(band(5, 8)),
+    }
+    b2, b3, b4, b8, b11 = (channels[b] for b in ('B2', 'B3', 'B4', 'B8', 'B11'))
+    channels['NDVI'] = (b8 - b4) / (b8 + b4)
+    channels['NDWI'] = (b3 - b8) / (b3 + b8)
+    channels['BSI'] = ((b11 + b4) - (b8 + b2)) / ((b11 + b4) + (b8 + b2))
+    return channels
+
+def time_render(renderer, channels, repeat, use_cache):
+    Config.RENDER_CONFIG['renderer'] = renderer
+    timings = []
+    
+    for i in range(repeat):
+        if not use_cache:
+            visualization_service._render_cache.clear()
+        start = time.perf_counter()
+        png = visualization_service.render_overview_png(channels, 'benchmark')
+        timings.append(time.perf_counter() - start)
+    
+    return min(timings), png
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output-dir')
+    args = parser.parse_args()
+    
+    original = Config.RENDER_CONFIG['renderer']
+    try:
+        for size in args.sizes:
+            channels = synthetic_channels(size)
+            
+            slow, slow_png = time_render('matplotlib', channels, args.repeat, False)
+            fast, fast_png = time_render('fast', channels, args.repeat, False)
+            cached, _ = time_render('fast', channels, args.repeat, True)
+            
+            print(f"\n{size}x{size} channels")
+            print(f"  matplotlib: {slow * 1000:8.1f} ms  ({len(slow_png) // 1024} KiB)")
+            print(f"        fast: {fast * 1000:8.1f} ms  ({len(fast_png) // 1024} KiB)  "
+                  f"{slow / fast:.1f}x faster")
+            print(f"   cache hit: {cached * 1000:8.3f} ms")
+            
+            if args.output_dir:
+                os.makedirs(args.output_dir, exist_ok=True)
+                for label, png in (('matplotlib', slow_png), ('fast', fast_png)):
+                    path = os.path.join(args.output_dir, f"overview_{size}_{label}.png")
+                    with open(path, 'wb') as f:
+                        f.write(png)
+    finally:
+        Config.RENDER_CONFIG['renderer'] = original
+
+if __name__ == '__main__':
+    main()
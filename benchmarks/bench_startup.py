@@ -0,0 +1,89 @@
+"""
+Measure cold start: import time of app.py and time to first response.
+
+Each run is a fresh interpreter that imports the app, serves ``GET /``
+through the Flask test client, and then touches each deferred dependency
+once to show the cost that moved from startup to first use.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ['ee', 'google.genai', 'matplotlib', 'matplotlib.pyplot', 'scipy', 'pypdf']
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+
+import app
+imported = time.perf_counter()
+
+client = app.app.test_client()
+status = client.get('/').status_code
+responded = time.perf_counter()
+
+loaded = [name for name in {heavy!r} if name in sys.modules]
+
+# Already imported by the app; touching an attribute loads the real module
+from services import gee_service, llm_service, visualization_service
+
+deferred = {{}}
+for label, touch in (
+    ('ee', lambda: gee_service.ee.Image),
+    ('google.genai', lambda: llm_service.types.Part),
+    ('matplotlib', lambda: visualization_service.colormap_lut('terrain')),
+):
+    began = time.perf_counter()
+    touch()
+    deferred[label] = time.perf_counter() - began
+
+print(json.dumps({{
+    'import': imported - start,
+    'first_response': responded - start,
+    'status': status,
+    'loaded_at_startup': loaded,
+    'deferred': deferred
+}}))
+'''
+
+def probe():
+    """Run one cold start in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    probe()  # warm the OS file cache and bytecode caches
+    runs = [probe() for _ in range(args.runs)]
+
+    assert all(run['status'] == 200 for run in runs)
+
+    for key, label in (('import', 'import app'), ('first_response', 'first response')):
+        values = [run[key] * 1000 for run in runs]
+        print(f"{label:>15}: median {statistics.median(values):7.1f} ms  "
+              f"min {min(values):7.1f} ms")
+
+    loaded = runs[-1]['loaded_at_startup']
+    print(f"heavy modules at startup: {', '.join(loaded) if loaded else 'none'}")
+
+    print("\ndeferred to first use:")
+    for name in runs[0]['deferred']:
+        values = [run['deferred'][name] * 1000 for run in runs]
+        print(f"{name:>15}: median {statistics.median(values):7.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Throughput under bursty load against backends that enforce quotas.
+
+Fires a burst of concurrent getInfo and Gemini calls through the real
+gee_service.get_info and llm_service.generate_content while the fake
+backends reject anything over their quota with "Too many concurrent
+aggregations" / 429. Three client configurations are compared:
+
+    no_retry   fixed concurrency, quota errors fail the call (the old behaviour)
+    retry      fixed concurrency, jittered exponential backoff on quota errors
+    adaptive   AIMD concurrency limit, shared token bucket and backoff
+
+    python -m benchmarks.bench_throttling --callers 64 --calls 400
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+MODES = ('no_retry', 'retry', 'adaptive')
+
+# Error messages that must not count as quota errors, and ones that must
+NOT_QUOTA = (
+    'Image.load: Image asset COPERNICUS/S2_SR_HARMONIZED/20200429T140049 not found',
+    'Image.sampleRectangle: Too many pixels in sample; must be <= 262144. Got 1042900.',
+    'Invalid coordinates: lat=-9.1, lon=-67.4292',
+)
+QUOTA = (
+    'Too many concurrent aggregations.',
+    '429 RESOURCE_EXHAUSTED. Resource has been exhausted (e.g. check quota).',
+    'Quota exceeded: too many requests per second (429).',
+)
+
+def check_quota_errors():
+    from utils.rate_limiter import is_quota_error
+
+    for message in NOT_QUOTA:
+        assert not is_quota_error(Exception(message)), message
+    for message in QUOTA:
+        assert is_quota_error(Exception(message)), message
+
+def build_throttle(mode, backend, ceiling, rate_per_second, retries, state_path):
+    from utils.rate_limiter import AdaptiveConcurrencyLimit, SharedTokenBucket, Throttle
+
+    return Throttle(
+        backend,
+        # A fresh bucket name per mode so no run inherits another's balance
+        SharedTokenBucket(f'{backend}-{mode}-{time.time()}',
+                          rate_per_second if mode == 'adaptive' else 0, path=state_path),
+        AdaptiveConcurrencyLimit(ceiling, decrease=0.5 if mode == 'adaptive' else 1.0),
+        0 if mode == 'no_retry' else retries,
+        backoff_seconds=0.05,
+        max_backoff_seconds=1.0
+    )
+
+def burst(call, callers, calls):
+    """Run calls from callers threads at once; returns (ok, failed, seconds)"""
+    def attempt(_):
+        try:
+            call()
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        outcomes = list(pool.map(attempt, range(calls)))
+    elapsed = time.perf_counter() - start
+
+    ok = sum(outcomes)
+    return ok, len(outcomes) - ok, elapsed
+
+def report(mode, ok, failed, elapsed, quota, throttle):
+    print(f"  {mode:>9}: {ok:4d} ok {failed:4d} failed  {elapsed:6.2f} s  "
+          f"{ok / elapsed:7.1f} ok/s  server rejected {quota.rejected:5d}  "
+          f"peak in flight {quota.peak_in_flight:3d}  "
+          f"final limit {throttle.concurrency.limit:5.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--callers', type=int, default=64, help='Concurrent callers')
+    parser.add_argument('--calls', type=int, default=400, help='Calls per backend and mode')
+    parser.add_argument('--retries', type=int, default=8)
+    parser.add_argument('--gee-latency', type=float, default=0.05)
+    parser.add_argument('--gee-max-concurrent', type=int, default=8,
+                        help='Server-side concurrent aggregation limit')
+    parser.add_argument('--gemini-latency-scale', type=float, default=0.005,
+                        help='Fraction of the recorded Gemini latency to replay')
+    parser.add_argument('--gemini-rps', type=float, default=30,
+                        help='Server-side Gemini requests per second quota')
+    args = parser.parse_args()
+
+    check_quota_errors()
+
+    from benchmarks import replay
+
+    Config.LLM_CACHE['enabled'] = False
+    Config.METRICS_CONFIG['directory'] = ''
+    replay.install(gee_latency=args.gee_latency, llm_latency_scale=args.gemini_latency_scale)
+
+    from benchmarks import fake_ee
+    from services import gee_service, llm_service
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, 'rate_limits.sqlite3')
+
+        print(f"Earth Engine: {args.gee_max_concurrent} concurrent aggregations, "
+              f"{args.gee_latency * 1000:.0f} ms round trips, {args.callers} callers")
+        for mode in MODES:
+            quota = fake_ee.limit_quota(max_concurrent=args.gee_max_concurrent)
+            throttle = gee_service._throttle = build_throttle(
+                mode, 'gee', args.callers, 0, args.retries, state_path
+            )
+            ok, failed, elapsed = burst(
+                lambda: gee_service.get_info(fake_ee.Dictionary({'probe': 1})),
+                args.callers, args.calls
+            )
+            report(mode, ok, failed, elapsed, quota, throttle)
+        fake_ee.limit_quota(None)
+
+        client = llm_service.get_gemini_client()
+        # The client-side bucket runs a little under the server quota
+        client_rate = args.gemini_rps * 0.9
+        print(f"\nGemini: {args.gemini_rps:g} requests/s quota, client bucket "
+              f"{client_rate:g}/s, {args.callers} callers")
+        for mode in MODES:
+            quota = client.limit_quota(requests_per_second=args.gemini_rps)
+            throttle = llm_service._throttle = build_throttle(
+                mode, 'gemini', args.callers, client_rate, args.retries, state_path
+            )
+            ok, failed, elapsed = burst(
+                lambda: llm_service.generate_content('extraction', contents='probe'),
+                args.callers, args.calls
+            )
+            report(mode, ok, failed, elapsed, quota, throttle)
+        client.limit_quota(None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+"""
+In-process stand-in for the Earth Engine client used by the benchmarks.
+
+Only the subset of the ``ee`` API that ``services/gee_service.py`` touches is
+emulated. Every ``getInfo`` call counts as one server round trip and can be
+given an artificial latency so batching effects show up in wall-clock time.
+"""
+
+import json
+import math
+import sys
+import time
+import types
+import zlib
+from contextlib import nullcontext
+
+import numpy as np
+
+METERS_PER_DEGREE = 111320.0
+
+# Server-side cap on the pixels one sampleRectangle call may return
+MAX_SAMPLE_PIXELS = 262144
+
+NATIVE_SCALES = {
+    'elevation': 30,
+    'slope': 30,
+}
+
+SCENE_PROPERTIES = {
+    'system:id': 'COPERNICUS/S2_SR_HARMONIZED/20230715T140049_20230715T140052_T19LFJ',
+    'system:index': '20230715T140049_20230715T140052_T19LFJ',
+    'CLOUDY_PIXEL_PERCENTAGE': 3.2,
+    'GENERATION_TIME': 1689446400000,
+}
+
+def _footprint(min_lon, min_lat, max_lon, max_lat):
+    return {'type': 'LinearRing', 'coordinates': [
+        [min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]
+    ]}
+
+# Scenes every collection query returns, in no particular order. The
+# clearest one only clips the edge of the world, so it never covers a cell
+SCENES = [
+    {'system:index': '20230902T140051_20230902T140048_T19LFJ', 'CLOUDY_PIXEL_PERCENTAGE': 11.4,
+     'system:footprint': _footprint(-180, -90, 180, 90)},
+    {'system:index': SCENE_PROPERTIES['system:index'], 'CLOUDY_PIXEL_PERCENTAGE': 3.2,
+     'system:footprint': _footprint(-180, -90, 180, 90)},
+    {'system:index': '20230810T140049_20230810T140052_T19LFJ', 'CLOUDY_PIXEL_PERCENTAGE': 6.9,
+     'system:footprint': _footprint(-180, -90, 180, 90)},
+    {'system:index': '20230628T140051_20230628T140048_T19LFH', 'CLOUDY_PIXEL_PERCENTAGE': 0.4,
+     'system:footprint': _footprint(179.9, 89.9, 180, 90)},
+]
+
+S2_BANDS = ('B2', 'B3', 'B4', 'B8', 'B11', 'B12')
+
+class RoundTripCounter:
+    """Records how many getInfo calls were made and their JSON payload size"""
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes = 0
+        self.latency = 0.0
+
+    def reset(self, latency=None):
+        self.calls = 0
+        self.bytes = 0
+        if latency is not None:
+            self.latency = latency
+
+    def hit(self, result=None):
+        self.calls += 1
+        self.bytes += len(json.dumps(result))
+        if self.latency:
+            time.sleep(self.latency)
+
+counter = RoundTripCounter()
+
+# Optional server-side quota (benchmarks.fake_quota.FakeQuota); see limit_quota()
+quota = None
+
+# Optional replay hook: band_source(band, window) returns physical values for
+# an output band name and a (first_row, first_col, rows, cols) window of the
+# requested pixel grid, or None to fall back to synthetic data
+band_source = None
+
+def _evaluate(value):
+    if isinstance(value, _Computed):
+        return value._evaluate()
+    if isinstance(value, dict):
+        return {k: _evaluate(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_evaluate(v) for v in value]
+    return value
+
+def _band_values(name, shape, band=None, window=None):
+    """Deterministic synthetic (or replayed) pixel values for a band.
+
+    Derived bands encode their history in the source name: ``index`` for
+    expression results, ``*k`` for multiply(k) and an ``int:`` prefix once
+    rounded, so quantized bands come back as integers like the real API.
+    """
+    integer = name.startswith('int:')
+    if integer:
+        name = name[4:]
+    
+    factor = 1.0
+    while '*' in name:
+        name, multiplier = name.rsplit('*', 1)
+        factor *= float(multiplier)
+    
+    replayed = None
+    if band_source is not None and window is not None:
+        replayed = band_source(band, window)
+    
+    rng = np.random.default_rng(zlib.crc32(name.encode()))
+    if replayed is not None:
+        values = np.asarray(replayed, dtype=np.float64)
+    elif name in ('elevation', 'DEM'):
+        values = rng.uniform(150, 320, shape)
+    elif name in ('slope', 'Slope'):
+        values = rng.uniform(0, 25, shape)
+    elif name == 'index':
+        values = rng.uniform(-1, 1, shape)
+    else:
+        values = rng.integers(200, 3500, shape).astype(np.float64)
+    
+    values = values * factor
+    return np.round(values).astype(np.int64) if integer else values
+
+class _Computed:
+    def getInfo(self):
+        with quota.admit() if quota is not None else nullcontext():
+            result = self._evaluate()
+            counter.hit(result)
+        return result
+
+    def _evaluate(self):
+        raise NotImplementedError
+
+class _Value(_Computed):
+    def __init__(self, value):
+        self._value = value
+
+    def _evaluate(self):
+        return _evaluate(self._value)
+
+class Dictionary(_Computed):
+    def __init__(self, values=None):
+        self._values = values or {}
+
+    def _evaluate(self):
+        return {k: _evaluate(v) for k, v in sorted(self._values.items())}
+
+class Projection:
+    def __init__(self, scale):
+        self.scale = scale
+
+    def nominalScale(self):
+        return _Value(self.scale)
+
+class Rectangle:
+    def __init__(self, coords, proj=None, geodesic=None):
+        self.min_lon, self.min_lat, self.max_lon, self.max_lat = coords
+
+    def width_m(self):
+        return (self.max_lon - self.min_lon) * METERS_PER_DEGREE
+
+    def height_m(self):
+        return (self.max_lat - self.min_lat) * METERS_PER_DEGREE
+
+Geometry = types.SimpleNamespace(Rectangle=Rectangle)
+
+class Feature(_Computed):
+    def __init__(self, properties):
+        self._properties = properties
+
+    def get(self, name):
+        return _Value(self._properties[name])
+
+    def toDictionary(self, properties=None):
+        names = properties or list(self._properties)
+        return Dictionary({n: self._properties[n] for n in names})
+
+    def _evaluate(self):
+        return {'type': 'Feature', 'properties': _evaluate(self._properties)}
+
+class _SampledBand(_Computed):
+    def __init__(self, band, source, scale, region):
+        self._band = band
+        self._source = source
+        self._scale = scale
+        self._region = region
+
+    def _grid_window(self):
+        """(first_row, first_col, rows, cols) of the crsTransform grid pixels
+        whose centres fall inside the region"""
+        dx, _, x0, _, dy, y0 = self._scale
+        region = self._region
+        first_col = math.ceil((region.min_lon - x0) / dx - 0.5)
+        last_col = math.floor((region.max_lon - x0) / dx - 0.5)
+        first_row = math.ceil((region.max_lat - y0) / dy - 0.5)
+        last_row = math.floor((region.min_lat - y0) / dy - 0.5)
+        return (first_row, first_col,
+                max(last_row - first_row + 1, 1), max(last_col - first_col + 1, 1))
+
+    def _evaluate(self):
+        window = None
+        if isinstance(self._scale, tuple):
+            window = self._grid_window()
+            rows, cols = window[2:]
+        else:
+            rows = max(1, int(round(self._region.height_m() / self._scale)))
+            cols = max(1, int(round(self._region.width_m() / self._scale)))
+        if rows * cols > MAX_SAMPLE_PIXELS:
+            raise EEException(
+                'Image.sampleRectangle: Too many pixels in sample; '
+                f'must be <= {MAX_SAMPLE_PIXELS}. Got {rows * cols}.'
+            )
+        return _band_values(self._source, (rows, cols), self._band, window).tolist()
+
+class Image(_Computed):
+    def __init__(self, source=None, bands=None, properties=None):
+        if isinstance(source, Image):
+            bands = source._bands
+            properties = source._properties
+        elif bands is None and isinstance(source, str) and source.startswith('COPERNICUS/S2'):
+            bands = [(n, n, 10) for n in S2_BANDS] + [('SCL', 'SCL', 20)]
+            properties = SCENE_PROPERTIES
+        elif bands is None:
+            name = 'elevation' if source == 'USGS/SRTMGL1_003' else None
+            bands = [(name, name, NATIVE_SCALES.get(name, 10))] if name else []
+        # Each band is (output name, source name used for synthetic data, scale)
+        self._bands = list(bands)
+        self._properties = dict(properties or {})
+
+    @classmethod
+    def cat(cls, images):
+        bands = [b for image in images for b in image._bands]
+        return cls(bands=bands, properties=images[0]._properties)
+
+    def _derive(self, bands):
+        return Image(bands=bands, properties=self._properties)
+
+    def select(self, names):
+        if isinstance(names, str):
+            names = [names]
+        lookup = {b[0]: b for b in self._bands}
+        return self._derive([lookup[n] for n in names])
+
+    def rename(self, names):
+        if isinstance(names, str):
+            names = [names]
+        return self._derive([(new,) + b[1:] for new, b in zip(names, self._bands)])
+
+    def addBands(self, other):
+        return self._derive(self._bands + other._bands)
+
+    def bandNames(self):
+        return _Value([b[0] for b in self._bands])
+
+    def resample(self, method='bilinear'):
+        return self
+
+    def projection(self):
+        return Projection(self._bands[0][2])
+
+    def reproject(self, crs=None, crsTransform=None, scale=None):
+        if isinstance(crs, Projection):
+            scale = crs.scale
+        elif crsTransform is not None:
+            scale = tuple(crsTransform)
+        return self._derive([(b[0], b[1], scale) for b in self._bands])
+
+    def expression(self, expression, variables=None):
+        scale = next(iter(variables.values()))._bands[0][2] if variables else 10
+        return self._derive([('constant', 'index', scale)])
+
+    def _map_sources(self, transform):
+        return self._derive([(b[0], transform(b[1]), b[2]) for b in self._bands])
+
+    def multiply(self, value):
+        return self._map_sources(lambda source: f'{source}*{value}')
+
+    def divide(self, other):
+        return self
+
+    def neq(self, value):
+        return self
+
+    def And(self, other):
+        return self
+
+    def normalizedDifference(self, names):
+        return self._derive([('nd', 'index', self._bands[0][2])])
+
+    def setDefaultProjection(self, crs=None, crsTransform=None, scale=None):
+        return self
+
+    def set(self, properties):
+        return Image(bands=self._bands, properties=dict(self._properties, **properties))
+
+    def updateMask(self, mask):
+        return self
+
+    def round(self):
+        return self
+
+    def toInt32(self):
+        return self._map_sources(
+            lambda source: source if source.startswith('int:') else f'int:{source}'
+        )
+
+    def get(self, name):
+        return _Value(self._properties.get(name))
+
+    def toDictionary(self, properties=None):
+        names = properties or list(self._properties)
+        return Dictionary({n: self._properties[n] for n in names})
+
+    def sampleRectangle(self, region, defaultValue=0):
+        scales = {b[2] for b in self._bands}
+        if len(scales) > 1:
+            raise RuntimeError('Image.sampleRectangle: bands have different projections')
+        return Feature({
+            b[0]: _SampledBand(b[0], b[1], b[2], region) for b in self._bands
+        })
+
+    def _evaluate(self):
+        return {
+            'type': 'Image',
+            'id': self._properties.get('system:id'),
+            'bands': [{'id': b[0]} for b in self._bands],
+            'properties': dict(self._properties),
+        }
+
+class ImageCollection:
+    def __init__(self, collection_id):
+        self._collection_id = collection_id
+        self._steps = []
+
+    def aggregate_array(self, prop):
+        return _Value([scene[prop] for scene in SCENES])
+
+    def map(self, func):
+        self._steps.append(func)
+        return self
+
+    def select(self, names):
+        self._steps.append(lambda image: image.select(names))
+        return self
+
+    def _reduce(self):
+        """Run the mapped steps on one scene; reducers keep its bands"""
+        image = Image(f"{self._collection_id}/{SCENE_PROPERTIES['system:index']}")
+        for step in self._steps:
+            image = step(image)
+        return Image(bands=image._bands)
+
+    def median(self):
+        return self._reduce()
+
+    def qualityMosaic(self, band):
+        return self._reduce()
+
+    def filterBounds(self, geometry):
+        return self
+
+    def filterDate(self, start, end):
+        return self
+
+    def filter(self, ee_filter):
+        return self
+
+Filter = types.SimpleNamespace(
+    lt=lambda prop, value: (prop, value),
+    inList=lambda prop, values: (prop, values),
+)
+
+def _slope(image):
+    return Image(bands=[('slope', 'slope', image._bands[0][2])])
+
+Terrain = types.SimpleNamespace(slope=_slope)
+
+class EEException(Exception):
+    pass
+
+def Initialize(credentials=None, project=None):
+    return None
+
+_QUOTA_MESSAGES = {
+    'concurrency': 'Too many concurrent aggregations.',
+    'rate': 'Quota exceeded: too many requests per second (429).',
+}
+
+def limit_quota(max_concurrent=None, requests_per_second=None):
+    """Reject getInfo calls over these limits like the real server; None removes it"""
+    from benchmarks.fake_quota import FakeQuota
+
+    global quota
+    quota = None
+    if max_concurrent or requests_per_second:
+        quota = FakeQuota(
+            lambda reason: EEException(_QUOTA_MESSAGES[reason]),
+            max_concurrent, requests_per_second
+        )
+    return quota
+
+def install():
+    """Register this module as ``ee`` so service imports pick it up"""
+    sys.modules['ee'] = sys.modules[__name__]
+    return sys.modules[__name__]
@@ -0,0 +1,55 @@
+"""
+Server-side quota emulation for the fake Earth Engine and Gemini backends.
+
+A FakeQuota rejects calls beyond max_concurrent in flight or beyond a
+requests_per_second token bucket, the way the real services answer with
+"Too many concurrent aggregations" or 429 RESOURCE_EXHAUSTED.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+class FakeQuota:
+    def __init__(self, make_error, max_concurrent=None, requests_per_second=None):
+        self.make_error = make_error
+        self.max_concurrent = max_concurrent
+        self.requests_per_second = requests_per_second
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.peak_in_flight = 0
+        self._tokens = requests_per_second or 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reject(self, reason):
+        self.rejected += 1
+        return self.make_error(reason)
+
+    @contextmanager
+    def admit(self):
+        """Hold a server-side slot for the duration of one call"""
+        with self._lock:
+            if self.max_concurrent and self.in_flight >= self.max_concurrent:
+                raise self._reject('concurrency')
+
+            if self.requests_per_second:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.requests_per_second,
+                    self._tokens + (now - self._updated) * self.requests_per_second
+                )
+                self._updated = now
+                if self._tokens < 1:
+                    raise self._reject('rate')
+                self._tokens -= 1
+
+            self.in_flight += 1
+            self.admitted += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
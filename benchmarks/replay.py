@@ -0,0 +1,419 @@
+"""
+Replay recorded Earth Engine and Gemini responses for offline benchmarks.
+
+Fixtures live in benchmarks/fixtures:
+
+    gee/<name>.npz + gee/<name>.json   channels of one extracted cell in physical
+                                       units, and the grid they were sampled on
+    gemini/<operation>.json            one generate_content response per
+                                       operation (extraction, satellite_analysis,
+                                       enrichment): raw ``text`` or a JSON
+                                       ``response``, usage_metadata and the
+                                       recorded latency_seconds
+
+Every fixture carries a ``source``: 'recorded' for live captures, or
+'synthetic'. The Gemini fixtures shipped in the repository are synthetic:
+hand-written responses with illustrative latencies and token counts. The
+GEE cell is synthetic too, generated on first use. Benchmark numbers from
+synthetic fixtures measure this code, not Gemini or Earth Engine.
+
+install() registers fake_ee as ``ee`` with its sampleRectangle values served
+from a GEE fixture, and swaps the shared Gemini client for one that answers
+from the Gemini fixtures, so the real services and routes run without network
+access. Scene lists still come from fake_ee.
+
+Record fixtures from the live services (needs GEE and Gemini credentials):
+
+    python -m benchmarks.replay record-gee --lat -9.9606 --lon -67.4975 --name jaco_sa
+    python -m benchmarks.replay record-gemini --gee-fixture jaco_sa
+
+Without a recorded GEE fixture a smooth synthetic cell is generated.
+Recording Gemini overwrites the synthetic files.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import threading
+import time
+import types
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FIXTURE_DIR = Path(__file__).resolve().parent / 'fixtures'
+GEE_FIXTURE_DIR = FIXTURE_DIR / 'gee'
+GEMINI_FIXTURE_DIR = FIXTURE_DIR / 'gemini'
+
+SYNTHETIC_FIXTURE = 'synthetic'
+
+GEMINI_OPERATIONS = ('extraction', 'satellite_analysis', 'enrichment')
+
+USAGE_FIELDS = (
+    'prompt_token_count', 'candidates_token_count', 'thoughts_token_count',
+    'cached_content_token_count', 'tool_use_prompt_token_count'
+)
+
+def bundled_pdf():
+    """The geoglyph paper shipped in the repository root"""
+    return Path(glob.glob(str(REPO_ROOT / '*geoglyph*.pdf'))[0])
+
+class GeeFixture:
+    """Channels of one recorded cell, served to fake_ee by output band name"""
+
+    def __init__(self, name, channels, grid):
+        self.name = name
+        self.channels = {band: np.asarray(values, dtype=np.float64)
+                         for band, values in channels.items()}
+        self.grid = grid
+
+    def window(self, band, window):
+        """Values for rows/cols of the requested grid; wraps past the edges
+        when the request is larger than the recording"""
+        values = self.channels.get(band)
+        if values is None:
+            return None
+        first_row, first_col, rows, cols = window
+        values = np.take(values, range(first_row, first_row + rows), axis=0, mode='wrap')
+        return np.take(values, range(first_col, first_col + cols), axis=1, mode='wrap')
+
+    def channels_float32(self):
+        return {band: values.astype(np.float32) for band, values in self.channels.items()}
+
+def save_gee_fixture(name, channels, grid):
+    GEE_FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(GEE_FIXTURE_DIR / f'{name}.npz', **channels)
+    (GEE_FIXTURE_DIR / f'{name}.json').write_text(json.dumps(grid, indent=2) + '\n')
+
+def _smooth_field(rng, shape, waves=5):
+    """Low-frequency landscape in [0, 1]: a few random plane waves"""
+    rows, cols = np.mgrid[0:1:shape[0] * 1j, 0:1:shape[1] * 1j]
+    field = np.zeros(shape)
+    for _ in range(waves):
+        angle = rng.uniform(0, np.pi)
+        frequency = rng.uniform(0.5, 4.0)
+        phase = rng.uniform(0, 2 * np.pi)
+        field += rng.uniform(0.3, 1.0) * np.sin(
+            2 * np.pi * frequency * (rows * np.cos(angle) + cols * np.sin(angle)) + phase
+        )
+    return (field - field.min()) / (np.ptp(field) or 1.0)
+
+def synthesize_gee_fixture(cell_size_km=1.0, pixels_per_km=100, seed=7):
+    """Write a deterministic synthetic cell with realistic value ranges.
+
+    Smooth fields plus sensor noise compress and render like real imagery,
+    unlike the white noise fake_ee produces on its own.
+    """
+    from utils.spectral_indices import compute_indices
+
+    rng = np.random.default_rng(seed)
+    size = int(round(cell_size_km * pixels_per_km))
+    shape = (size, size)
+
+    vegetation = _smooth_field(rng, shape)
+    channels = {}
+    for band, low, high in (('B2', 250, 900), ('B3', 450, 1200), ('B4', 300, 1600),
+                            ('B8', 1800, 3800), ('B11', 1200, 2800), ('B12', 600, 2000)):
+        # Red and SWIR drop where vegetation is dense, NIR rises
+        weight = vegetation if band == 'B8' else 1 - vegetation
+        channels[band] = low + (high - low) * weight + rng.normal(0, 25, shape)
+
+    dem = 150 + 120 * _smooth_field(rng, shape, waves=3) + rng.normal(0, 0.5, shape)
+    pixel_m = 1000.0 / pixels_per_km
+    gradient_rows, gradient_cols = np.gradient(dem, pixel_m)
+    channels['DEM'] = dem
+    channels['Slope'] = np.degrees(np.arctan(np.hypot(gradient_rows, gradient_cols)))
+
+    channels = {band: values.astype(np.float32) for band, values in channels.items()}
+    channels.update(compute_indices(channels, Config.GEE_CONFIG['indices']))
+
+    save_gee_fixture(SYNTHETIC_FIXTURE, channels, {
+        'source': 'synthetic',
+        'latitude': -9.9606,
+        'longitude': -67.4975,
+        'cell_size_km': cell_size_km,
+        'pixels_per_km': pixels_per_km
+    })
+
+def load_gee_fixture(name=None):
+    """Load a GEE fixture; by default the first recorded one, else synthetic"""
+    if name is None:
+        recorded = sorted(
+            path.stem for path in GEE_FIXTURE_DIR.glob('*.json')
+            if json.loads(path.read_text()).get('source') == 'recorded'
+        )
+        name = recorded[0] if recorded else SYNTHETIC_FIXTURE
+
+    if name == SYNTHETIC_FIXTURE and not (GEE_FIXTURE_DIR / f'{name}.npz').exists():
+        synthesize_gee_fixture()
+
+    grid = json.loads((GEE_FIXTURE_DIR / f'{name}.json').read_text())
+    with np.load(GEE_FIXTURE_DIR / f'{name}.npz') as arrays:
+        channels = {band: arrays[band] for band in arrays.files}
+
+    return GeeFixture(name, channels, grid)
+
+def fixture_sources(gee_fixture):
+    """'recorded' or 'synthetic' for the GEE fixture and the Gemini fixtures"""
+    gemini = {fixture.get('source', 'synthetic') for fixture in load_gemini_fixtures().values()}
+    return {
+        'gee': gee_fixture.grid.get('source', 'synthetic'),
+        'gemini': gemini.pop() if len(gemini) == 1 else 'mixed'
+    }
+
+def load_gemini_fixtures():
+    return {
+        operation: json.loads((GEMINI_FIXTURE_DIR / f'{operation}.json').read_text())
+        for operation in GEMINI_OPERATIONS
+    }
+
+class QuotaExceeded(Exception):
+    """Shaped like google.genai.errors.ClientError for a 429 response"""
+
+    code = 429
+
+    def __init__(self, reason):
+        super().__init__(
+            f"429 RESOURCE_EXHAUSTED. Resource has been exhausted ({reason} quota)."
+        )
+
+def request_operation(contents, config=None):
+    """Tell which service call built a generate_content request"""
+    if config is not None and getattr(config, 'tools', None):
+        return 'enrichment'
+    if isinstance(contents, (list, tuple)) and not all(isinstance(p, str) for p in contents):
+        return 'satellite_analysis'
+    return 'extraction'
+
+def _fixture_response(fixture):
+    text = fixture.get('text')
+    if text is None:
+        text = "```json\n" + json.dumps(fixture['response'], indent=2) + "\n```"
+    return types.SimpleNamespace(
+        text=text,
+        usage_metadata=types.SimpleNamespace(
+            **{field: fixture.get('usage_metadata', {}).get(field) for field in USAGE_FIELDS}
+        )
+    )
+
+class _ReplayModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        with self._client.admit():
+            delay, response = self._client.respond(contents, config)
+            if delay:
+                time.sleep(delay)
+        return response
+
+class _AsyncReplayModels(_ReplayModels):
+    async def generate_content(self, model, contents, config=None):
+        with self._client.admit():
+            delay, response = self._client.respond(contents, config)
+            if delay:
+                await asyncio.sleep(delay)
+        return response
+
+class ReplayGeminiClient:
+    """Stands in for genai.Client; latency_scale replays a fraction of each
+    fixture's recorded latency (0 measures only our own overhead)"""
+
+    def __init__(self, fixtures, latency_scale=0.0):
+        self.fixtures = fixtures
+        self.latency_scale = latency_scale
+        self.calls = {operation: 0 for operation in fixtures}
+        self.quota = None
+        self.models = _ReplayModels(self)
+        self.aio = types.SimpleNamespace(models=_AsyncReplayModels(self))
+
+    def limit_quota(self, max_concurrent=None, requests_per_second=None):
+        """Answer calls over these limits with 429s; None removes the quota"""
+        from benchmarks.fake_quota import FakeQuota
+
+        self.quota = None
+        if max_concurrent or requests_per_second:
+            self.quota = FakeQuota(QuotaExceeded, max_concurrent, requests_per_second)
+        return self.quota
+
+    def admit(self):
+        return self.quota.admit() if self.quota is not None else nullcontext()
+
+    def respond(self, contents, config):
+        operation = request_operation(contents, config)
+        fixture = self.fixtures[operation]
+        self.calls[operation] += 1
+        return fixture.get('latency_seconds', 0) * self.latency_scale, _fixture_response(fixture)
+
+class _GeminiHTTPHandler(BaseHTTPRequestHandler):
+    """Answers every generateContent POST with the extraction fixture"""
+
+    # Keep-alive, so clients pool their connections as they do against Google
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        fixture = self.server.fixture
+        body = json.dumps({
+            'candidates': [{
+                'content': {'role': 'model', 'parts': [{'text': _fixture_response(fixture).text}]},
+                'finishReason': 'STOP'
+            }],
+            'usageMetadata': {
+                ''.join(word.title() if i else word for i, word in enumerate(field.split('_'))): value
+                for field, value in fixture.get('usage_metadata', {}).items()
+            }
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_gemini_http():
+    """Start a local Gemini REST endpoint in a daemon thread; returns its base URL.
+
+    Unlike ReplayGeminiClient, a real genai.Client pointed at it goes
+    through httpx, connection pools included.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _GeminiHTTPHandler)
+    server.daemon_threads = True
+    server.fixture = load_gemini_fixtures()['extraction']
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/"
+
+def install(gee_fixture=None, gee_latency=0.0, llm_latency_scale=0.0):
+    """Route Earth Engine and Gemini calls to the fixtures; returns the GEE fixture"""
+    from benchmarks import fake_ee
+
+    fake_ee.install()
+    fake_ee.counter.reset(latency=gee_latency)
+
+    fixture = gee_fixture if isinstance(gee_fixture, GeeFixture) else load_gee_fixture(gee_fixture)
+    fake_ee.band_source = fixture.window
+
+    from services import gee_service, llm_service
+
+    gee_service._gee_ready = True
+    client = ReplayGeminiClient(load_gemini_fixtures(), llm_latency_scale)
+    llm_service._client = client
+    llm_service.build_gemini_client = lambda: client
+
+    return fixture
+
+def record_gee(lat, lon, name, cell_size_km=None, pixels_per_km=None):
+    """Extract one cell from live Earth Engine and save it as a fixture"""
+    from services.gee_service import gee_ready, extract_gee_data
+
+    if not gee_ready():
+        raise SystemExit('Earth Engine is not initialized; configure the service account first')
+
+    data = extract_gee_data(lat, lon, name, cell_size_km, pixels_per_km, profile='full')
+    metadata = data['metadata']
+
+    save_gee_fixture(name, data['channels'], {
+        'source': 'recorded',
+        'latitude': lat,
+        'longitude': lon,
+        'cell_size_km': metadata['cell_size_km'],
+        'pixels_per_km': metadata['pixels_per_km'],
+        'image_id': metadata['image_id'],
+        'recorded_at': time.strftime('%Y-%m-%d')
+    })
+    print(f"Saved {GEE_FIXTURE_DIR / name}.npz ({len(data['channels'])} channels)")
+
+class _RecordingModels:
+    """Passes calls to the real client and keeps the last response per operation"""
+
+    def __init__(self, client):
+        self._client = client
+        self.recorded = {}
+
+    def generate_content(self, model, contents, config=None):
+        start = time.perf_counter()
+        response = self._client.models.generate_content(
+            model=model, contents=contents, config=config
+        )
+        usage = response.usage_metadata
+
+        self.recorded[request_operation(contents, config)] = {
+            'operation': request_operation(contents, config),
+            'source': 'recorded',
+            'recorded_at': time.strftime('%Y-%m-%d'),
+            'latency_seconds': round(time.perf_counter() - start, 2),
+            'usage_metadata': {
+                field: getattr(usage, field) for field in USAGE_FIELDS
+                if getattr(usage, field, None) is not None
+            },
+            'text': response.text
+        }
+        return response
+
+def record_gemini(gee_fixture=None):
+    """Run each Gemini operation once against the live API and save the responses.
+
+    Extraction reads the bundled paper, the satellite call sees the overview
+    of a GEE fixture and enrichment uses the first extracted site.
+    """
+    from services import llm_service
+    from services.visualization_service import render_overview_png
+    from utils.pdf_processor import extract_text_from_pdf
+
+    Config.LLM_CACHE['enabled'] = False
+    fixture = load_gee_fixture(gee_fixture)
+
+    recorder = _RecordingModels(llm_service.get_gemini_client())
+    llm_service._client = types.SimpleNamespace(models=recorder)
+
+    extracted = llm_service.extract_sites_with_llm(extract_text_from_pdf(str(bundled_pdf())))
+    site = (extracted.get('sites') or [{}])[0]
+    site_name = site.get('site_name') or 'site'
+
+    metadata = dict(fixture.grid, site_name=site_name)
+    png = render_overview_png(fixture.channels_float32(), site_name)
+    llm_service.analyze_satellite_imagery(site_name, metadata, png)
+    llm_service.enrich_site_context(site)
+
+    GEMINI_FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    for operation, response in recorder.recorded.items():
+        path = GEMINI_FIXTURE_DIR / f'{operation}.json'
+        path.write_text(json.dumps(response, indent=2, ensure_ascii=False) + '\n')
+        print(f"Saved {path} ({response['latency_seconds']} s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gee = commands.add_parser('record-gee', help='Record one cell from Earth Engine')
+    gee.add_argument('--lat', type=float, required=True)
+    gee.add_argument('--lon', type=float, required=True)
+    gee.add_argument('--name', required=True)
+    gee.add_argument('--cell-size-km', type=float)
+    gee.add_argument('--pixels-per-km', type=float)
+
+    gemini = commands.add_parser('record-gemini', help='Record one response per Gemini operation')
+    gemini.add_argument('--gee-fixture', help='GEE fixture rendered for the satellite call')
+
+    commands.add_parser('synthesize', help='Regenerate the synthetic GEE fixture')
+
+    args = parser.parse_args()
+
+    if args.command == 'record-gee':
+        record_gee(args.lat, args.lon, args.name, args.cell_size_km, args.pixels_per_km)
+    elif args.command == 'record-gemini':
+        record_gemini(args.gee_fixture)
+    else:
+        synthesize_gee_fixture()
+
+if __name__ == '__main__':
+    main()
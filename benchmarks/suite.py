@@ -0,0 +1,556 @@
+"""
+Offline end-to-end benchmark suite.
+
+Drives the real services and Flask routes with Earth Engine and Gemini
+replayed from local fixtures (benchmarks/replay.py). Each benchmark runs in
+a fresh interpreter so its peak RSS is its own; results report latency
+percentiles, throughput and peak RSS and can be written as JSON.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --compare results.json --output new.json
+    python -m benchmarks.suite --benchmarks 'route.*' --concurrency 4
+
+--compare exits with status 1 when a benchmark's median latency or peak
+RSS grew, or its throughput fell, by more than --threshold.
+"""
+
+import argparse
+import fnmatch
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# name -> (setup(fixture, workdir) returning the operation to time, default iterations)
+BENCHMARKS = {}
+
+# Latency changes smaller than this are noise, whatever the ratio
+MIN_LATENCY_DELTA_MS = 1.0
+
+class SkipBenchmark(Exception):
+    """Raised by a setup whose optional dependency is missing"""
+
+def benchmark(name, iterations):
+    def register(setup):
+        BENCHMARKS[name] = (setup, iterations)
+        return setup
+    return register
+
+def _site_request(fixture, **extra):
+    return dict(
+        site_name='Jacó Sá',
+        latitude=fixture.grid['latitude'],
+        longitude=fixture.grid['longitude'],
+        cell_size_km=fixture.grid['cell_size_km'],
+        pixels_per_km=fixture.grid['pixels_per_km'],
+        **extra
+    )
+
+def _extract(fixture, profile):
+    from services.gee_service import extract_gee_data
+
+    request = _site_request(fixture)
+    return lambda: extract_gee_data(
+        request['latitude'], request['longitude'], request['site_name'],
+        request['cell_size_km'], request['pixels_per_km'], profile=profile
+    )
+
+@benchmark('gee.extract_full', iterations=30)
+def bench_extract_full(fixture, workdir):
+    return _extract(fixture, 'full')
+
+@benchmark('gee.extract_preview', iterations=30)
+def bench_extract_preview(fixture, workdir):
+    return _extract(fixture, 'preview')
+
+@benchmark('indices.compute_all', iterations=200)
+def bench_indices(fixture, workdir):
+    from utils.spectral_indices import SPECTRAL_INDICES, compute_indices
+
+    bands = fixture.channels_float32()
+    names = list(SPECTRAL_INDICES)
+    return lambda: compute_indices(bands, names)
+
+@benchmark('render.overview', iterations=30)
+def bench_render(fixture, workdir):
+    from services.visualization_service import create_overview_visualization
+
+    channels = fixture.channels_float32()
+    output_path = workdir / 'overview.png'
+    return lambda: create_overview_visualization(channels, 'Jacó Sá', output_path)
+
+@benchmark('export.zip', iterations=20)
+def bench_zip(fixture, workdir):
+    from services.export_service import package_data_as_zip
+
+    data = _extract(fixture, 'full')()
+    output_path = workdir / 'site.zip'
+    return lambda: package_data_as_zip(data, 'Jaco_Sa', output_path)
+
+@benchmark('export.geotiff', iterations=10)
+def bench_geotiff(fixture, workdir):
+    try:
+        import rasterio
+    except ImportError:
+        raise SkipBenchmark('rasterio not installed (pip install -r requirements-geotiff.txt)')
+    from services.export_service import _overview_factors, georeference, write_geotiff
+
+    # A 5x larger cell than the fixture, so the file is tiled and has overviews
+    data = _extract(fixture, 'full')()
+    data = {
+        'channels': {name: np.repeat(np.repeat(array, 5, axis=0), 5, axis=1)
+                     for name, array in data['channels'].items()},
+        'metadata': dict(data['metadata'],
+                         cell_size_km=data['metadata']['cell_size_km'] * 5)
+    }
+    geo = georeference(data)
+    factors = _overview_factors(geo['shape'][1:], Config.EXPORT_CONFIG['tile_size'])
+    output_path = workdir / 'site.tif'
+
+    def call():
+        output_path.write_bytes(write_geotiff(data))
+
+        with rasterio.open(output_path) as dataset:
+            problems = []
+            if list(dataset.descriptions) != geo['channels']:
+                problems.append(f"bands {dataset.descriptions}")
+            if not np.allclose(dataset.transform.to_gdal(), geo['geotransform'], rtol=0, atol=1e-12):
+                problems.append(f"transform {dataset.transform}")
+            if not factors or dataset.overviews(1) != factors:
+                problems.append(f"overviews {dataset.overviews(1)}, expected {factors}")
+            if not np.allclose(dataset.read(1), data['channels'][geo['channels'][0]],
+                               equal_nan=True):
+                problems.append('band 1 values')
+        if problems:
+            raise RuntimeError('GeoTIFF round trip: ' + '; '.join(problems))
+
+    return call
+
+@benchmark('pdf.extract_text', iterations=10)
+def bench_pdf(fixture, workdir):
+    from benchmarks.replay import bundled_pdf
+    from utils.pdf_processor import extract_text_from_pdf
+
+    pdf_path = str(bundled_pdf())
+    return lambda: extract_text_from_pdf(pdf_path)
+
+def _long_paper_text():
+    """The bundled paper's pages repeated, renumbered, until it takes the chunked path"""
+    from benchmarks.replay import bundled_pdf
+    from utils.pdf_processor import extract_text_from_pdf
+    from utils.text_chunker import join_pages, split_pages
+
+    pages = split_pages(extract_text_from_pdf(str(bundled_pdf())))
+    long_pages = []
+    while sum(len(text) for _, text in long_pages) <= Config.EXTRACTION_CONFIG['chunk_threshold_chars']:
+        long_pages += [(len(long_pages) + 1, text) for _, text in pages]
+    return join_pages(long_pages)
+
+def _extract_chunked(paper_text):
+    from services.llm_service import extract_sites_with_llm
+
+    result = extract_sites_with_llm(paper_text)
+    chunked = result['extraction_summary'].get('chunked') or {}
+    if chunked.get('windows', 0) < 2 or chunked.get('failed_windows'):
+        raise RuntimeError(f"chunked extraction did not fan out cleanly: {chunked}")
+    return result
+
+@benchmark('llm.extract_chunked', iterations=10)
+def bench_extract_chunked(fixture, workdir):
+    paper_text = _long_paper_text()
+    return lambda: _extract_chunked(paper_text)
+
+@benchmark('llm.chunked_http', iterations=5)
+def bench_extract_chunked_http(fixture, workdir):
+    from google import genai
+    from google.genai import types
+
+    from benchmarks.replay import serve_gemini_http
+    from services import llm_service
+
+    # A real client over httpx against a local endpoint: async connection
+    # pools must not leak from one asyncio.run() into the next
+    base_url = serve_gemini_http()
+    llm_service.build_gemini_client = lambda: genai.Client(
+        api_key='replay', http_options=types.HttpOptions(base_url=base_url)
+    )
+    llm_service.reset_gemini_client()
+    paper_text = _long_paper_text()
+
+    def call():
+        # Back to back, so the second run meets whatever the first left behind
+        _extract_chunked(paper_text)
+        return _extract_chunked(paper_text)
+
+    return call
+
+@benchmark('llm.fanout_async', iterations=10)
+def bench_fanout_async(fixture, workdir):
+    import asyncio
+
+    from benchmarks.replay import load_gemini_fixtures
+    from services.llm_service import (
+        analyze_satellite_imagery_async, close_gemini_async_client, enrich_site_context_async
+    )
+    from services.visualization_service import render_overview_png
+
+    sites = load_gemini_fixtures()['extraction']['response']['sites']
+    png = render_overview_png(fixture.channels_float32(), 'Jacó Sá')
+
+    async def fan_out():
+        # Eight sites' analysis and enrichment at once, on one thread
+        calls = []
+        for i in range(8):
+            site = dict(sites[i % len(sites)])
+            calls.append(analyze_satellite_imagery_async(site['site_name'], fixture.grid, png))
+            calls.append(enrich_site_context_async(site))
+        try:
+            results = await asyncio.gather(*calls)
+        finally:
+            await close_gemini_async_client()
+        failed = [result for result in results if 'parse_error' in result]
+        if failed:
+            raise RuntimeError(f"{len(failed)} async calls failed to parse")
+        return results
+
+    return lambda: asyncio.run(fan_out())
+
+def _route(method_path, request_kwargs):
+    """Call a route through the Flask test client and read the whole body"""
+    from app import app
+
+    client = app.test_client()
+    method, path = method_path.split(' ')
+
+    def call():
+        response = client.open(path, method=method, **request_kwargs())
+        body = response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"{method_path} returned {response.status_code}: {body[:300]!r}")
+        return body
+
+    return call
+
+@benchmark('route.extract', iterations=10)
+def bench_route_extract(fixture, workdir):
+    from benchmarks.replay import bundled_pdf
+
+    pdf_path = bundled_pdf()
+    pdf_bytes = pdf_path.read_bytes()
+    return _route('POST /extract', lambda: {
+        'data': {'pdf_file': (io.BytesIO(pdf_bytes), pdf_path.name)},
+        'content_type': 'multipart/form-data'
+    })
+
+@benchmark('route.download_gee', iterations=20)
+def bench_route_download(fixture, workdir):
+    request = _site_request(fixture, format='npy')
+    return _route('POST /download_gee', lambda: {'json': request})
+
+@benchmark('route.preview_gee', iterations=20)
+def bench_route_preview(fixture, workdir):
+    request = _site_request(fixture)
+    return _route('POST /preview_gee', lambda: {'json': request})
+
+@benchmark('route.ai_analysis', iterations=20)
+def bench_route_analysis(fixture, workdir):
+    from benchmarks.replay import load_gemini_fixtures
+
+    site = load_gemini_fixtures()['extraction']['response']['sites'][0]
+    request = _site_request(fixture, site_data=site)
+    return _route('POST /ai_analysis', lambda: {'json': request})
+
+def parse_sse(body):
+    """[(event, payload)] from a server-sent event stream, keepalives skipped"""
+    messages = []
+    for block in body.decode().split('\n\n'):
+        fields = dict(
+            line.split(': ', 1) for line in block.splitlines()
+            if not line.startswith(':') and ': ' in line
+        )
+        if 'event' in fields:
+            messages.append((fields['event'], json.loads(fields.get('data', 'null'))))
+    return messages
+
+ANALYSIS_STAGES = ('satellite_data', 'render', 'visual_analysis', 'contextual_enrichment')
+
+@benchmark('route.ai_analysis_job', iterations=10)
+def bench_route_analysis_job(fixture, workdir):
+    from app import app
+    from benchmarks.replay import load_gemini_fixtures
+
+    # Jobs go through the SQLite store, as they do across gunicorn workers
+    Config.JOB_CONFIG['store_path'] = str(workdir / 'jobs.sqlite3')
+
+    site = load_gemini_fixtures()['extraction']['response']['sites'][0]
+    request = _site_request(fixture, site_data=site)
+    client = app.test_client()
+
+    def call():
+        submitted = client.post('/ai_analysis/jobs', json=request)
+        if submitted.status_code != 202:
+            raise RuntimeError(f"job submit returned {submitted.status_code}: "
+                               f"{submitted.get_data()[:300]!r}")
+
+        # The stream ends after the 'done' event, so this reads it to the end
+        messages = parse_sse(client.get(submitted.get_json()['events_url']).get_data())
+        if not messages or messages[-1][0] != 'done':
+            raise RuntimeError(f"event stream ended without 'done': {messages[-1:]}")
+
+        job = messages[-1][1]
+        if job['status'] != 'completed':
+            raise RuntimeError(f"job {job['status']}: {job.get('error')}")
+
+        completed = {event['stage'] for name, event in messages
+                     if name == 'stage' and event['status'] == 'completed'}
+        missing = [stage for stage in ANALYSIS_STAGES if stage not in completed]
+        if missing:
+            raise RuntimeError(f"no completed stage event for {', '.join(missing)}")
+        return job
+
+    return call
+
+def disable_caches():
+    """Every iteration should do the full work, as on a cold request"""
+    Config.LLM_CACHE['enabled'] = False
+    Config.TILE_CACHE['enabled'] = False
+    Config.PDF_CONFIG['page_cache_path'] = ''
+    Config.RENDER_CONFIG['cache_entries'] = 0
+    # Keep recording metrics, as in production, without writing flush files
+    Config.METRICS_CONFIG['directory'] = ''
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def measure(operation, iterations, warmup, concurrency):
+    for _ in range(warmup):
+        operation()
+
+    rss_before = peak_rss_mb()
+
+    def timed_call(_):
+        start = time.perf_counter()
+        operation()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed_call, range(iterations)))
+    else:
+        latencies = [timed_call(i) for i in range(iterations)]
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p90, p95, p99 = np.percentile(latencies_ms, [50, 90, 95, 99])
+    peak = peak_rss_mb()
+
+    return {
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'mean_ms': round(float(latencies_ms.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p90_ms': round(float(p90), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(latencies_ms.max()), 3),
+        'throughput_per_s': round(iterations / elapsed, 3),
+        'peak_rss_mb': peak,
+        'rss_growth_mb': None if peak is None else round(peak - rss_before, 1)
+    }
+
+def run_worker(args):
+    """Run one benchmark in this process and print its result as JSON"""
+    from benchmarks import replay
+
+    disable_caches()
+    fixture = replay.install(args.gee_fixture, args.gee_latency, args.llm_latency_scale)
+
+    setup, iterations = BENCHMARKS[args.worker]
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            operation = setup(fixture, Path(workdir))
+        except SkipBenchmark as e:
+            print(json.dumps({'skipped': str(e)}))
+            return
+        result = measure(operation, args.iterations or iterations, args.warmup, args.concurrency)
+
+    result['gee_fixture'] = fixture.name
+    print(json.dumps(result))
+
+def run_benchmark(name, args):
+    """Run one benchmark in a fresh interpreter"""
+    command = [sys.executable, '-m', 'benchmarks.suite', '--worker', name,
+               '--warmup', str(args.warmup), '--concurrency', str(args.concurrency),
+               '--gee-latency', str(args.gee_latency),
+               '--llm-latency-scale', str(args.llm_latency_scale)]
+    if args.iterations:
+        command += ['--iterations', str(args.iterations)]
+    if args.gee_fixture:
+        command += ['--gee-fixture', args.gee_fixture]
+
+    completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        error = (completed.stderr.strip().splitlines() or ['no output'])[-1]
+        return {'error': error}
+    return json.loads(lines[-1])
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline, current, threshold):
+    """Return (benchmark, metric, old, new, change) for every regression"""
+    regressions = []
+
+    for name, result in current['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if not previous or any(
+            key in entry for key in ('error', 'skipped') for entry in (previous, result)
+        ):
+            continue
+
+        for metric, higher_is_worse in (('p50_ms', True), ('peak_rss_mb', True),
+                                        ('throughput_per_s', False)):
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            if metric == 'p50_ms' and abs(new - old) < MIN_LATENCY_DELTA_MS:
+                continue
+
+            change = (new - old) / old
+            if (change > threshold) if higher_is_worse else (change < -threshold):
+                regressions.append((name, metric, old, new, change))
+
+    return regressions
+
+def print_results(results, baseline=None):
+    print(f"\n{'benchmark':<22} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+          f"{'ops/s':>9} {'peak MB':>8}")
+
+    for name, result in results['benchmarks'].items():
+        if 'error' in result:
+            print(f"{name:<22} ERROR: {result['error']}")
+            continue
+        if 'skipped' in result:
+            print(f"{name:<22} skipped: {result['skipped']}")
+            continue
+
+        line = (f"{name:<22} {result['p50_ms']:9.2f} {result['p90_ms']:9.2f} "
+                f"{result['p99_ms']:9.2f} {result['throughput_per_s']:9.2f} "
+                f"{result['peak_rss_mb'] or 0:8.1f}")
+
+        previous = (baseline or {}).get('benchmarks', {}).get(name)
+        if previous and previous.get('p50_ms'):
+            line += f"  p50 {(result['p50_ms'] / previous['p50_ms'] - 1) * 100:+6.1f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--benchmarks', default='*',
+                        help='Comma-separated names or glob patterns, e.g. "route.*"')
+    parser.add_argument('--iterations', type=int,
+                        help='Override every benchmark\'s iteration count')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Threads issuing calls at once')
+    parser.add_argument('--gee-latency', type=float, default=0.0,
+                        help='Seconds added to each Earth Engine round trip')
+    parser.add_argument('--llm-latency-scale', type=float, default=0.0,
+                        help='Fraction of the recorded Gemini latency to replay')
+    parser.add_argument('--gee-fixture', help='GEE fixture name (default: first recorded)')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Baseline results JSON to check against')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Relative change that counts as a regression')
+    parser.add_argument('--list', action='store_true', help='List benchmarks and exit')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    if args.list:
+        for name, (_, iterations) in BENCHMARKS.items():
+            print(f"{name:<22} {iterations:>4} iterations")
+        return
+
+    patterns = [pattern.strip() for pattern in args.benchmarks.split(',')]
+    names = [name for name in BENCHMARKS
+             if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+    if not names:
+        parser.error(f"no benchmark matches {args.benchmarks!r}")
+
+    # Generate the synthetic fixture once rather than racing in every worker
+    from benchmarks.replay import fixture_sources, load_gee_fixture
+    sources = fixture_sources(load_gee_fixture(args.gee_fixture))
+    if set(sources.values()) != {'recorded'}:
+        print(f"note: replaying non-recorded fixtures (GEE {sources['gee']}, "
+              f"Gemini {sources['gemini']})")
+
+    results = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'fixture_sources': sources,
+            'settings': {
+                'warmup': args.warmup,
+                'concurrency': args.concurrency,
+                'gee_latency': args.gee_latency,
+                'llm_latency_scale': args.llm_latency_scale,
+                'renderer': Config.RENDER_CONFIG['renderer']
+            }
+        },
+        'benchmarks': {}
+    }
+
+    for name in names:
+        print(f"running {name} ...", flush=True)
+        results['benchmarks'][name] = run_benchmark(name, args)
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_results(results, baseline)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+        print(f"\nwrote {args.output}")
+
+    failed = [name for name, result in results['benchmarks'].items() if 'error' in result]
+    regressions = compare(baseline, results, args.threshold) if baseline else []
+
+    for name, metric, old, new, change in regressions:
+        print(f"REGRESSION {name} {metric}: {old} -> {new} ({change * 100:+.1f}%)")
+
+    if failed or regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
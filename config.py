@@ -15,6 +15,58 @@ class Config:
     
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     
+    GEMINI_CONFIG = {
+        'model': 'gemini-3-flash-preview',
+        # Ceiling of the adaptive per-process limit; 429s shrink it, successes regrow it
+        'max_concurrent_requests': int(os.getenv('GEMINI_MAX_CONCURRENCY', '8')),
+        'min_concurrent_requests': 1,
+        # Shared by all worker processes; 0 = no limit
+        'requests_per_minute': int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '0')),
+        'max_retries': int(os.getenv('GEMINI_MAX_RETRIES', '5')),  # On 429 only
+        'backoff_seconds': 1.0,
+        'max_backoff_seconds': 30.0,
+        'request_timeout_seconds': 300
+    }
+    
+    PDF_CONFIG = {
+        'workers': int(os.getenv('PDF_WORKERS', str(min(4, os.cpu_count() or 1)))),
+        'parallel_min_pages': 64,  # Smaller PDFs are parsed in-process
+        # Empty PDF_PAGE_CACHE_PATH disables the page text cache
+        'page_cache_path': os.getenv(
+            'PDF_PAGE_CACHE_PATH',
+            str(Path(tempfile.gettempdir()) / 'geoflow_pdf_pages.sqlite3')
+        )
+    }
+    
+    EXTRACTION_CONFIG = {
+        'chunk_threshold_chars': 200_000,  # Longer papers use chunked extraction
+        'window_chars': 60_000,
+        'overlap_pages': 1,
+        'chunk_workers': 4
+    }
+    
+    BATCH_CONFIG = {
+        'max_workers': int(os.getenv('BATCH_MAX_WORKERS', '4')),
+        # Server-side directory batches must live under this path; unset disables them
+        'directory_root': os.getenv('BATCH_DIRECTORY_ROOT')
+    }
+    
+    LLM_CACHE = {
+        'enabled': os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true',
+        'memory_max_entries': 512,
+        # Empty LLM_CACHE_PATH keeps the cache in memory only
+        'sqlite_path': os.getenv(
+            'LLM_CACHE_PATH',
+            str(Path(tempfile.gettempdir()) / 'geoflow_llm_cache.sqlite3')
+        ),
+        'ttl_seconds': {
+            'extraction': 30 * 24 * 3600,
+            'satellite_analysis': 30 * 24 * 3600,
+            'enrichment': 24 * 3600,  # Search-grounded results go stale quickly
+            'paper': 30 * 24 * 3600  # Whole-upload results keyed by file hash
+        }
+    }
+    
     GEE_PROJECT_ID = os.getenv('GEE_PROJECT_ID')
     GEE_SERVICE_ACCOUNT_PATH = Path(__file__).parent / 'gee_service_account.json'
     
@@ -22,15 +74,150 @@ class Config:
         'project': GEE_PROJECT_ID,
         'cell_size_km': 1.0,
         'pixels_per_km': 100,
+        'max_cell_size_km': 20.0,
+        'max_pixels_per_km': 100,  # Sentinel-2 native 10 m
+        'max_pixels_per_tile': 262144,  # sampleRectangle limit; larger areas are tiled
+        'tile_workers': int(os.getenv('GEE_TILE_WORKERS', '4')),
+        # getInfo throttling: quota errors ("Too many concurrent aggregations",
+        # 429) shrink the adaptive limit and are retried with backoff
+        'requests_per_second': float(os.getenv('GEE_REQUESTS_PER_SECOND', '0')),  # 0 = no limit
+        'max_concurrent_requests': int(os.getenv('GEE_MAX_CONCURRENCY', '16')),
+        'min_concurrent_requests': 1,
+        'max_retries': int(os.getenv('GEE_MAX_RETRIES', '5')),
+        'backoff_seconds': 2.0,
+        'max_backoff_seconds': 60.0,
+        'batch_requests': True,  # Fetch all bands + scene metadata in one getInfo
+        'indices': ['NDVI', 'NDWI', 'BSI'],  # Always computed; requests may add more
+        # What each route pulls from Earth Engine. 'server_indices' computes the
+        # spectral indices in the ee graph and returns them scaled to integers;
+        # 'scales' quantizes other bands the same way (value * scale, rounded)
+        'band_profiles': {
+            'full': {
+                'bands': ['B2', 'B3', 'B4', 'B8', 'B11', 'B12'],
+                'server_indices': False,
+                'scales': {}
+            },
+            'preview': {
+                'bands': ['B2', 'B3', 'B4'],
+                'server_indices': True,
+                'scales': {'DEM': 10, 'Slope': 100}
+            }
+        },
+        'index_scale': 10000,
         'sentinel2': {
             'collection': 'COPERNICUS/S2_SR_HARMONIZED',
             'bands': ['B2', 'B3', 'B4', 'B8', 'B11', 'B12'],
             'date_start': '2020-01-01',
             'date_end': '2024-12-31',
             'cloud_cover_max': 20,
-            'scale': 10
+            'scale': 10,
+            # 'least_cloudy' takes one whole scene; 'composite' cloud-masks the
+            # scenes in the composite window with SCL and mosaics them
+            'mode': os.getenv('S2_SCENE_MODE', 'least_cloudy'),
+            'composite': {
+                'method': 'median',  # or 'quality_mosaic' (greenest pixel wins)
+                'date_start': '2024-01-01',
+                'date_end': '2024-12-31',
+                'cloud_cover_max': 60,
+                'max_scenes': 16,
+                'masked_scl_classes': [3, 8, 9, 10, 11]  # shadow, cloud, cirrus, snow
+            }
+        },
+        # Scene lists are cached per region snapped to this grid and date window
+        'scene_cache': {
+            'grid_degrees': 0.1,
+            'ttl_seconds': 86400,
+            'max_entries': 1024
         },
         'dem': {
             'collection': 'USGS/SRTMGL1_003'
         }
-    }
\ No newline at end of file
+    }
+    
+    GEE_BATCH_CONFIG = {
+        'max_in_flight': int(os.getenv('GEE_MAX_IN_FLIGHT', '4')),
+        'merge_gap_km': 0.5,  # Fetch nearby sites together if their cells are this close
+        'max_sites': 200
+    }
+    
+    RENDER_CONFIG = {
+        'renderer': os.getenv('RENDERER', 'fast'),  # 'fast' (Pillow) or 'matplotlib'
+        'panel_size': 480,
+        'png_compress_level': 6,
+        'cache_entries': 64
+    }
+    
+    EXPORT_CONFIG = {
+        'zip_compression': os.getenv('ZIP_COMPRESSION', 'deflated'),  # 'deflated' or 'stored'
+        'zip_compress_level': int(os.getenv('ZIP_COMPRESS_LEVEL', 6)),
+        'store_float_arrays': True,  # float rasters barely deflate; skip the CPU cost
+        'chunk_bytes': 1024 * 1024,
+        'default_format': 'npy',  # 'npy', 'stack', 'zarr' or 'geotiff' (needs rasterio)
+        'tile_size': 256,  # GeoTIFF blocks and Zarr chunks
+        'raster_compression': 'deflate',
+        'zarr_compress_level': 1  # 0 writes uncompressed chunks
+    }
+    
+    TILE_CACHE = {
+        'enabled': os.getenv('TILE_CACHE_ENABLED', 'true').lower() == 'true',
+        'directory': Path(os.getenv(
+            'TILE_CACHE_DIR',
+            Path(tempfile.gettempdir()) / 'geoflow_tile_cache'
+        )),
+        'max_bytes': int(os.getenv('TILE_CACHE_MAX_MB', '2048')) * 1024 * 1024,
+        'ttl_seconds': int(os.getenv('TILE_CACHE_TTL_HOURS', '168')) * 3600,
+        'coordinate_decimals': 5  # ~1 m; nearer points share an entry
+    }
+    
+    ANALYSIS_CONFIG = {
+        'branch_workers': int(os.getenv('ANALYSIS_BRANCH_WORKERS', '8')),
+        'satellite_timeout_seconds': 180,
+        'enrichment_timeout_seconds': 120
+    }
+    
+    JOB_CONFIG = {
+        'max_workers': int(os.getenv('JOB_MAX_WORKERS', '4')),
+        'result_ttl_seconds': 3600,
+        'sse_keepalive_seconds': 15,
+        # Shared by every worker process so any of them can answer job polls;
+        # set JOB_STORE_PATH to an empty string to keep jobs in memory only
+        'store_path': os.getenv(
+            'JOB_STORE_PATH',
+            str(Path(tempfile.gettempdir()) / 'geoflow_jobs.sqlite3')
+        ),
+        'poll_seconds': 0.5  # How often other processes check a job's progress
+    }
+    
+    RATE_LIMIT_CONFIG = {
+        # Token buckets shared by every worker process, so request-rate limits
+        # hold for the whole server; empty keeps a bucket per process
+        'state_path': os.getenv(
+            'RATE_LIMIT_STATE_PATH',
+            str(Path(tempfile.gettempdir()) / 'geoflow_rate_limits.sqlite3')
+        )
+    }
+    
+    METRICS_CONFIG = {
+        'enabled': os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+        # Each process writes its values here so /metrics can report totals
+        # across gunicorn workers; empty keeps metrics per process
+        'directory': os.getenv(
+            'METRICS_DIR',
+            str(Path(tempfile.gettempdir()) / 'geoflow_metrics')
+        ),
+        'flush_seconds': 5
+    }
+    
+    # Production serving (gunicorn.conf.py); `python app.py` stays the dev server
+    SERVER_CONFIG = {
+        'bind': os.getenv('BIND', '0.0.0.0:8088'),
+        'workers': int(os.getenv('WEB_WORKERS', str(os.cpu_count() or 1))),
+        'threads': int(os.getenv('WEB_THREADS', '8')),  # Each open SSE stream holds one
+        # Longest request is /ai_analysis: both branches run concurrently,
+        # bounded by the slower timeout, plus response rendering
+        'timeout_seconds': int(os.getenv('WEB_TIMEOUT', '210')),
+        'graceful_timeout_seconds': int(os.getenv('WEB_GRACEFUL_TIMEOUT', '210')),
+        'keepalive_seconds': 5,
+        'max_requests': int(os.getenv('WEB_MAX_REQUESTS', '0')),  # 0 = never recycle
+        'warmup': os.getenv('WEB_WARMUP', 'true').lower() == 'true'
+    }
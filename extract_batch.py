@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Batch site extraction from the command line.
+
+Extracts sites from every PDF given (files or directories) and writes one
+JSON line per paper as soon as it finishes:
+
+    python extract_batch.py papers/ --workers 8 > sites.ndjson
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from config import Config
+from services.batch_service import iter_batch_extraction, find_pdfs
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Extract archaeological sites from many PDFs'
+    )
+    parser.add_argument('paths', nargs='+', help='PDF files or directories')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='Search directories recursively')
+    parser.add_argument('-w', '--workers', type=int,
+                        default=Config.BATCH_CONFIG['max_workers'],
+                        help='Papers processed concurrently')
+    parser.add_argument('-o', '--output', help='Write NDJSON here instead of stdout')
+    args = parser.parse_args()
+    
+    if not os.environ.get("GEMINI_API_KEY"):
+        print("Error: GEMINI_API_KEY not found in environment.", file=sys.stderr)
+        sys.exit(1)
+    
+    pdfs = find_pdfs(args.paths, recursive=args.recursive)
+    if not pdfs:
+        print("Error: no PDF files found.", file=sys.stderr)
+        sys.exit(1)
+    
+    output = open(args.output, 'w') if args.output else sys.stdout
+    failures = 0
+    
+    try:
+        for done, result in enumerate(
+                iter_batch_extraction(((str(p), p) for p in pdfs), args.workers), 1):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            
+            if not result['success']:
+                failures += 1
+            print(f"[{done}/{len(pdfs)}] {result['source']}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Gunicorn settings for production serving.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Every setting comes from Config.SERVER_CONFIG (WEB_WORKERS, WEB_THREADS,
+WEB_TIMEOUT, ...). Workers are threaded so streamed downloads and SSE job
+streams do not block a whole process.
+"""
+
+from config import Config
+
+settings = Config.SERVER_CONFIG
+
+bind = settings['bind']
+workers = settings['workers']
+worker_class = 'gthread'
+threads = settings['threads']
+
+timeout = settings['timeout_seconds']
+graceful_timeout = settings['graceful_timeout_seconds']
+keepalive = settings['keepalive_seconds']
+
+max_requests = settings['max_requests']
+max_requests_jitter = max_requests // 10
+
+# app.py only does cheap imports, so load it once in the master and fork.
+# Nothing opens connections at import time; clients and SQLite handles are
+# created per worker on first use or in the warm-up below.
+preload_app = True
+
+accesslog = None
+errorlog = '-'
+
+def on_starting(server):
+    # Counters from a previous run would otherwise be added to this one
+    from utils.metrics import reset_metrics_directory
+    reset_metrics_directory()
+
+def post_fork(server, worker):
+    # Never reuse HTTP connections inherited from the master
+    from services.llm_service import reset_gemini_client
+    reset_gemini_client()
+
+def post_worker_init(worker):
+    """Initialize Earth Engine and the Gemini client before taking requests"""
+    if not settings['warmup']:
+        return
+
+    from services.gee_service import gee_ready
+    from services.llm_service import get_gemini_client
+
+    if not gee_ready():
+        worker.log.warning('Google Earth Engine not initialized; GEE routes will fail')
+    try:
+        get_gemini_client()
+    except Exception as e:
+        worker.log.warning(f'Gemini client warm-up failed: {e}')
+
+def worker_exit(server, worker):
+    """Fail queued analysis jobs and let running ones finish"""
+    from services.job_service import shutdown_job_manager
+    from utils.metrics import REGISTRY
+
+    shutdown_job_manager()
+    REGISTRY.flush()
@@ -1,16 +1,29 @@
-from flask import Blueprint, request, jsonify
-import tempfile
-import os
-import base64
+from flask import Blueprint, request, jsonify, Response, url_for, stream_with_context
+import json
 
-from services.gee_service import extract_gee_data, initialize_gee
-from services.visualization_service import create_overview_visualization
-from services.llm_service import analyze_satellite_imagery, enrich_site_context
-from utils.coordinate_parser import parse_coordinate_string
+from config import Config
+from services.gee_service import gee_ready, resolve_grid
+from services.analysis_service import run_ai_analysis, analysis_succeeded
+from services.job_service import get_job_manager
 
 analysis_bp = Blueprint('analysis', __name__)
 
-GEE_INITIALIZED = initialize_gee()
+def analysis_job(data, report):
+    """Job wrapper: fail the job when neither analysis branch succeeded"""
+    result = run_ai_analysis(data, gee_ready, report)
+    
+    if not analysis_succeeded(result):
+        raise RuntimeError('Analysis failed: ' + '; '.join(result['errors']))
+    
+    return result
+
+def with_resolved_grid(data):
+    """Copy of the request with cell_size_km and pixels_per_km resolved,
+    as /preview_gee does, so resolution_m is honoured. Raises ValueError."""
+    cell_size_km, pixels_per_km = resolve_grid(
+        data.get('cell_size_km'), data.get('pixels_per_km'), data.get('resolution_m')
+    )
+    return dict(data, cell_size_km=cell_size_km, pixels_per_km=pixels_per_km)
 
 @analysis_bp.route('/ai_analysis', methods=['POST'])
 def ai_analysis():
@@ -18,81 +31,15 @@ def ai_analysis():
     
     try:
         data = request.get_json()
-        site_data = data.get('site_data', {})
-        site_name = site_data.get('site_name', 'Unknown Site')
-        
-        lat = data.get('latitude')
-        lon = data.get('longitude')
-        coordinates_raw = data.get('coordinates_raw', '')
-        
-        has_coordinates = lat is not None and lon is not None
-        
-        result = {
-            'site_name': site_name,
-            'has_coordinates': has_coordinates,
-            'visual_analysis': None,
-            'contextual_enrichment': None,
-            'errors': []
-        }
-        
-        if has_coordinates and GEE_INITIALIZED:
-            try:
-                if lat is None or lon is None:
-                    lat, lon = parse_coordinate_string(coordinates_raw)
-                
-                if lat is None or lon is None:
-                    result['errors'].append('Could not parse coordinates')
-                elif not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-                    result['errors'].append(f'Invalid coordinates: lat={lat}, lon={lon}')
-                else:
-                    gee_data = extract_gee_data(lat, lon, site_name)
-                    
-                    temp_png = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                    temp_png.close()
-                    
-                    create_overview_visualization(
-                        gee_data['channels'],
-                        site_name,
-                        temp_png.name
-                    )
-                    
-                    with open(temp_png.name, 'rb') as f:
-                        image_bytes = f.read()
-                        image_data = base64.b64encode(image_bytes).decode('utf-8')
-                    
-                    os.unlink(temp_png.name)
-                    
-                    visual_analysis = analyze_satellite_imagery(
-                        site_name, 
-                        gee_data['metadata'],
-                        image_data
-                    )
-                    
-                    visual_analysis['satellite_metadata'] = gee_data['metadata']
-                    visual_analysis['preview_image'] = image_data
-                    
-                    result['visual_analysis'] = visual_analysis
-                    
-            except Exception as e:
-                error_msg = f"Satellite analysis error: {str(e)}"
-                print(f"ERROR: {error_msg}")
-                import traceback
-                traceback.print_exc()
-                result['errors'].append(error_msg)
         
         try:
-            contextual_enrichment = enrich_site_context(site_data)
-            
-            result['contextual_enrichment'] = contextual_enrichment
-            
-        except Exception as e:
-            error_msg = f"Contextual enrichment error: {str(e)}"
-            print(f"ERROR: {error_msg}")
-            import traceback
-            traceback.print_exc()
-            result['errors'].append(error_msg)
+            data = with_resolved_grid(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
         
-        if result['visual_analysis'] or result['contextual_enrichment']:
+        result = run_ai_analysis(data, gee_ready)
+        
+        if analysis_succeeded(result):
             return jsonify({
                 'success': True,
                 'data': result
@@ -108,4 +55,76 @@ def ai_analysis():
         traceback.print_exc()
         return jsonify({
             'error': f'AI analysis error: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@analysis_bp.route('/ai_analysis/jobs', methods=['POST'])
+def submit_ai_analysis():
+    """Queue an AI analysis job and return its id immediately"""
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    
+    try:
+        data = with_resolved_grid(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job_id = get_job_manager().submit('ai_analysis', analysis_job, data)
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('analysis.ai_analysis_status', job_id=job_id),
+        'events_url': url_for('analysis.ai_analysis_events', job_id=job_id)
+    }), 202
+
+@analysis_bp.route('/ai_analysis/jobs/<job_id>', methods=['GET'])
+def ai_analysis_status(job_id):
+    """Poll the state of an AI analysis job"""
+    
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    
+    return jsonify(job)
+
+@analysis_bp.route('/ai_analysis/jobs/<job_id>/events', methods=['GET'])
+def ai_analysis_events(job_id):
+    """Stream job progress as server-sent events"""
+    
+    manager = get_job_manager()
+    if manager.get(job_id) is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    
+    keepalive = Config.JOB_CONFIG['sse_keepalive_seconds']
+    
+    def generate():
+        seen = 0
+        while True:
+            job = manager.wait(job_id, seen, keepalive)
+            if job is None:
+                yield sse_message('error', {'error': f'Job expired: {job_id}'})
+                return
+            
+            new_events = job['events'][seen:]
+            for event in new_events:
+                yield sse_message('stage', event)
+            seen += len(new_events)
+            
+            if job['status'] in ('completed', 'failed'):
+                yield sse_message('done', job)
+                return
+            
+            if not new_events:
+                yield ': keepalive\n\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def sse_message(event, payload):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
@@ -1,37 +1,15 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.utils import secure_filename
-import os
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import json
 
 from config import Config
-from utils.pdf_processor import extract_text_from_pdf
-from services.llm_service import extract_sites_with_llm
-from utils.coordinate_parser import parse_coordinate_string
+from services.extraction_service import extract_sites_from_upload
+from services.batch_service import iter_batch_extraction, find_pdfs, resolve_batch_directory
 
 extraction_bp = Blueprint('extraction', __name__)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
-def post_process_coordinates(extracted_data):
-    """Post-process extracted data to ensure coordinates are in decimal format"""
-    sites = extracted_data.get('sites', [])
-    
-    for site in sites:
-        coords = site.get('coordinates', {})
-        raw_text = coords.get('raw_text')
-        
-        if raw_text:
-            lat, lon = parse_coordinate_string(raw_text)
-            
-            if lat is not None and lon is not None:
-                coords['latitude'] = lat
-                coords['longitude'] = lon
-                coords['has_explicit_coordinates'] = True
-            else:
-                print(f"WARNING: Could not parse coordinates: '{raw_text}'")
-    
-    return extracted_data
-
 @extraction_bp.route('/extract', methods=['POST'])
 def extract():
     """Handle PDF upload and extraction"""
@@ -48,27 +26,60 @@ def extract():
         return jsonify({'error': 'Only PDF files are allowed'}), 400
     
     try:
-        filename = secure_filename(file.filename)
-        temp_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-        file.save(temp_path)
-        
-        paper_text = extract_text_from_pdf(temp_path)
-        
-        extracted_data = extract_sites_with_llm(paper_text)
-        
-        extracted_data = post_process_coordinates(extracted_data)
-        
-        os.remove(temp_path)
+        # Werkzeug already spooled the upload (memory, or a temp file for
+        # large bodies), so parse it in place
+        extracted_data, from_cache = extract_sites_from_upload(file.stream)
         
         return jsonify({
             'success': True,
+            'cached': from_cache,
             'data': extracted_data
         })
         
     except Exception as e:
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
-        
         return jsonify({
             'error': f'Processing error: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@extraction_bp.route('/extract_batch', methods=['POST'])
+def extract_batch():
+    """Extract many PDFs, streaming one JSON line per paper as it finishes"""
+    
+    files = [f for f in request.files.getlist('pdf_files') if f.filename]
+    directory = request.form.get('directory')
+    
+    rejected = [f.filename for f in files if not allowed_file(f.filename)]
+    if rejected:
+        return jsonify({'error': f'Only PDF files are allowed: {", ".join(rejected)}'}), 400
+    
+    sources = [(f.filename, f.stream) for f in files]
+    
+    if directory:
+        try:
+            root = resolve_batch_directory(directory)
+        except (PermissionError, FileNotFoundError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        recursive = request.form.get('recursive', 'false').lower() == 'true'
+        sources += [
+            (str(path.relative_to(root)), path)
+            for path in find_pdfs([root], recursive=recursive)
+        ]
+    
+    if not sources:
+        return jsonify({'error': 'No PDF files provided'}), 400
+    
+    workers = request.form.get('workers', type=int)
+    if workers is not None:
+        workers = max(1, min(workers, Config.BATCH_CONFIG['max_workers']))
+    
+    def generate():
+        for result in iter_batch_extraction(sources, workers):
+            yield json.dumps(result) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
@@ -1,21 +1,28 @@
-from flask import Blueprint, request, jsonify, send_file
-import tempfile
-import os
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import base64
+import json
 
-from services.gee_service import extract_gee_data, initialize_gee
-from services.visualization_service import create_overview_visualization, package_data_as_zip
+from services.gee_service import gee_ready, resolve_grid, resolve_index_names
+from services.tile_cache import cached_extract_gee_data
+from services.gee_batch_service import iter_batch_gee_data
+from services.visualization_service import render_overview_png
+from services.export_service import (
+    EXPORT_FORMATS, SITE_WRITERS, iter_zip_stream, write_site_entries, write_geotiff
+)
+from config import Config
 from utils.coordinate_parser import parse_coordinate_string
 
 gee_bp = Blueprint('gee', __name__)
 
-GEE_INITIALIZED = initialize_gee()
+def safe_filename(site_name):
+    return "".join(c if c.isalnum() or c in ('-', '_') else '_' 
+                   for c in site_name)
 
 @gee_bp.route('/download_gee', methods=['POST'])
 def download_gee():
     """Handle GEE data extraction and download"""
     
-    if not GEE_INITIALIZED:
+    if not gee_ready():
         return jsonify({
             'error': 'Google Earth Engine not initialized. Please configure service account.'
         }), 500
@@ -28,6 +35,12 @@ def download_gee():
         
         lat = data.get('latitude')
         lon = data.get('longitude')
+        export_format = data.get('format', Config.EXPORT_CONFIG['default_format'])
+        
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({
+                'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+            }), 400
         
         if lat is None or lon is None:
             lat, lon = parse_coordinate_string(coordinates_raw)
@@ -42,32 +55,40 @@ def download_gee():
                 'error': f'Invalid coordinates: lat={lat}, lon={lon}'
             }), 400
         
-        gee_data = extract_gee_data(lat, lon, site_name)
-        
-        safe_site_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' 
-                                for c in site_name)
-        zip_filename = f"{safe_site_name}_{lat:.4f}_{lon:.4f}.zip"
-        
-        temp_zip = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
-        temp_zip.close()
-        
-        package_data_as_zip(gee_data, safe_site_name, temp_zip.name)
-        
-        response = send_file(
-            temp_zip.name,
-            as_attachment=True,
-            download_name=zip_filename,
-            mimetype='application/zip'
+        try:
+            cell_size_km, pixels_per_km = resolve_grid(
+                data.get('cell_size_km'), data.get('pixels_per_km'), data.get('resolution_m')
+            )
+            indices = resolve_index_names(data.get('indices'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        gee_data = cached_extract_gee_data(
+            lat, lon, site_name, cell_size_km=cell_size_km, pixels_per_km=pixels_per_km,
+            indices=indices
         )
         
-        @response.call_on_close
-        def cleanup():
-            try:
-                os.unlink(temp_zip.name)
-            except:
-                pass
+        safe_site_name = safe_filename(site_name)
+        base_filename = f"{safe_site_name}_{lat:.4f}_{lon:.4f}"
         
-        return response
+        if export_format == 'geotiff':
+            try:
+                tiff = write_geotiff(gee_data)
+            except ImportError as e:
+                return jsonify({'error': str(e)}), 501
+            
+            return Response(
+                tiff,
+                mimetype='image/tiff',
+                headers={'Content-Disposition': f'attachment; filename="{base_filename}.tif"'}
+            )
+        
+        # Entries are serialized from memory and sent as they are written
+        write_entries = SITE_WRITERS[export_format]
+        return zip_response(
+            lambda zipf: write_entries(zipf, gee_data, safe_site_name),
+            f"{base_filename}.zip"
+        )
         
     except Exception as e:
         import traceback
@@ -80,7 +101,7 @@ def download_gee():
 def preview_gee():
     """Handle GEE data extraction and return preview image"""
     
-    if not GEE_INITIALIZED:
+    if not gee_ready():
         return jsonify({
             'error': 'Google Earth Engine not initialized. Please configure service account.'
         }), 500
@@ -107,21 +128,21 @@ def preview_gee():
                 'error': f'Invalid coordinates: lat={lat}, lon={lon}'
             }), 400
         
-        gee_data = extract_gee_data(lat, lon, site_name)
-        
-        temp_png = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-        temp_png.close()
-        
-        create_overview_visualization(
-            gee_data['channels'], 
-            site_name, 
-            temp_png.name
+        try:
+            cell_size_km, pixels_per_km = resolve_grid(
+                data.get('cell_size_km'), data.get('pixels_per_km'), data.get('resolution_m')
+            )
+            indices = resolve_index_names(data.get('indices'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Rendering needs RGB, the indices and terrain only, computed server-side
+        gee_data = cached_extract_gee_data(
+            lat, lon, site_name, cell_size_km=cell_size_km, pixels_per_km=pixels_per_km,
+            indices=indices, profile='preview'
         )
         
-        with open(temp_png.name, 'rb') as f:
-            image_data = base64.b64encode(f.read()).decode('utf-8')
-        
-        os.unlink(temp_png.name)
+        image_data = render_preview(gee_data, site_name)
         
         return jsonify({
             'success': True,
@@ -134,4 +155,94 @@ def preview_gee():
         traceback.print_exc()
         return jsonify({
             'error': f'Preview generation error: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+def render_preview(gee_data, site_name):
+    """Render the overview panel in memory and base64-encode it for JSON"""
+    png = render_overview_png(gee_data['channels'], site_name)
+    return base64.b64encode(png).decode('utf-8')
+
+@gee_bp.route('/gee_batch', methods=['POST'])
+def gee_batch():
+    """Extract GEE data for many sites as streamed NDJSON or one combined ZIP"""
+    
+    if not gee_ready():
+        return jsonify({
+            'error': 'Google Earth Engine not initialized. Please configure service account.'
+        }), 500
+    
+    data = request.get_json(silent=True) or {}
+    sites = data.get('sites')
+    output_format = data.get('format', 'ndjson')
+    
+    if not isinstance(sites, list) or not sites:
+        return jsonify({'error': 'Expected a non-empty "sites" list'}), 400
+    if len(sites) > Config.GEE_BATCH_CONFIG['max_sites']:
+        return jsonify({
+            'error': f"At most {Config.GEE_BATCH_CONFIG['max_sites']} sites per batch"
+        }), 400
+    if output_format not in ('ndjson', 'zip'):
+        return jsonify({'error': 'format must be "ndjson" or "zip"'}), 400
+    
+    sites = [site if isinstance(site, dict) else {} for site in sites]
+    
+    if output_format == 'zip':
+        return download_gee_batch_zip(sites)
+    
+    include_preview = data.get('include_preview', True)
+    
+    def generate():
+        for result in iter_batch_gee_data(sites):
+            line = {'index': result['index'], 'site_name': result['site_name']}
+            
+            if 'error' in result:
+                line.update(success=False, error=result['error'])
+            else:
+                line.update(success=True, metadata=result['data']['metadata'])
+                if include_preview:
+                    try:
+                        line['image'] = render_preview(result['data'], result['site_name'])
+                    except Exception as e:
+                        line['preview_error'] = str(e)
+            
+            yield json.dumps(line) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+def zip_response(write_entries, filename):
+    """Stream a ZIP built by write_entries(zipf) as an attachment"""
+    return Response(
+        stream_with_context(iter_zip_stream(write_entries)),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def download_gee_batch_zip(sites):
+    """Stream every site of a batch into one ZIP, one folder per site"""
+    def write_entries(zipf):
+        errors = []
+        try:
+            for result in iter_batch_gee_data(sites):
+                folder = f"{result['index']:03d}_{safe_filename(result['site_name'] or 'site')}"
+                if 'error' in result:
+                    errors.append({'index': result['index'],
+                                   'site_name': result['site_name'],
+                                   'error': result['error']})
+                    continue
+                yield from write_site_entries(zipf, result['data'], folder)
+        except Exception as e:
+            # Headers are already sent; record the failure inside the archive
+            import traceback
+            traceback.print_exc()
+            errors.append({'error': f'GEE extraction error: {str(e)}'})
+        
+        zipf.writestr('errors.json', json.dumps(errors, indent=2))
+    
+    return zip_response(write_entries, 'gee_batch.zip')
@@ -0,0 +1,30 @@
+from flask import Blueprint, Response, jsonify
+
+from services.llm_cache import get_llm_cache
+from services.tile_cache import get_tile_cache
+from services.gee_service import get_scene_cache
+from utils.metrics import REGISTRY
+
+status_bp = Blueprint('status', __name__)
+
+@status_bp.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Report hit/miss counters for the service caches"""
+    
+    llm_cache = get_llm_cache()
+    tile_cache = get_tile_cache()
+    
+    return jsonify({
+        'llm_cache': llm_cache.stats() if llm_cache else None,
+        'tile_cache': tile_cache.stats() if tile_cache else None,
+        'scene_cache': get_scene_cache().stats()
+    })
+
+@status_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of stage timings, round trips and cache hits"""
+    
+    return Response(
+        REGISTRY.render(),
+        mimetype='text/plain; version=0.0.4; charset=utf-8'
+    )
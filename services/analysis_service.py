@@ -0,0 +1,193 @@
+import base64
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+from config import Config
+from services.tile_cache import cached_extract_gee_data
+from services.visualization_service import render_overview_png
+from services.llm_service import analyze_satellite_imagery, enrich_site_context
+from utils.coordinate_parser import parse_coordinate_string
+from utils.metrics import STAGE_SECONDS
+
+# Shared so a timed-out branch never blocks the request on executor shutdown
+_branch_executor = ThreadPoolExecutor(
+    max_workers=Config.ANALYSIS_CONFIG['branch_workers'],
+    thread_name_prefix='analysis'
+)
+
+def _noop_report(stage, status, **details):
+    pass
+
+@contextmanager
+def _stage(name, report, timings):
+    """Report a pipeline stage and record how long it took"""
+    report(name, 'running')
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[name] = round(elapsed, 3)
+        STAGE_SECONDS.observe(elapsed, stage=f'analysis.{name}')
+    report(name, 'completed', seconds=timings[name])
+
+def run_satellite_analysis(site_name, lat, lon, coordinates_raw,
+                           report=_noop_report, timings=None, grid=None):
+    """Extract GEE data, render the overview and run Gemini Vision on it.
+
+    grid optionally holds request-level cell_size_km / pixels_per_km.
+    """
+    timings = {} if timings is None else timings
+    
+    if lat is None or lon is None:
+        lat, lon = parse_coordinate_string(coordinates_raw)
+
+    if lat is None or lon is None:
+        raise ValueError('Could not parse coordinates')
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        raise ValueError(f'Invalid coordinates: lat={lat}, lon={lon}')
+
+    with _stage('satellite_data', report, timings):
+        gee_data = cached_extract_gee_data(
+            lat, lon, site_name, report=report, profile='preview', **(grid or {})
+        )
+
+    with _stage('render', report, timings):
+        image_bytes = render_overview_png(gee_data['channels'], site_name)
+
+    with _stage('visual_analysis', report, timings):
+        visual_analysis = analyze_satellite_imagery(
+            site_name,
+            gee_data['metadata'],
+            image_bytes
+        )
+
+    visual_analysis['satellite_metadata'] = gee_data['metadata']
+    # The only base64 step: the preview goes out in the JSON response
+    visual_analysis['preview_image'] = base64.b64encode(image_bytes).decode('utf-8')
+
+    return visual_analysis
+
+def run_contextual_enrichment(site_data, report=_noop_report, timings=None):
+    """Run the search-grounded enrichment branch"""
+    timings = {} if timings is None else timings
+    
+    with _stage('contextual_enrichment', report, timings):
+        return enrich_site_context(site_data)
+
+def _collect_branch(branch, limit, label, result, report, stage):
+    """Wait for a branch and file its output or error into result.
+
+    The limit counts from when the branch starts running, so time spent
+    queued behind other analyses is not charged to it; a branch that does
+    not even start within the limit is cancelled before it spends quota.
+    """
+    future, started = branch
+    try:
+        if not started.wait(limit):
+            raise FutureTimeoutError()
+        return future.result(timeout=max(started.at + limit - time.perf_counter(), 0))
+    except FutureTimeoutError:
+        # Only stops a branch still queued; a running one finishes unread
+        future.cancel()
+        error_msg = f"{label} error: timed out after {limit}s"
+    except Exception as e:
+        error_msg = f"{label} error: {str(e)}"
+        traceback.print_exception(e)
+    
+    print(f"ERROR: {error_msg}")
+    result['errors'].append(error_msg)
+    report(stage, 'failed', error=error_msg)
+    return None
+
+def _submit_branch(func, timings, name, *args):
+    """Submit a timed branch; returns (future, started).
+
+    started is set, with its start time in started.at, once a worker
+    picks the branch up.
+    """
+    started = threading.Event()
+    
+    def run():
+        started.at = time.perf_counter()
+        started.set()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started.at
+            timings[name] = round(elapsed, 3)
+            STAGE_SECONDS.observe(elapsed, stage=f'analysis.{name}')
+    
+    return _branch_executor.submit(run), started
+
+def run_ai_analysis(data, gee_ready, report=_noop_report):
+    """Run the full AI analysis pipeline for one site.
+
+    The satellite branch (GEE extraction, render, Gemini Vision) and the
+    contextual enrichment branch are independent, so they run concurrently
+    with their own timeouts. ``report(stage, status, **details)`` is called
+    as each stage starts, completes or fails so callers can surface
+    progress. gee_ready() is only called for sites with coordinates, so
+    text-only analyses never initialize Earth Engine.
+    """
+    start = time.perf_counter()
+    settings = Config.ANALYSIS_CONFIG
+    
+    site_data = data.get('site_data', {})
+    site_name = site_data.get('site_name', 'Unknown Site')
+
+    lat = data.get('latitude')
+    lon = data.get('longitude')
+    coordinates_raw = data.get('coordinates_raw', '')
+
+    has_coordinates = lat is not None and lon is not None
+    grid = {
+        'cell_size_km': data.get('cell_size_km'),
+        'pixels_per_km': data.get('pixels_per_km')
+    }
+
+    timings = {}
+    result = {
+        'site_name': site_name,
+        'has_coordinates': has_coordinates,
+        'visual_analysis': None,
+        'contextual_enrichment': None,
+        'errors': []
+    }
+
+    satellite_branch = None
+    if has_coordinates and gee_ready():
+        satellite_branch = _submit_branch(
+            run_satellite_analysis, timings, 'satellite_branch',
+            site_name, lat, lon, coordinates_raw, report, timings, grid
+        )
+
+    enrichment_branch = _submit_branch(
+        run_contextual_enrichment, timings, 'enrichment_branch',
+        site_data, report, timings
+    )
+
+    # Each timeout counts from its own branch's start, so the enrichment
+    # wait does not restart once the satellite branch has finished
+    if satellite_branch is not None:
+        result['visual_analysis'] = _collect_branch(
+            satellite_branch, settings['satellite_timeout_seconds'],
+            'Satellite analysis', result, report, 'visual_analysis'
+        )
+
+    result['contextual_enrichment'] = _collect_branch(
+        enrichment_branch, settings['enrichment_timeout_seconds'],
+        'Contextual enrichment', result, report, 'contextual_enrichment'
+    )
+
+    # Copy: a timed-out branch may still write its timing later
+    result['timings'] = dict(timings, total=round(time.perf_counter() - start, 3))
+    
+    return result
+
+def analysis_succeeded(result):
+    """True when at least one analysis branch produced output"""
+    return bool(result['visual_analysis'] or result['contextual_enrichment'])
@@ -0,0 +1,81 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from config import Config
+from services.extraction_service import extract_sites_from_upload
+
+def find_pdfs(paths, recursive=False):
+    """Expand files and directories into a sorted list of PDF paths"""
+    found = []
+    
+    for path in map(Path, paths):
+        if path.is_dir():
+            pattern = '**/*' if recursive else '*'
+            found.extend(p for p in path.glob(pattern)
+                         if p.is_file() and p.suffix.lower() == '.pdf')
+        else:
+            found.append(path)
+    
+    return sorted(found)
+
+def resolve_batch_directory(directory):
+    """Resolve a client-supplied directory inside BATCH_CONFIG['directory_root']"""
+    root = Config.BATCH_CONFIG['directory_root']
+    if not root:
+        raise PermissionError('Directory batches are disabled on this server')
+    
+    root = Path(root).resolve()
+    resolved = (root / directory).resolve()
+    
+    if resolved != root and root not in resolved.parents:
+        raise PermissionError(f'Directory is outside the batch root: {directory}')
+    if not resolved.is_dir():
+        raise FileNotFoundError(f'Not a directory: {directory}')
+    
+    return resolved
+
+def _process_source(name, source):
+    """Extract one paper; source is a path or a binary stream"""
+    start = time.perf_counter()
+    
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as stream:
+                extracted_data, from_cache = extract_sites_from_upload(stream)
+        else:
+            extracted_data, from_cache = extract_sites_from_upload(source)
+    except Exception as e:
+        return {
+            'source': name,
+            'success': False,
+            'error': f'Processing error: {str(e)}',
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+    
+    return {
+        'source': name,
+        'success': True,
+        'cached': from_cache,
+        'data': extracted_data,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+def iter_batch_extraction(sources, max_workers=None):
+    """Extract many papers on a bounded pool, yielding results as they finish.
+
+    sources is an iterable of (name, path_or_stream) pairs. Gemini calls
+    made by the workers share the process-wide concurrency cap and rate
+    limit, so extra workers stop helping once that limit is reached.
+    """
+    max_workers = max_workers or Config.BATCH_CONFIG['max_workers']
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch') as executor:
+        futures = [
+            executor.submit(_process_source, name, source)
+            for name, source in sources
+        ]
+        
+        for future in as_completed(futures):
+            yield future.result()
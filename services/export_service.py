@@ -0,0 +1,291 @@
+import json
+import time
+import zipfile
+import zlib
+
+import numpy as np
+
+from config import Config
+from services.gee_service import grid_bounds
+from services.visualization_service import render_overview_png
+
+EXPORT_FORMATS = ('npy', 'stack', 'zarr', 'geotiff')
+
+def _import_rasterio():
+    try:
+        import rasterio
+    except ImportError:
+        raise ImportError("rasterio not installed. Run: pip install -r requirements-geotiff.txt")
+    return rasterio
+
+class _ChunkSink:
+    """Write-only, non-seekable target that collects ZIP output for streaming.
+
+    Having no tell()/seek() makes zipfile write data descriptors after each
+    entry instead of rewinding to patch local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+def _zip_compression():
+    settings = Config.EXPORT_CONFIG
+    if settings['zip_compression'] == 'stored':
+        return zipfile.ZIP_STORED, None
+    return zipfile.ZIP_DEFLATED, settings['zip_compress_level']
+
+def _open_entry(zipf, name, stored=False, size_hint=0):
+    """Open a ZIP entry for writing; stored entries skip compression"""
+    if stored:
+        name = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        name.compress_type = zipfile.ZIP_STORED
+        name.external_attr = 0o600 << 16
+    return zipf.open(name, 'w', force_zip64=size_hint > zipfile.ZIP64_LIMIT // 2)
+
+def _write_npy(zipf, name, arrays, shape, dtype):
+    """Write arrays back to back as one .npy entry of the given shape.
+
+    Data is copied out chunk by chunk and the generator yields after each
+    chunk, so a streaming caller can flush the output without ever holding
+    the serialized array.
+    """
+    settings = Config.EXPORT_CONFIG
+    stored = settings['store_float_arrays'] and dtype.kind == 'f'
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+
+    header = {
+        'descr': np.lib.format.dtype_to_descr(dtype),
+        'fortran_order': False,
+        'shape': tuple(shape)
+    }
+
+    with _open_entry(zipf, name, stored, nbytes) as entry:
+        np.lib.format.write_array_header_1_0(entry, header)
+
+        for array in arrays:
+            array = np.asanyarray(array).astype(dtype, copy=False)
+            flat = array.reshape(-1) if array.flags.c_contiguous else None
+            rows = array.reshape(array.shape[0], -1) if array.ndim > 1 else array.reshape(-1, 1)
+            row_bytes = max(rows.shape[1] * dtype.itemsize, 1)
+            step = max(settings['chunk_bytes'] // row_bytes, 1)
+
+            for start in range(0, len(rows), step):
+                if flat is not None:
+                    chunk = flat[start * rows.shape[1]:(start + step) * rows.shape[1]]
+                else:
+                    chunk = np.ascontiguousarray(rows[start:start + step])
+                entry.write(memoryview(chunk).cast('B'))
+                yield
+
+def write_npy_entry(zipf, name, array):
+    """Write array as a .npy entry straight from memory, chunk by chunk"""
+    array = np.asanyarray(array)
+    yield from _write_npy(zipf, name, [array], array.shape, array.dtype)
+
+def site_geotransform(metadata, shape):
+    """GDAL-order geotransform (EPSG:4326) of a cell from its grid bounds"""
+    min_lon, min_lat, max_lon, max_lat = grid_bounds(
+        metadata['latitude'], metadata['longitude'], metadata['cell_size_km']
+    )
+    height, width = shape
+    return (min_lon, (max_lon - min_lon) / width, 0.0,
+            max_lat, 0.0, -(max_lat - min_lat) / height)
+
+def georeference(data):
+    """Band order, shape and placement shared by the stacked export formats"""
+    names = list(data['channels'])
+    shape = np.shape(data['channels'][names[0]])
+    metadata = data['metadata']
+
+    return {
+        'channels': names,
+        'shape': [len(names), *shape],
+        'crs': 'EPSG:4326',
+        'bounds': list(grid_bounds(metadata['latitude'], metadata['longitude'],
+                                   metadata['cell_size_km'])),
+        'geotransform': list(site_geotransform(metadata, shape))
+    }
+
+def write_site_entries(zipf, data, site_name):
+    """Write one site's channels, overview and metadata; yields between chunks"""
+    for channel_name, array in data['channels'].items():
+        yield from write_npy_entry(zipf, f"{site_name}/channels/{channel_name}.npy", array)
+
+    try:
+        png = render_overview_png(data['channels'], site_name)
+        with _open_entry(zipf, f"{site_name}/visualizations/overview.png", stored=True) as entry:
+            entry.write(png)
+    except Exception as e:
+        print(f"ERROR: Failed to create visualization - {str(e)}")
+    yield
+
+    metadata_str = json.dumps(data['metadata'], indent=2)
+    zipf.writestr(f"{site_name}/metadata.json", metadata_str)
+    yield
+
+def write_stack_entries(zipf, data, site_name):
+    """Write all channels as one (band, y, x) float32 .npy plus metadata.
+
+    The stack is STORED by default, so once unpacked it can be opened with
+    ``np.load(..., mmap_mode='r')`` and read one window at a time.
+    """
+    geo = georeference(data)
+    arrays = [data['channels'][name] for name in geo['channels']]
+
+    yield from _write_npy(zipf, f"{site_name}/stack.npy", arrays,
+                          geo['shape'], np.dtype(np.float32))
+
+    metadata = dict(data['metadata'], **geo)
+    zipf.writestr(f"{site_name}/metadata.json", json.dumps(metadata, indent=2))
+    yield
+
+def write_zarr_entries(zipf, data, site_name):
+    """Write the channels as a Zarr v2 group with one chunked (band, y, x) array.
+
+    Chunks are zlib-compressed (numcodecs ``zlib``) and STORED in the ZIP,
+    so the archive opens directly with ``zarr.ZipStore`` or can be unpacked
+    into a directory store; readers fetch only the chunks they touch.
+    """
+    settings = Config.EXPORT_CONFIG
+    geo = georeference(data)
+    bands, height, width = geo['shape']
+    tile = settings['tile_size']
+    level = settings['zarr_compress_level']
+    root = f"{site_name}/data.zarr"
+
+    def write_json(name, value):
+        zipf.writestr(f"{root}/{name}", json.dumps(value, indent=2))
+
+    write_json('.zgroup', {'zarr_format': 2})
+    write_json('.zattrs', dict(data['metadata'], **geo))
+    write_json('bands/.zarray', {
+        'zarr_format': 2,
+        'shape': [bands, height, width],
+        'chunks': [1, tile, tile],
+        'dtype': np.dtype(np.float32).str,
+        'compressor': {'id': 'zlib', 'level': level} if level else None,
+        'fill_value': 'NaN',
+        'order': 'C',
+        'filters': None,
+        'dimension_separator': '.'
+    })
+    write_json('bands/.zattrs', {
+        '_ARRAY_DIMENSIONS': ['band', 'y', 'x'],
+        'band_names': geo['channels']
+    })
+
+    # Edge chunks are padded to full size with the fill value, as Zarr expects
+    chunk = np.empty((tile, tile), dtype=np.float32)
+    for b, name in enumerate(geo['channels']):
+        array = np.asarray(data['channels'][name])
+        for i, y in enumerate(range(0, height, tile)):
+            for j, x in enumerate(range(0, width, tile)):
+                window = array[y:y + tile, x:x + tile]
+                chunk.fill(np.nan)
+                chunk[:window.shape[0], :window.shape[1]] = window
+                payload = zlib.compress(chunk.tobytes(), level) if level else chunk.tobytes()
+                with _open_entry(zipf, f"{root}/bands/{b}.{i}.{j}", stored=True) as entry:
+                    entry.write(payload)
+            yield
+
+def _overview_factors(shape, tile):
+    """Decimation factors until the coarsest level fits inside one block"""
+    factors = []
+    factor = 2
+    while max(shape) / (factor // 2) > tile and min(shape) // factor >= 16:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+def write_geotiff(data):
+    """Return the channel stack as a cloud-optimized GeoTIFF (bytes).
+
+    One float32 band per channel, tiled and deflate-compressed, with
+    average-resampled overviews stored ahead of the full-resolution data and
+    the EPSG:4326 transform from the cell's grid bounds. Requires rasterio.
+    """
+    rasterio = _import_rasterio()
+    from rasterio.enums import Resampling
+    from rasterio.io import MemoryFile
+    from rasterio.shutil import copy as copy_dataset
+    from rasterio.transform import Affine
+
+    settings = Config.EXPORT_CONFIG
+    geo = georeference(data)
+    bands, height, width = geo['shape']
+    tile = settings['tile_size']
+
+    layout = {
+        'tiled': True,
+        'blockxsize': tile,
+        'blockysize': tile,
+        'compress': settings['raster_compression'],
+        'predictor': 3,
+        'interleave': 'band'
+    }
+
+    with MemoryFile() as staging, MemoryFile() as output:
+        with staging.open(driver='GTiff', width=width, height=height, count=bands,
+                          dtype='float32', crs=geo['crs'], nodata=float('nan'),
+                          transform=Affine.from_gdal(*geo['geotransform']),
+                          **layout) as dst:
+            for index, name in enumerate(geo['channels'], 1):
+                dst.write(np.asarray(data['channels'][name], dtype=np.float32), index)
+                dst.set_band_description(index, name)
+
+            dst.update_tags(**{key: str(value) for key, value in data['metadata'].items()})
+
+            factors = _overview_factors((height, width), tile)
+            if factors:
+                dst.build_overviews(factors, Resampling.average)
+                dst.update_tags(ns='rio_overview', resampling='average')
+
+        # Copying with the overviews puts them ahead of the data: the COG layout
+        with staging.open() as src:
+            copy_dataset(src, output.name, driver='GTiff', copy_src_overviews=True, **layout)
+
+        return output.read()
+
+SITE_WRITERS = {
+    'npy': write_site_entries,
+    'stack': write_stack_entries,
+    'zarr': write_zarr_entries
+}
+
+def add_site_to_zip(zipf, data, site_name):
+    """Write one site's channels, overview and metadata into an open ZIP"""
+    for _ in write_site_entries(zipf, data, site_name):
+        pass
+
+def package_data_as_zip(data, site_name, output_path):
+    """Package extracted data as a ZIP file"""
+    compression, level = _zip_compression()
+    with zipfile.ZipFile(output_path, 'w', compression, compresslevel=level) as zipf:
+        add_site_to_zip(zipf, data, site_name)
+
+def iter_zip_stream(write_entries):
+    """Yield a ZIP archive as byte chunks while it is being built.
+
+    write_entries(zipf) is a generator that writes entries into zipf and
+    yields whenever buffered output may be sent on.
+    """
+    sink = _ChunkSink()
+    compression, level = _zip_compression()
+
+    with zipfile.ZipFile(sink, 'w', compression, compresslevel=level) as zipf:
+        for _ in write_entries(zipf):
+            yield from sink.drain()
+
+    # Central directory, written on close
+    yield from sink.drain()
@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import Future
+
+from services.llm_cache import get_llm_cache, make_request_key
+from services.llm_service import extract_sites_with_llm
+from prompts.extraction_prompt import create_extraction_prompt
+from utils.pdf_processor import extract_text_from_pdf, hash_pdf
+from utils.coordinate_parser import parse_coordinate_string
+
+# Uploads currently being processed, so identical concurrent uploads share
+# one extraction
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def post_process_coordinates(extracted_data):
+    """Post-process extracted data to ensure coordinates are in decimal format"""
+    sites = extracted_data.get('sites', [])
+    
+    for site in sites:
+        coords = site.get('coordinates', {})
+        raw_text = coords.get('raw_text')
+        
+        if raw_text:
+            lat, lon = parse_coordinate_string(raw_text)
+            
+            if lat is not None and lon is not None:
+                coords['latitude'] = lat
+                coords['longitude'] = lon
+                coords['has_explicit_coordinates'] = True
+            else:
+                print(f"WARNING: Could not parse coordinates: '{raw_text}'")
+    
+    return extracted_data
+
+def _paper_cache_key(file_hash):
+    # The empty-paper prompt stands in for the prompt template, so editing
+    # the template invalidates earlier results
+    return make_request_key('paper', {
+        'contents': [file_hash, create_extraction_prompt('')]
+    })
+
+def _is_complete(extracted_data):
+    """False for parse failures and chunked runs with failed windows, which
+    a retry could still improve and so must not be stored per paper"""
+    if 'parse_error' in extracted_data:
+        return False
+    chunked = (extracted_data.get('extraction_summary') or {}).get('chunked') or {}
+    return not chunked.get('failed_windows')
+
+def extract_sites_from_pdf(source, file_hash):
+    """Run text extraction, Gemini extraction and coordinate clean-up"""
+    paper_text = extract_text_from_pdf(source, file_hash=file_hash)
+    
+    extracted_data = extract_sites_with_llm(paper_text)
+    
+    return post_process_coordinates(extracted_data)
+
+def extract_sites_from_upload(stream):
+    """Extract sites from an uploaded PDF stream.
+
+    The stream is hashed in one pass and then parsed in place. Papers that
+    were already processed return their stored result without parsing or
+    calling Gemini. Returns (extracted_data, from_cache).
+    """
+    file_hash = hash_pdf(stream)
+    cache = get_llm_cache()
+    key = _paper_cache_key(file_hash)
+    
+    if cache is not None:
+        cached = cache.get('paper', key)
+        if cached is not None:
+            return cached, True
+    
+    with _in_flight_lock:
+        pending = _in_flight.get(file_hash)
+        owner = pending is None
+        if owner:
+            pending = _in_flight[file_hash] = Future()
+    
+    if not owner:
+        return pending.result(), True
+    
+    try:
+        extracted_data = extract_sites_from_pdf(stream, file_hash)
+        
+        if cache is not None and _is_complete(extracted_data):
+            cache.set('paper', key, extracted_data)
+        
+        pending.set_result(extracted_data)
+        return extracted_data, False
+    except Exception as e:
+        pending.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[file_hash]
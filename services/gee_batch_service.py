@@ -0,0 +1,177 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from config import Config
+from services.gee_service import extract_region, grid_bounds, grid_shape, build_site_metadata
+from services.tile_cache import extraction_cache_key, get_tile_cache
+from utils.coordinate_parser import parse_coordinate_string
+
+_in_flight = threading.BoundedSemaphore(Config.GEE_BATCH_CONFIG['max_in_flight'])
+
+def normalize_site(site):
+    """Accept /extract site records or flat {site_name, latitude, longitude}"""
+    coords = site.get('coordinates') or {}
+    site_name = site.get('site_name') or 'unknown_site'
+    
+    lat = site.get('latitude', coords.get('latitude'))
+    lon = site.get('longitude', coords.get('longitude'))
+    
+    if lat is None or lon is None:
+        raw = site.get('coordinates_raw') or coords.get('raw_text') or ''
+        lat, lon = parse_coordinate_string(raw)
+        if lat is None or lon is None:
+            raise ValueError(f'Could not parse coordinates from: {raw}')
+    
+    lat, lon = float(lat), float(lon)
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        raise ValueError(f'Invalid coordinates: lat={lat}, lon={lon}')
+    
+    return {'site_name': site_name, 'latitude': lat, 'longitude': lon}
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def _gap(a, b):
+    """Largest axis gap between two bounds in degrees (negative if they overlap)"""
+    return max(a[0] - b[2], b[0] - a[2], a[1] - b[3], b[1] - a[3])
+
+def _grid_shape(bounds, degrees_per_pixel):
+    return (
+        int(round((bounds[3] - bounds[1]) / degrees_per_pixel)),
+        int(round((bounds[2] - bounds[0]) / degrees_per_pixel))
+    )
+
+def plan_site_groups(sites):
+    """Group sites whose cells overlap or nearly touch into shared fetches.
+
+    A group only grows while its union still fits in one Earth Engine
+    sample request (GEE_CONFIG['max_pixels_per_tile']).
+    """
+    cell_size_km = Config.GEE_CONFIG['cell_size_km']
+    max_pixels = Config.GEE_CONFIG['max_pixels_per_tile']
+    
+    degrees_per_pixel = 1 / (111.32 * Config.GEE_CONFIG['pixels_per_km'])
+    max_gap = Config.GEE_BATCH_CONFIG['merge_gap_km'] / 111.32
+    
+    groups = []
+    for site in sorted(sites, key=lambda s: (s['longitude'], s['latitude'])):
+        bounds = grid_bounds(site['latitude'], site['longitude'], cell_size_km)
+        site['bounds'] = bounds
+        
+        for group in groups:
+            if _gap(group['bounds'], bounds) > max_gap:
+                continue
+            merged = _union(group['bounds'], bounds)
+            rows, cols = _grid_shape(merged, degrees_per_pixel)
+            if rows * cols <= max_pixels:
+                group['bounds'] = merged
+                group['sites'].append(site)
+                break
+        else:
+            groups.append({'bounds': bounds, 'sites': [site]})
+    
+    for group in groups:
+        group['shape'] = _grid_shape(group['bounds'], degrees_per_pixel)
+        group['degrees_per_pixel'] = degrees_per_pixel
+    
+    return groups
+
+def extract_group(group):
+    """Fetch a group's union region once and crop each site's cell from it"""
+    pixels_per_km = Config.GEE_CONFIG['pixels_per_km']
+    cell_size_km = Config.GEE_CONFIG['cell_size_km']
+    rows, cols = grid_shape(cell_size_km, pixels_per_km)
+    
+    if len(group['sites']) == 1:
+        shape = (rows, cols)
+    else:
+        shape = (max(group['shape'][0], rows), max(group['shape'][1], cols))
+    
+    with _in_flight:
+        channels, image_info = extract_region(group['bounds'], shape)
+    
+    results = []
+    for site in group['sites']:
+        row = int(round((group['bounds'][3] - site['bounds'][3]) / group['degrees_per_pixel']))
+        col = int(round((site['bounds'][0] - group['bounds'][0]) / group['degrees_per_pixel']))
+        row = min(max(row, 0), shape[0] - rows)
+        col = min(max(col, 0), shape[1] - cols)
+        
+        site_channels = {
+            name: np.ascontiguousarray(array[row:row + rows, col:col + cols])
+            for name, array in channels.items()
+        }
+        metadata = build_site_metadata(
+            site['site_name'], site['latitude'], site['longitude'],
+            cell_size_km, image_info, pixels_per_km
+        )
+        metadata['band_profile'] = 'full'
+        metadata['shared_fetch_sites'] = len(group['sites'])
+        
+        results.append((site, {'channels': site_channels, 'metadata': metadata}))
+    
+    return results
+
+def iter_batch_gee_data(raw_sites):
+    """Extract GEE data for many sites, yielding per-site results as they finish.
+
+    Yields dicts with 'index', 'site_name' and either 'data' or 'error'.
+    Cached sites are served from the tile cache first; the rest are
+    grouped and fetched concurrently with a cap on in-flight requests.
+    """
+    cache = get_tile_cache()
+    pending = []
+    
+    for index, raw_site in enumerate(raw_sites):
+        try:
+            site = normalize_site(raw_site)
+        except (ValueError, TypeError) as e:
+            yield {'index': index, 'site_name': raw_site.get('site_name'), 'error': str(e)}
+            continue
+        
+        site['index'] = index
+        # The 'full' profile with default indices is what extract_group fetches
+        site['cache_key'] = extraction_cache_key(site['latitude'], site['longitude'])
+        data = cache.get(site['cache_key']) if cache else None
+        
+        if data is None:
+            pending.append(site)
+            continue
+        
+        data['metadata'].update({
+            'site_name': site['site_name'],
+            'latitude': site['latitude'],
+            'longitude': site['longitude']
+        })
+        yield {'index': index, 'site_name': site['site_name'], 'data': data}
+    
+    if not pending:
+        return
+    
+    groups = plan_site_groups(pending)
+    workers = Config.GEE_BATCH_CONFIG['max_in_flight']
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gee-batch') as executor:
+        futures = {executor.submit(extract_group, group): group for group in groups}
+        
+        for future in as_completed(futures):
+            try:
+                site_results = future.result()
+            except Exception as e:
+                for site in futures[future]['sites']:
+                    yield {
+                        'index': site['index'],
+                        'site_name': site['site_name'],
+                        'error': f'GEE extraction error: {str(e)}'
+                    }
+                continue
+            
+            for site, data in site_results:
+                if cache:
+                    try:
+                        cache.put(site['cache_key'], data)
+                    except OSError as e:
+                        print(f"WARNING: Could not write tile cache entry: {str(e)}")
+                yield {'index': site['index'], 'site_name': site['site_name'], 'data': data}
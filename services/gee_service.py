@@ -1,12 +1,46 @@
-import ee
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import numpy as np
-from google.oauth2 import service_account
-from scipy.ndimage import zoom
 from config import Config
+from utils.lazy_import import LazyModule
+from utils.metrics import (
+    GEE_REQUESTS, GEE_REQUEST_SECONDS, GEE_RESPONSE_BYTES, record_cache, timed
+)
+from utils.rate_limiter import is_quota_error, make_throttle
+from utils.spectral_indices import (
+    REFLECTANCE_SCALE, SPECTRAL_INDICES, compute_indices, resolve_indices
+)
+
+# The Earth Engine client takes longer to import than the rest of the app,
+# so it is only loaded once a request needs it
+ee = LazyModule('ee', 'earthengine-api')
+
+# Every getInfo waits for a rate token and an adaptive concurrency slot
+_throttle = make_throttle(
+    'gee', Config.GEE_CONFIG['requests_per_second'], Config.GEE_CONFIG
+)
+
+# Shared so concurrent large-area requests cannot multiply tile round trips
+_tile_executor = ThreadPoolExecutor(
+    max_workers=Config.GEE_CONFIG['tile_workers'],
+    thread_name_prefix='gee-tile'
+)
+
+def _noop_report(stage, status, **details):
+    pass
+
+_gee_ready = None
+_gee_ready_lock = threading.Lock()
 
 def initialize_gee():
     """Initialize Google Earth Engine with service account"""
     try:
+        from google.oauth2 import service_account
+        
         if not Config.GEE_SERVICE_ACCOUNT_PATH.exists():
             print(f"ERROR: Service account file not found: {Config.GEE_SERVICE_ACCOUNT_PATH}")
             return False
@@ -23,8 +57,68 @@ def initialize_gee():
         print(f"ERROR initializing GEE: {str(e)}")
         return False
 
-def create_grid_bbox(lat, lon, cell_size_km):
-    """Create bounding box for extraction"""
+def gee_ready():
+    """Initialize Earth Engine on first use; later calls reuse the outcome.
+
+    Shared by every blueprint, so the service account is loaded and
+    ee.Initialize runs once per process.
+    """
+    global _gee_ready
+    
+    with _gee_ready_lock:
+        if _gee_ready is None:
+            _gee_ready = initialize_gee()
+    
+    return _gee_ready
+
+def resolve_grid(cell_size_km=None, pixels_per_km=None, resolution_m=None):
+    """Validated (cell_size_km, pixels_per_km) from request values or defaults.
+
+    resolution_m (metres per pixel) is an alternative to pixels_per_km.
+    Raises ValueError for values outside the configured limits.
+    """
+    config = Config.GEE_CONFIG
+    
+    if pixels_per_km is None and resolution_m is not None:
+        resolution_m = float(resolution_m)
+        if resolution_m <= 0:
+            raise ValueError(f'Invalid resolution: {resolution_m} m')
+        pixels_per_km = 1000 / resolution_m
+    
+    if cell_size_km is None:
+        cell_size_km = config['cell_size_km']
+    if pixels_per_km is None:
+        pixels_per_km = config['pixels_per_km']
+    
+    cell_size_km = float(cell_size_km)
+    pixels_per_km = float(pixels_per_km)
+    
+    if not 0 < cell_size_km <= config['max_cell_size_km']:
+        raise ValueError(
+            f"cell_size_km must be between 0 and {config['max_cell_size_km']}"
+        )
+    if not 0 < pixels_per_km <= config['max_pixels_per_km']:
+        raise ValueError(
+            f"pixels_per_km must be between 0 and {config['max_pixels_per_km']} "
+            f"(resolution of at least {1000 / config['max_pixels_per_km']:g} m)"
+        )
+    
+    return cell_size_km, pixels_per_km
+
+def resolve_index_names(indices=None):
+    """Configured default indices plus any requested extras, validated"""
+    if indices is not None and not isinstance(indices, (list, tuple)):
+        raise ValueError('indices must be a list of index names')
+    
+    return resolve_indices(Config.GEE_CONFIG['indices'] + list(indices or []))
+
+def grid_shape(cell_size_km, pixels_per_km):
+    """(rows, cols) of a square cell at the given resolution"""
+    pixels = max(int(round(cell_size_km * pixels_per_km)), 1)
+    return pixels, pixels
+
+def grid_bounds(lat, lon, cell_size_km):
+    """Bounds (min_lon, min_lat, max_lon, max_lat) of a cell centred on a point"""
     half_size_deg = (cell_size_km / 2) / 111.32
     
     min_lon = lon - half_size_deg
@@ -32,21 +126,247 @@ def create_grid_bbox(lat, lon, cell_size_km):
     min_lat = lat - half_size_deg
     max_lat = lat + half_size_deg
     
-    return ee.Geometry.Rectangle([min_lon, min_lat, max_lon, max_lat])
+    return min_lon, min_lat, max_lon, max_lat
+
+def create_grid_bbox(lat, lon, cell_size_km):
+    """Create bounding box for extraction"""
+    return ee.Geometry.Rectangle(list(grid_bounds(lat, lon, cell_size_km)))
+
+def pixel_grid(bounds, shape):
+    """EPSG:4326 crsTransform putting exactly (rows, cols) pixels on bounds"""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    rows, cols = shape
+    return [(max_lon - min_lon) / cols, 0, min_lon, 0, -(max_lat - min_lat) / rows, max_lat]
+
+def sample_region(bounds, shape):
+    """Rectangle for sampleRectangle that holds exactly the grid's pixel centres.
+
+    Pulling the edges in by a quarter pixel keeps pixels that only touch
+    the boundary, or straddle it through float error, out of the sample.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    rows, cols = shape
+    inset_x = (max_lon - min_lon) / cols / 4
+    inset_y = (max_lat - min_lat) / rows / 4
+    return ee.Geometry.Rectangle([
+        min_lon + inset_x, min_lat + inset_y, max_lon - inset_x, max_lat - inset_y
+    ])
+
+class SceneCache:
+    """In-process LRU of ranked scene lists keyed by snapped region and date window"""
+    
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                record_cache('scene', False)
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+        
+        record_cache('scene', True)
+        return entry[0]
+    
+    def put(self, key, scenes):
+        with self._lock:
+            self._entries[key] = (scenes, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+_scene_cache = SceneCache(
+    Config.GEE_CONFIG['scene_cache']['max_entries'],
+    Config.GEE_CONFIG['scene_cache']['ttl_seconds']
+)
+
+def get_scene_cache():
+    """Return the process-wide scene list cache"""
+    return _scene_cache
 
-def get_sentinel2_image(roi):
-    """Get least cloudy Sentinel-2 image for region"""
+def scene_region(bounds):
+    """Bounds snapped outwards to the scene cache grid"""
+    step = Config.GEE_CONFIG['scene_cache']['grid_degrees']
+    return (
+        round(math.floor(bounds[0] / step) * step, 6),
+        round(math.floor(bounds[1] / step) * step, 6),
+        round(math.ceil(bounds[2] / step) * step, 6),
+        round(math.ceil(bounds[3] / step) * step, 6)
+    )
+
+def _scene_window(config):
+    """(date_start, date_end, cloud_cover_max) for the configured mode"""
+    if config['mode'] == 'composite':
+        window = config['composite']
+    else:
+        window = config
+    return window['date_start'], window['date_end'], window['cloud_cover_max']
+
+def _footprint_ring(footprint):
+    """Outer ring [[lon, lat], ...] of a footprint's GeoJSON"""
+    coordinates = footprint['coordinates']
+    return coordinates if footprint['type'] == 'LinearRing' else coordinates[0]
+
+def _ring_contains(ring, lon, lat):
+    """Even-odd test of a point against a polygon ring"""
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+def footprint_covers(footprint, bounds):
+    """True if a scene footprint covers every corner of the bounds.
+
+    Sentinel-2 footprints are convex, so covering the corners means
+    covering the whole cell.
+    """
+    ring = _footprint_ring(footprint)
+    min_lon, min_lat, max_lon, max_lat = bounds
+    return all(
+        _ring_contains(ring, lon, lat)
+        for lon, lat in ((min_lon, min_lat), (max_lon, min_lat), (max_lon, max_lat), (min_lon, max_lat))
+    )
+
+def _segment_meets_box(x1, y1, x2, y2, bounds):
+    """Liang-Barsky test of a segment against the bounds"""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    low, high = 0.0, 1.0
+    for delta, distance in ((-(x2 - x1), x1 - min_lon), (x2 - x1, max_lon - x1),
+                            (-(y2 - y1), y1 - min_lat), (y2 - y1, max_lat - y1)):
+        if delta == 0:
+            if distance < 0:
+                return False
+        elif delta < 0:
+            low = max(low, distance / delta)
+        else:
+            high = min(high, distance / delta)
+    return low <= high
+
+def footprint_intersects(footprint, bounds):
+    """True if a scene footprint overlaps any part of the bounds"""
+    ring = _footprint_ring(footprint)
+    min_lon, min_lat, max_lon, max_lat = bounds
+    if _ring_contains(ring, min_lon, min_lat):
+        return True
+    return any(
+        _segment_meets_box(x1, y1, x2, y2, bounds)
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1])
+    )
+
+def list_scenes(bounds):
+    """system:index values of the scenes to use for a region, best first.
+
+    The collection is queried once per snapped region, mode and date
+    window, with the cloud ranking done locally instead of as a server-side
+    sort; nearby requests reuse the cached list. The snapped region is only
+    the cache key: each cell keeps the cached scenes whose footprint covers
+    it (least_cloudy) or overlaps it (composite).
+    """
+    config = Config.GEE_CONFIG['sentinel2']
+    composite = config['mode'] == 'composite'
+    region = scene_region(bounds)
+    date_start, date_end, cloud_cover_max = _scene_window(config)
+    key = (config['collection'], config['mode'], date_start, date_end, cloud_cover_max, region)
+    
+    ranked = _scene_cache.get(key)
+    if ranked is None:
+        collection = (
+            ee.ImageCollection(config['collection'])
+            .filterBounds(ee.Geometry.Rectangle(list(region)))
+            .filterDate(date_start, date_end)
+            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover_max))
+        )
+        
+        listing = get_info(ee.Dictionary({
+            'ids': collection.aggregate_array('system:index'),
+            'clouds': collection.aggregate_array('CLOUDY_PIXEL_PERCENTAGE'),
+            'footprints': collection.aggregate_array('system:footprint')
+        }))
+        
+        ranked = [
+            (scene_id, footprint) for _, scene_id, footprint in
+            sorted(zip(listing['clouds'], listing['ids'], listing['footprints']),
+                   key=lambda scene: scene[:2])
+        ]
+        _scene_cache.put(key, ranked)
+    
+    # A composite only needs each scene to add some pixels to the cell, but
+    # scenes that miss it entirely would leave the median fully masked
+    usable = footprint_intersects if composite else footprint_covers
+    scenes = [scene_id for scene_id, footprint in ranked if usable(footprint, bounds)]
+    if composite:
+        scenes = scenes[:config['composite']['max_scenes']]
+    
+    if not scenes:
+        raise ValueError(
+            f'No Sentinel-2 scenes between {date_start} and {date_end} '
+            f'with under {cloud_cover_max}% cloud cover for this region'
+        )
+    
+    return scenes
+
+def mask_clouds(image):
+    """Mask SCL cloud, shadow, cirrus and snow pixels"""
+    scl = image.select('SCL')
+    mask = scl.neq(0)
+    for scl_class in Config.GEE_CONFIG['sentinel2']['composite']['masked_scl_classes']:
+        mask = mask.And(scl.neq(scl_class))
+    return image.updateMask(mask)
+
+def build_composite(scene_ids):
+    """Cloud-masked median or greenest-pixel mosaic of the given scenes"""
     config = Config.GEE_CONFIG['sentinel2']
+    settings = config['composite']
     
-    collection = (
+    images = (
         ee.ImageCollection(config['collection'])
-        .filterBounds(roi)
-        .filterDate(config['date_start'], config['date_end'])
-        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', config['cloud_cover_max']))
-        .sort('CLOUDY_PIXEL_PERCENTAGE')
+        .filter(ee.Filter.inList('system:index', scene_ids))
+        .map(mask_clouds)
+        .select(config['bands'])
     )
     
-    return ee.Image(collection.first())
+    if settings['method'] == 'quality_mosaic':
+        composite = images.map(
+            lambda image: image.addBands(image.normalizedDifference(['B8', 'B4']).rename('quality'))
+        ).qualityMosaic('quality').select(config['bands'])
+    else:
+        composite = images.median()
+    
+    # Reducers drop the projection; keep the native 10 m grid for sampling
+    first = ee.Image(f"{config['collection']}/{scene_ids[0]}")
+    return composite.setDefaultProjection(first.select(config['bands'][0]).projection()).set({
+        'system:id': f"{config['collection']}/{settings['method']}_of_{len(scene_ids)}_scenes",
+        'composite_scenes': scene_ids
+    })
+
+def get_sentinel2_image(bounds):
+    """Get the Sentinel-2 image for a region.
+
+    The scene list comes from the per-region cache and the image is either
+    the least cloudy covering scene or a cloud-masked composite, depending
+    on the configured mode.
+    """
+    config = Config.GEE_CONFIG['sentinel2']
+    
+    scene_ids = list_scenes(bounds)
+    if config['mode'] == 'composite':
+        return build_composite(scene_ids)
+    return ee.Image(f"{config['collection']}/{scene_ids[0]}")
 
 def get_dem_data(roi):
     """Get SRTM DEM elevation data"""
@@ -57,87 +377,367 @@ def calculate_slope(dem_image):
     """Calculate slope from DEM"""
     return ee.Terrain.slope(dem_image)
 
-def extract_band_array(image, band, roi, pixels):
-    """Extract a single band as numpy array"""
-    band_image = image.select(band)
+def estimate_json_bytes(value):
+    """Rough JSON size of a getInfo result without serializing all of it.
+
+    Sampled bands are lists of equally long rows, so only the first row of
+    each is encoded and scaled up; everything else is small.
+    """
+    if isinstance(value, dict):
+        return sum(len(key) + 4 + estimate_json_bytes(item) for key, item in value.items())
+    if isinstance(value, list) and value and isinstance(value[0], list):
+        return len(value) * (estimate_json_bytes(value[0]) + 2)
+    if isinstance(value, list) and value and isinstance(value[0], (int, float)):
+        return len(str(value))
+    if isinstance(value, list):
+        return sum(estimate_json_bytes(item) + 2 for item in value) + 2
+    return len(str(value))
+
+def _get_info_once(ee_object):
+    try:
+        with GEE_REQUEST_SECONDS.time():
+            result = ee_object.getInfo()
+    except Exception as e:
+        GEE_REQUESTS.inc(outcome='throttled' if is_quota_error(e) else 'error')
+        raise
     
-    array = band_image.sampleRectangle(region=roi, defaultValue=0)
-    data = array.get(band).getInfo()
+    GEE_REQUESTS.inc(outcome='ok')
+    GEE_RESPONSE_BYTES.inc(estimate_json_bytes(result))
+    return result
+
+def get_info(ee_object):
+    """Evaluate an Earth Engine object on the server (one round trip).
+
+    Quota errors are retried with backoff under the shared throttle, so
+    only that round trip is repeated, not the whole extraction.
+    """
+    return _throttle.call(_get_info_once, ee_object)
+
+def decode_band_array(data, band, shape):
+    """Convert sampled band values to a float32 array of the target (rows, cols).
+
+    Bands are reprojected onto the target grid server-side, so any other
+    shape means the sample region and grid disagree.
+    """
     arr = np.array(data, dtype=np.float32)
     
+    if arr.shape != tuple(shape):
+        raise ValueError(
+            f"Band {band} came back as {arr.shape}, expected {tuple(shape)}"
+        )
+    
     if np.all(arr == 0):
         print(f"WARNING: Band {band} is all zeros!")
     if np.isnan(arr).any():
         print(f"WARNING: Band {band} contains NaN values!")
     
-    if arr.shape != (pixels, pixels):
-        zoom_factors = (pixels / arr.shape[0], pixels / arr.shape[1])
-        arr = zoom(arr, zoom_factors, order=1)
-    
     return arr
 
-def calculate_ndvi(b8, b4):
-    """Calculate NDVI"""
-    numerator = b8 - b4
-    denominator = b8 + b4
-    ndvi = np.divide(numerator, denominator, 
-                    out=np.zeros_like(numerator), 
-                    where=denominator!=0)
-    return ndvi.astype(np.float32)
-
-def calculate_ndwi(b3, b8):
-    """Calculate NDWI"""
-    numerator = b3 - b8
-    denominator = b3 + b8
-    ndwi = np.divide(numerator, denominator,
-                    out=np.zeros_like(numerator),
-                    where=denominator!=0)
-    return ndwi.astype(np.float32)
-
-def calculate_bsi(b11, b4, b8, b2):
-    """Calculate BSI"""
-    numerator = (b11 + b4) - (b8 + b2)
-    denominator = (b11 + b4) + (b8 + b2)
-    bsi = np.divide(numerator, denominator,
-                   out=np.zeros_like(numerator),
-                   where=denominator!=0)
-    return bsi.astype(np.float32)
-
-def extract_gee_data(lat, lon, site_name="site"):
-    """Extract all GEE data for a location"""
-    cell_size_km = Config.GEE_CONFIG['cell_size_km']
-    pixels = Config.GEE_CONFIG['pixels_per_km']
-    
-    roi = create_grid_bbox(lat, lon, cell_size_km)
-    
-    s2_image = get_sentinel2_image(roi)
-    dem_image = get_dem_data(roi)
-    slope_image = calculate_slope(dem_image)
+def extract_band_array(image, band, region, shape):
+    """Extract a single band as numpy array"""
+    band_image = image.select(band)
+    
+    array = band_image.sampleRectangle(region=region, defaultValue=0)
+    data = get_info(array.get(band))
+    
+    return decode_band_array(data, band, shape)
+
+def channel_layout(profile='full', indices=None):
+    """What to fetch for a band profile and index selection.
+
+    Returns {'bands', 'server_indices', 'scales'}: the raw Sentinel-2 bands
+    to transfer, the indices to compute in the ee graph, and the integer
+    scale each quantized band was multiplied by.
+    """
+    config = Config.GEE_CONFIG
+    if profile not in config['band_profiles']:
+        raise ValueError(
+            f"Unknown band profile: {profile}. "
+            f"Available: {', '.join(config['band_profiles'])}"
+        )
+    
+    settings = config['band_profiles'][profile]
+    index_names = resolve_index_names(indices)
+    server_indices = index_names if settings['server_indices'] else []
+    
+    scales = dict(settings['scales'])
+    scales.update({name: config['index_scale'] for name in server_indices})
+    
+    return {
+        'bands': list(settings['bands']),
+        'server_indices': server_indices,
+        'scales': scales
+    }
+
+def channel_order(layout):
+    """Channel names in the order every extraction path returns them"""
+    return layout['bands'] + layout['server_indices'] + ['DEM', 'Slope']
+
+def _ee_linear(coefficients, offset):
+    terms = [f"{coefficient!r} * {band}" for band, coefficient in coefficients.items()]
+    if offset:
+        terms.append(repr(offset))
+    return ' + '.join(terms)
+
+def build_index_image(s2_image, name):
+    """Spectral index from the registry, evaluated in the ee graph.
+
+    Pixels with a zero denominator are masked, so sampling fills them with
+    0 like the local engine does.
+    """
+    spec = SPECTRAL_INDICES[name]
+    scale = REFLECTANCE_SCALE
+    bands = {
+        band: s2_image.select(band)
+        for band in (*spec['numerator'], *spec['denominator'])
+    }
+    
+    numerator = s2_image.expression(
+        _ee_linear(spec['numerator'], spec['numerator_offset'] * scale), bands
+    )
+    denominator = s2_image.expression(
+        _ee_linear(spec['denominator'], spec['denominator_offset'] * scale), bands
+    )
+    
+    return (
+        numerator.divide(denominator)
+        .multiply(spec['gain'])
+        .updateMask(denominator.neq(0))
+        .rename(name)
+    )
+
+def _quantize(image, scale):
+    """value * scale rounded to an integer: far fewer digits in the JSON payload"""
+    return image.multiply(scale).round().toInt32()
+
+def build_channel_stack(s2_image, dem_image, slope_image, layout, grid):
+    """Stack the layout's Sentinel-2 bands, indices, DEM and slope into one image.
+
+    Every band is bilinearly resampled onto grid (a pixel_grid crsTransform)
+    before anything is computed or quantized, so Earth Engine returns arrays
+    that already have the output shape.
+    """
+    scales = layout['scales']
+    
+    def quantized(image, name):
+        return _quantize(image, scales[name]) if name in scales else image
+    
+    def on_grid(image):
+        return image.resample('bilinear').reproject(crs='EPSG:4326', crsTransform=grid)
+    
+    s2_image = on_grid(s2_image.select(Config.GEE_CONFIG['sentinel2']['bands']))
+    terrain = on_grid(
+        dem_image.select('elevation')
+        .addBands(slope_image.select('slope'))
+        .rename(['DEM', 'Slope'])
+    )
+    
+    stack = s2_image.select(layout['bands'])
+    for name in layout['server_indices']:
+        stack = stack.addBands(quantized(build_index_image(s2_image, name), name))
+    for name in ('DEM', 'Slope'):
+        stack = stack.addBands(quantized(terrain.select(name), name))
+    
+    return stack
+
+def _unscale(channels, layout):
+    """Undo server-side quantization in place"""
+    for name, scale in layout['scales'].items():
+        if name in channels:
+            np.divide(channels[name], scale, out=channels[name])
+    return channels
+
+def extract_channel_stack(stack, s2_image, region, shape, layout):
+    """Extract all bands plus scene metadata in a single request"""
+    sample = stack.sampleRectangle(region=region, defaultValue=0)
     
-    dem_band = 'elevation'
+    payload = get_info(ee.Dictionary({
+        'bands': sample.toDictionary(),
+        'image_id': s2_image.get('system:id'),
+        'properties': s2_image.toDictionary()
+    }))
     
+    # Server-side dictionaries come back with sorted keys, so rebuild the
+    # channels in the same order as the per-band path
+    channels = {
+        band: decode_band_array(payload['bands'][band], band, shape)
+        for band in channel_order(layout)
+    }
+    
+    scene = {
+        'id': payload.get('image_id'),
+        'properties': payload.get('properties') or {}
+    }
+    
+    return _unscale(channels, layout), scene
+
+@timed('gee.sample')
+def _sample_bands(stack, s2_image, bounds, shape, layout):
+    """Sample every band of stack over bounds; returns (channels, image_info)"""
+    region = sample_region(bounds, shape)
+    
+    if Config.GEE_CONFIG['batch_requests']:
+        return extract_channel_stack(stack, s2_image, region, shape, layout)
+    
+    channels = {}
+    
+    for band in channel_order(layout):
+        channels[band] = extract_band_array(stack, band, region, shape)
+    
+    return _unscale(channels, layout), get_info(s2_image)
+
+def plan_tiles(bounds, shape):
+    """Split a region into pixel-aligned tiles that each fit one sample request.
+
+    Returns (tile_bounds, (row, col), (rows, cols)) tuples covering the
+    whole (rows, cols) grid.
+    """
+    max_pixels = Config.GEE_CONFIG['max_pixels_per_tile']
+    rows, cols = shape
+    
+    splits = max(math.ceil(math.sqrt(rows * cols / max_pixels)), 1)
+    while True:
+        tile_rows = math.ceil(rows / min(splits, rows))
+        tile_cols = math.ceil(cols / min(splits, cols))
+        if tile_rows * tile_cols <= max_pixels or tile_rows * tile_cols == 1:
+            break
+        splits += 1
+    
+    min_lon, min_lat, max_lon, max_lat = bounds
+    dx = (max_lon - min_lon) / cols
+    dy = (max_lat - min_lat) / rows
+    
+    tiles = []
+    for row in range(0, rows, tile_rows):
+        for col in range(0, cols, tile_cols):
+            height = min(tile_rows, rows - row)
+            width = min(tile_cols, cols - col)
+            tile_bounds = (
+                min_lon + col * dx,
+                max_lat - (row + height) * dy,
+                min_lon + (col + width) * dx,
+                max_lat - row * dy
+            )
+            tiles.append((tile_bounds, (row, col), (height, width)))
+    
+    return tiles
+
+def _sample_tiles(stack, s2_image, tiles, shape, layout, report):
+    """Fetch tiles in parallel and mosaic them into full-size channels"""
+    def fetch(tile):
+        tile_bounds, _, tile_shape = tile
+        return _sample_bands(stack, s2_image, tile_bounds, tile_shape, layout)
+    
+    total = len(tiles)
+    report('satellite_tiles', 'running', completed=0, total=total)
+    
+    futures = {_tile_executor.submit(fetch, tile): tile for tile in tiles}
     channels = {}
+    image_info = None
     
-    for band in Config.GEE_CONFIG['sentinel2']['bands']:
-        channels[band] = extract_band_array(s2_image, band, roi, pixels)
+    try:
+        for completed, future in enumerate(as_completed(futures), 1):
+            tile_channels, info = future.result()
+            _, (row, col), (height, width) = futures[future]
+            
+            for name, array in tile_channels.items():
+                if name not in channels:
+                    channels[name] = np.empty(shape, dtype=np.float32)
+                channels[name][row:row + height, col:col + width] = array
+            
+            image_info = image_info or info
+            report('satellite_tiles', 'progress', completed=completed, total=total)
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+    
+    # Keep the per-band path's channel order whichever tile finished first
+    channels = {band: channels[band] for band in channel_order(layout)}
+    
+    report('satellite_tiles', 'completed', total=total)
+    return channels, image_info
+
+@timed('gee.extract_region')
+def extract_region(bounds, shape, report=None, indices=None, profile='full'):
+    """Extract all channels for a region on a (rows, cols) pixel grid.
+
+    Regions larger than one sample request are split into tiles that are
+    fetched in parallel from the same scene and mosaicked; report gets
+    'satellite_tiles' progress events. indices are extra spectral indices
+    on top of the configured defaults. profile names a band profile in
+    GEE_CONFIG that decides which bands are transferred and whether indices
+    are computed server-side. Returns (channels, image_info) where
+    image_info describes the Sentinel-2 scene the bands came from.
+    """
+    report = report or _noop_report
+    layout = channel_layout(profile, indices)
+    roi = ee.Geometry.Rectangle(list(bounds))
     
-    channels['DEM'] = extract_band_array(dem_image, dem_band, roi, pixels)
-    channels['Slope'] = extract_band_array(slope_image, 'slope', roi, pixels)
+    s2_image = get_sentinel2_image(bounds)
+    dem_image = get_dem_data(roi)
+    slope_image = calculate_slope(dem_image)
     
-    channels['NDVI'] = calculate_ndvi(channels['B8'], channels['B4'])
-    channels['NDWI'] = calculate_ndwi(channels['B3'], channels['B8'])
-    channels['BSI'] = calculate_bsi(channels['B11'], channels['B4'], 
-                                     channels['B8'], channels['B2'])
+    # Tiles share the region's grid, so one stack serves all of them and
+    # the pixels Earth Engine returns are exactly the output pixels
+    stack = build_channel_stack(
+        s2_image, dem_image, slope_image, layout, pixel_grid(bounds, shape)
+    )
+    tiles = plan_tiles(bounds, shape)
+    
+    if len(tiles) == 1:
+        channels, image_info = _sample_bands(stack, s2_image, bounds, shape, layout)
+    else:
+        channels, image_info = _sample_tiles(
+            stack, s2_image, tiles, shape, layout, report
+        )
     
-    image_info = s2_image.getInfo()
-    metadata = {
+    local_indices = [
+        name for name in resolve_index_names(indices) if name not in channels
+    ]
+    channels.update(compute_indices(channels, local_indices))
+    
+    return channels, image_info
+
+def build_site_metadata(site_name, lat, lon, cell_size_km, image_info, pixels_per_km=None):
+    """Metadata record describing one extracted site"""
+    if pixels_per_km is None:
+        pixels_per_km = Config.GEE_CONFIG['pixels_per_km']
+    
+    return {
         'site_name': site_name,
         'latitude': lat,
         'longitude': lon,
         'cell_size_km': cell_size_km,
+        'pixels_per_km': pixels_per_km,
         'image_id': image_info['id'] if image_info else None,
         'cloud_cover': image_info['properties'].get('CLOUDY_PIXEL_PERCENTAGE') if image_info else None,
-        'acquisition_date': image_info['properties'].get('GENERATION_TIME') if image_info else None
+        'acquisition_date': image_info['properties'].get('GENERATION_TIME') if image_info else None,
+        'composite_scenes': image_info['properties'].get('composite_scenes') if image_info else None
     }
+
+def extract_gee_data(lat, lon, site_name="site", cell_size_km=None, pixels_per_km=None,
+                     report=None, indices=None, profile='full'):
+    """Extract all GEE data for a location.
+
+    cell_size_km and pixels_per_km default to GEE_CONFIG; cells over the
+    sample request limit are fetched as parallel tiles. indices adds
+    registered spectral indices to the default set; profile picks the band
+    profile ('full' for downloads, 'preview' for rendering only).
+    """
+    cell_size_km, pixels_per_km = resolve_grid(cell_size_km, pixels_per_km)
+    
+    channels, image_info = extract_region(
+        grid_bounds(lat, lon, cell_size_km),
+        grid_shape(cell_size_km, pixels_per_km),
+        report,
+        indices,
+        profile
+    )
+    
+    metadata = build_site_metadata(
+        site_name, lat, lon, cell_size_km, image_info, pixels_per_km
+    )
+    metadata['band_profile'] = profile
     
-    return {'channels': channels, 'metadata': metadata}
\ No newline at end of file
+    return {'channels': channels, 'metadata': metadata}
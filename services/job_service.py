@@ -0,0 +1,292 @@
+import json
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import Config
+
+class Job:
+    """State of one background job and the progress events it emitted"""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.updated = self.created
+
+    def snapshot(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'events': list(self.events),
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'updated': self.updated
+        }
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed')
+
+class JobStore:
+    """SQLite copy of job state so any worker process can serve polls and SSE.
+
+    Jobs still run in the process that accepted them; that process writes
+    every status change and event here as it happens.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, '
+            'result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS job_events ('
+            'job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, '
+            'PRIMARY KEY (job_id, seq))'
+        )
+        self._conn.commit()
+
+    def save(self, job):
+        """Write the job's status, result and error"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs '
+                '(job_id, kind, status, result, error, created, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job.id, job.kind, job.status, json.dumps(job.result, default=str), job.error,
+                 job.created, job.updated)
+            )
+            self._conn.commit()
+
+    def add_event(self, job, seq, event):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO job_events (job_id, seq, event) VALUES (?, ?, ?)',
+                (job.id, seq, json.dumps(event))
+            )
+            self._conn.execute(
+                'UPDATE jobs SET updated = ? WHERE job_id = ?', (job.updated, job.id)
+            )
+            self._conn.commit()
+
+    def load(self, job_id):
+        """Snapshot of a stored job, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT kind, status, result, error, created, updated '
+                'FROM jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            events = self._conn.execute(
+                'SELECT event FROM job_events WHERE job_id = ? ORDER BY seq', (job_id,)
+            ).fetchall()
+
+        kind, status, result, error, created, updated = row
+        return {
+            'job_id': job_id,
+            'kind': kind,
+            'status': status,
+            'events': [json.loads(event) for (event,) in events],
+            'result': json.loads(result) if result else None,
+            'error': error,
+            'created': created,
+            'updated': updated
+        }
+
+    def purge(self, cutoff):
+        """Drop jobs untouched since cutoff, including ones whose worker died"""
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM job_events WHERE job_id IN '
+                '(SELECT job_id FROM jobs WHERE updated < ?)', (cutoff,)
+            )
+            self._conn.execute('DELETE FROM jobs WHERE updated < ?', (cutoff,))
+            self._conn.commit()
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and records their progress.
+
+    A job function is called as ``func(*args, report=report)`` where
+    ``report(stage, status, **details)`` appends a progress event. Its
+    return value becomes the job result; an exception fails the job.
+
+    With a store, job state is also written to SQLite, so under several
+    worker processes a job submitted to one can be polled from any other.
+    """
+
+    def __init__(self, max_workers, ttl_seconds, store=None, poll_seconds=0.5):
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self.poll_seconds = poll_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='job'
+        )
+        self._jobs = {}
+        self._futures = {}
+        self._changed = threading.Condition()
+
+    def submit(self, kind, func, *args):
+        """Queue a job and return its id immediately"""
+        job = Job(kind)
+
+        with self._changed:
+            self._purge_expired()
+            self._jobs[job.id] = job
+
+        if self.store:
+            self.store.save(job)
+
+        future = self._executor.submit(self._run, job, func, args)
+        with self._changed:
+            self._futures[job.id] = future
+        future.add_done_callback(lambda _: self._forget_future(job.id))
+
+        return job.id
+
+    def get(self, job_id):
+        """Return a snapshot of the job, or None if unknown or expired"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job:
+                return job.snapshot()
+
+        return self.store.load(job_id) if self.store else None
+
+    def wait(self, job_id, seen_events, timeout):
+        """Block until the job has more than seen_events events or finishes.
+
+        Returns the current snapshot (None if the job is unknown). Jobs
+        running in another process are followed by polling the store.
+        """
+        deadline = time.time() + timeout
+
+        with self._changed:
+            while job_id in self._jobs:
+                job = self._jobs[job_id]
+                if job.finished or len(job.events) > seen_events:
+                    return job.snapshot()
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return job.snapshot()
+                self._changed.wait(remaining)
+
+        while True:
+            snapshot = self.get(job_id)
+            if snapshot is None or snapshot['status'] in ('completed', 'failed'):
+                return snapshot
+            if len(snapshot['events']) > seen_events or time.time() >= deadline:
+                return snapshot
+            time.sleep(min(self.poll_seconds, max(deadline - time.time(), 0)))
+
+    def shutdown(self):
+        """Fail queued jobs and wait for running ones, for graceful worker exit"""
+        with self._changed:
+            queued = [
+                self._jobs[job_id] for job_id, future in list(self._futures.items())
+                if future.cancel()
+            ]
+
+        for job in queued:
+            self._update(job, status='failed', error='Server shutting down; resubmit the job')
+
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job, func, args):
+        def report(stage, status, **details):
+            self._record(job, dict(details, stage=stage, status=status))
+
+        self._update(job, status='running')
+
+        try:
+            result = func(*args, report=report)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job, status='failed', error=str(e))
+        else:
+            self._update(job, status='completed', result=result)
+
+    def _record(self, job, event):
+        event['timestamp'] = time.time()
+        with self._changed:
+            job.events.append(event)
+            job.updated = event['timestamp']
+            seq = len(job.events) - 1
+            self._changed.notify_all()
+
+        if self.store:
+            self.store.add_event(job, seq, event)
+
+    def _update(self, job, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated = time.time()
+            self._changed.notify_all()
+
+        if self.store:
+            self.store.save(job)
+
+    def _forget_future(self, job_id):
+        with self._changed:
+            self._futures.pop(job_id, None)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.updated < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        if self.store:
+            self.store.purge(cutoff)
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Return the process-wide job manager"""
+    global _job_manager
+
+    settings = Config.JOB_CONFIG
+
+    with _job_manager_lock:
+        if _job_manager is None:
+            store_path = settings['store_path']
+            _job_manager = JobManager(
+                settings['max_workers'],
+                settings['result_ttl_seconds'],
+                store=JobStore(store_path) if store_path else None,
+                poll_seconds=settings['poll_seconds']
+            )
+
+    return _job_manager
+
+def shutdown_job_manager():
+    """Stop the process-wide job manager, if this process started one"""
+    with _job_manager_lock:
+        manager = _job_manager
+
+    if manager is not None:
+        manager.shutdown()
@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from config import Config
+from utils.metrics import record_cache
+
+class MemoryBackend:
+    """In-process LRU tier holding serialized responses"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value, expires
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class SQLiteBackend:
+    """On-disk tier shared by every worker process on the host"""
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+
+            return row[0], row[1]
+
+    def set(self, key, value, expires):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)',
+                (key, value, expires)
+            )
+            self._conn.commit()
+
+class ResponseCache:
+    """Tiered cache of parsed Gemini responses.
+
+    Lookups go through the backends in order; a hit in a slower tier is
+    copied into the faster ones. Values are stored as JSON so callers always
+    get a fresh object they are free to mutate.
+    """
+
+    def __init__(self, backends, ttl_seconds):
+        self.backends = backends
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def get(self, namespace, key):
+        for index, backend in enumerate(self.backends):
+            entry = backend.get(key)
+            if entry is None:
+                continue
+
+            for faster in self.backends[:index]:
+                faster.set(key, *entry)
+
+            self._count(namespace, f'hits_{backend.name}')
+            record_cache('llm', True)
+            return json.loads(entry[0])
+
+        self._count(namespace, 'misses')
+        record_cache('llm', False)
+        return None
+
+    def set(self, namespace, key, value):
+        expires = time.time() + self.ttl_seconds.get(namespace, 0)
+        encoded = json.dumps(value)
+
+        for backend in self.backends:
+            backend.set(key, encoded, expires)
+
+    def stats(self):
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._counters.items()}
+
+    def _count(self, namespace, counter):
+        with self._lock:
+            counts = self._counters.setdefault(namespace, {})
+            counts[counter] = counts.get(counter, 0) + 1
+
+def _hash_value(digest, value):
+    """Feed prompt text, image bytes and SDK objects into digest"""
+    if value is None:
+        return
+    if isinstance(value, bytes):
+        digest.update(hashlib.sha256(value).digest())
+    elif isinstance(value, str):
+        digest.update(value.encode('utf-8'))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _hash_value(digest, item)
+    elif getattr(value, 'inline_data', None) is not None:
+        _hash_value(digest, value.inline_data.mime_type)
+        _hash_value(digest, value.inline_data.data)
+    elif hasattr(value, 'model_dump_json'):
+        digest.update(value.model_dump_json(exclude_none=True).encode('utf-8'))
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(b'\0')
+
+def make_request_key(namespace, request):
+    """Content hash of the model name and the generate_content arguments"""
+    digest = hashlib.sha256()
+    _hash_value(digest, namespace)
+    _hash_value(digest, Config.GEMINI_CONFIG['model'])
+    _hash_value(digest, request.get('contents'))
+    _hash_value(digest, request.get('config'))
+    return digest.hexdigest()
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Return the process-wide response cache, or None when disabled"""
+    global _llm_cache
+
+    settings = Config.LLM_CACHE
+    if not settings['enabled']:
+        return None
+
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            backends = [MemoryBackend(settings['memory_max_entries'])]
+            if settings['sqlite_path']:
+                backends.append(SQLiteBackend(settings['sqlite_path']))
+            _llm_cache = ResponseCache(backends, settings['ttl_seconds'])
+
+    return _llm_cache
+
+def is_cacheable(value):
+    """Skip results that only record a failed parse"""
+    return isinstance(value, dict) and 'parse_error' not in value
+
+def cached_response(namespace, request, compute):
+    """Return the cached result for request, or compute and store it"""
+    cache = get_llm_cache()
+    if cache is None:
+        return compute()
+
+    key = make_request_key(namespace, request)
+    value = cache.get(namespace, key)
+    if value is not None:
+        return value
+
+    value = compute()
+    if is_cacheable(value):
+        cache.set(namespace, key, value)
+    return value
+
+async def cached_response_async(namespace, request, compute):
+    """Async counterpart of cached_response; compute returns an awaitable.
+
+    Cache lookups and writes can block on the SQLite tier, so they run in
+    a worker thread instead of on the event loop.
+    """
+    cache = await asyncio.to_thread(get_llm_cache)
+    if cache is None:
+        return await compute()
+
+    key = make_request_key(namespace, request)
+    value = await asyncio.to_thread(cache.get, namespace, key)
+    if value is not None:
+        return value
+
+    value = await compute()
+    if is_cacheable(value):
+        await asyncio.to_thread(cache.set, namespace, key, value)
+    return value
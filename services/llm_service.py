@@ -1,69 +1,184 @@
 import os
 import json
+import asyncio
+import threading
+import time
 import warnings
-from google import genai
-from google.genai import types
+import weakref
+from contextlib import contextmanager
+from config import Config
+from services.llm_cache import cached_response, cached_response_async
 from prompts.extraction_prompt import create_extraction_prompt
 from prompts.satellite_analysis_prompt import create_satellite_analysis_prompt
 from prompts.contextual_enrichment_prompt import create_contextual_enrichment_prompt
+from utils.text_chunker import split_pages, join_pages, build_page_windows
+from utils.site_merger import merge_sites, summarize_sites, fill_missing
+from utils.rate_limiter import is_quota_error, make_throttle
+from utils.lazy_import import LazyModule
+from utils.metrics import LLM_REQUESTS, LLM_REQUEST_SECONDS, record_llm_usage
 warnings.filterwarnings('ignore', module='google.genai')
 
+# Imported on the first Gemini call rather than at app startup
+genai = LazyModule('google.genai', 'google-genai')
+types = LazyModule('google.genai.types', 'google-genai')
+
+_client = None
+_client_lock = threading.Lock()
+
+# Clients for async calls, one per event loop (see get_gemini_async_client)
+_async_clients = weakref.WeakKeyDictionary()
+
+# Request rate shared across worker processes, an adaptive in-flight limit
+# and backoff on 429s, for both the sync and async call paths
+_throttle = make_throttle(
+    'gemini', Config.GEMINI_CONFIG['requests_per_minute'] / 60.0, Config.GEMINI_CONFIG
+)
+
+def build_gemini_client():
+    """Create a Gemini client from GEMINI_CONFIG"""
+    return genai.Client(
+        api_key=os.environ.get("GEMINI_API_KEY"),
+        http_options=types.HttpOptions(
+            timeout=Config.GEMINI_CONFIG['request_timeout_seconds'] * 1000
+        )
+    )
+
 def get_gemini_client():
-    """Get initialized Gemini client"""
-    return genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    """Get the shared Gemini client, creating it on first use.
 
-def extract_sites_with_llm(paper_text):
-    """Use Gemini to extract site information"""
+    The client keeps its HTTP connection pools open, so every call in the
+    process reuses the same connections.
+    """
+    global _client
+    
+    with _client_lock:
+        if _client is None:
+            _client = build_gemini_client()
+    
+    return _client
+
+def get_gemini_async_client():
+    """Get the Gemini client for async calls on the running event loop.
+
+    The async HTTP pool is bound to the loop that opened its connections,
+    so one shared client would fail with "Event loop is closed" on the next
+    asyncio.run(). Each loop gets its own client instead; close it with
+    close_gemini_async_client() before the loop ends.
+    """
+    loop = asyncio.get_running_loop()
+    
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = build_gemini_client()
+    
+    return client
+
+async def close_gemini_async_client():
+    """Close the running event loop's async client and its connections"""
+    with _client_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    
+    # google-genai 1.21 has no public close for the aio pool
+    http = getattr(getattr(client, '_api_client', None), '_async_httpx_client', None)
+    if http is not None:
+        await http.aclose()
+
+def reset_gemini_client():
+    """Drop the shared client so the next call builds a fresh one"""
+    global _client
+    
+    with _client_lock:
+        _client = None
+
+@contextmanager
+def _measured_call(operation):
+    """Record latency and outcome of one Gemini call attempt"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        LLM_REQUESTS.inc(
+            operation=operation, outcome='throttled' if is_quota_error(e) else 'error'
+        )
+        raise
+    finally:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, operation=operation)
+    LLM_REQUESTS.inc(operation=operation, outcome='ok')
+
+def generate_content(operation='generate', **request):
+    """Call Gemini generate_content through the shared client.
+
+    operation labels the call's latency and token usage in /metrics.
+    Quota errors (429) are retried under the shared throttle.
+    """
     client = get_gemini_client()
-    prompt = create_extraction_prompt(paper_text)
     
-    response = client.models.generate_content(
-        model="gemini-3-flash-preview",
-        contents=prompt
-    )
+    def call():
+        with _measured_call(operation):
+            return client.models.generate_content(
+                model=Config.GEMINI_CONFIG['model'],
+                **request
+            )
+    
+    response = _throttle.call(call)
+    
+    record_llm_usage(operation, response)
+    return response
+
+async def generate_content_async(operation='generate', **request):
+    """Async generate_content through this event loop's client"""
+    client = get_gemini_async_client()
+    
+    async def call():
+        with _measured_call(operation):
+            return await client.aio.models.generate_content(
+                model=Config.GEMINI_CONFIG['model'],
+                **request
+            )
+    
+    response = await _throttle.call_async(call)
     
+    record_llm_usage(operation, response)
+    return response
+
+def strip_code_fences(response_text):
+    """Remove a ```json fenced block wrapper from a model response"""
+    if response_text.startswith("```json"):
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif response_text.startswith("```"):
+        response_text = response_text.split("```")[1].split("```")[0].strip()
+    
+    return response_text
+
+def _extraction_request(paper_text):
+    return {'contents': create_extraction_prompt(paper_text)}
+
+def _parse_extraction_response(response):
     response_text = response.text
     
     try:
-        if response_text.startswith("```json"):
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.split("```")[1].split("```")[0].strip()
+        response_text = strip_code_fences(response_text)
         
         extracted_data = json.loads(response_text)
         return extracted_data
     except json.JSONDecodeError as e:
         return {"raw_response": response_text, "parse_error": str(e)}
 
-def analyze_satellite_imagery(site_name, metadata, image_data):
-    """Analyze satellite imagery with Gemini Vision"""
-    client = get_gemini_client()
+def _satellite_request(site_name, metadata, image_bytes):
     prompt = create_satellite_analysis_prompt(site_name, metadata)
     
-    import base64
-    response = client.models.generate_content(
-        model="gemini-3-flash-preview",
-        contents=[
+    return {
+        'contents': [
             prompt,
             types.Part.from_bytes(
-                data=base64.b64decode(image_data),
+                data=image_bytes,
                 mime_type="image/png"
             )
         ]
-    )
-    
-    response_text = response.text
-    if response_text.startswith("```json"):
-        response_text = response_text.split("```json")[1].split("```")[0].strip()
-    elif response_text.startswith("```"):
-        response_text = response_text.split("```")[1].split("```")[0].strip()
-    
-    return json.loads(response_text)
+    }
 
-def enrich_site_context(site_data):
-    """Perform contextual enrichment with search grounding"""
-    client = get_gemini_client()
-    
+def _enrichment_request(site_data):
     grounding_tool = types.Tool(
         google_search=types.GoogleSearch()
     )
@@ -75,16 +190,182 @@ def enrich_site_context(site_data):
     
     prompt = create_contextual_enrichment_prompt(site_data)
     
-    response = client.models.generate_content(
-        model="gemini-3-flash-preview",
-        contents=prompt,
-        config=config
+    return {'contents': prompt, 'config': config}
+
+def _parse_json_response(response):
+    return json.loads(strip_code_fences(response.text))
+
+def extract_sites_single(paper_text):
+    """Extract sites from the whole text with a single Gemini call"""
+    request = _extraction_request(paper_text)
+    return cached_response(
+        'extraction', request,
+        lambda: _parse_extraction_response(generate_content('extraction', **request))
     )
+
+def _pages_mentioning(site, window):
+    """Pages of window whose text names the site (all pages if none do)"""
+    names = [site.get('site_name'), site.get('site_code')]
+    names += site.get('alternative_names') or []
+    names = [name.lower() for name in names if isinstance(name, str) and name.strip()]
     
-    response_text = response.text
-    if response_text.startswith("```json"):
-        response_text = response_text.split("```json")[1].split("```")[0].strip()
-    elif response_text.startswith("```"):
-        response_text = response_text.split("```")[1].split("```")[0].strip()
+    pages = [
+        number for number, page_text in window
+        if any(name in page_text.lower() for name in names)
+    ]
+    
+    return pages or [number for number, _ in window]
+
+def _page_windows(paper_text):
+    settings = Config.EXTRACTION_CONFIG
+    return build_page_windows(
+        split_pages(paper_text),
+        settings['window_chars'],
+        settings['overlap_pages']
+    )
+
+async def _extract_windows_async(windows):
+    """Extract every window concurrently on one event loop.
+
+    At most EXTRACTION_CONFIG['chunk_workers'] windows are in flight;
+    returns each window's result or exception, in window order.
+    """
+    slots = asyncio.Semaphore(Config.EXTRACTION_CONFIG['chunk_workers'])
+    
+    async def extract(window):
+        async with slots:
+            return await extract_sites_single_async(join_pages(window))
+    
+    return await asyncio.gather(
+        *(extract(window) for window in windows),
+        return_exceptions=True
+    )
+
+def _merge_windows(windows, outcomes):
+    """Reduce per-window extraction outcomes into one result"""
+    chunk_results = []
+    errors = []
+    for window, chunk in zip(windows, outcomes):
+        pages = f"{window[0][0]}-{window[-1][0]}"
+        if isinstance(chunk, Exception):
+            errors.append({'pages': pages, 'error': str(chunk)})
+            continue
+        
+        if 'parse_error' in chunk:
+            errors.append({'pages': pages, 'error': chunk['parse_error']})
+            continue
+        
+        for site in chunk.get('sites') or []:
+            metadata = site.get('metadata') or {}
+            metadata['source_pages'] = _pages_mentioning(site, window)
+            site['metadata'] = metadata
+        chunk_results.append(chunk)
+    
+    if not chunk_results:
+        raise RuntimeError(
+            'Chunked extraction failed for every window: '
+            + '; '.join(f"pages {e['pages']}: {e['error']}" for e in errors)
+        )
+    
+    paper_metadata = {}
+    for chunk in chunk_results:
+        fill_missing(paper_metadata, chunk.get('paper_metadata') or {})
+    
+    sites = merge_sites(chunk.get('sites') or [] for chunk in chunk_results)
+    
+    summary = dict(chunk_results[0].get('extraction_summary') or {})
+    summary.update(summarize_sites(sites))
+    summary['chunked'] = {
+        'windows': len(windows),
+        'failed_windows': errors
+    }
+    
+    return {
+        'paper_metadata': paper_metadata,
+        'extraction_summary': summary,
+        'sites': sites
+    }
+
+def extract_sites_chunked(paper_text):
+    """Map-reduce extraction over overlapping page windows.
+
+    Windows are fanned out as async Gemini calls on one event loop rather
+    than one thread each; their site lists are merged with deduplication
+    and each site records its source pages.
+    """
+    windows = _page_windows(paper_text)
+    
+    async def extract_all():
+        # The loop ends with asyncio.run, so its client must not outlive it
+        try:
+            return await _extract_windows_async(windows)
+        finally:
+            await close_gemini_async_client()
+    
+    return _merge_windows(windows, asyncio.run(extract_all()))
+
+async def extract_sites_chunked_async(paper_text):
+    """Async variant of extract_sites_chunked"""
+    windows = _page_windows(paper_text)
+    return _merge_windows(windows, await _extract_windows_async(windows))
+
+def extract_sites_with_llm(paper_text):
+    """Use Gemini to extract site information.
+
+    Texts longer than EXTRACTION_CONFIG['chunk_threshold_chars'] are
+    extracted in overlapping page windows instead of one prompt.
+    """
+    if len(paper_text) > Config.EXTRACTION_CONFIG['chunk_threshold_chars']:
+        return extract_sites_chunked(paper_text)
+    
+    return extract_sites_single(paper_text)
+
+def analyze_satellite_imagery(site_name, metadata, image_bytes):
+    """Analyze satellite imagery (raw PNG bytes) with Gemini Vision"""
+    request = _satellite_request(site_name, metadata, image_bytes)
+    return cached_response(
+        'satellite_analysis', request,
+        lambda: _parse_json_response(generate_content('satellite_analysis', **request))
+    )
+
+def enrich_site_context(site_data):
+    """Perform contextual enrichment with search grounding"""
+    request = _enrichment_request(site_data)
+    return cached_response(
+        'enrichment', request,
+        lambda: _parse_json_response(generate_content('enrichment', **request))
+    )
+
+async def extract_sites_single_async(paper_text):
+    """Async variant of extract_sites_single"""
+    request = _extraction_request(paper_text)
+    
+    async def compute():
+        return _parse_extraction_response(await generate_content_async('extraction', **request))
+    
+    return await cached_response_async('extraction', request, compute)
+
+async def extract_sites_with_llm_async(paper_text):
+    """Async variant of extract_sites_with_llm"""
+    if len(paper_text) > Config.EXTRACTION_CONFIG['chunk_threshold_chars']:
+        return await extract_sites_chunked_async(paper_text)
+    
+    return await extract_sites_single_async(paper_text)
+
+async def analyze_satellite_imagery_async(site_name, metadata, image_bytes):
+    """Async variant of analyze_satellite_imagery"""
+    request = _satellite_request(site_name, metadata, image_bytes)
+    
+    async def compute():
+        return _parse_json_response(await generate_content_async('satellite_analysis', **request))
+    
+    return await cached_response_async('satellite_analysis', request, compute)
+
+async def enrich_site_context_async(site_data):
+    """Async variant of enrich_site_context"""
+    request = _enrichment_request(site_data)
+    
+    async def compute():
+        return _parse_json_response(await generate_content_async('enrichment', **request))
     
-    return json.loads(response_text)
\ No newline at end of file
+    return await cached_response_async('enrichment', request, compute)
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from services.gee_service import extract_gee_data, resolve_grid, resolve_index_names
+from utils.metrics import record_cache
+
+METADATA_FILE = 'metadata.json'
+
+class TileCache:
+    """On-disk cache of extracted GEE channel stacks.
+
+    Each entry is a directory named after its content key holding one
+    memory-mappable ``.npy`` file per channel plus ``metadata.json``. The
+    metadata file's mtime doubles as the LRU access time.
+    """
+
+    def __init__(self, directory, max_bytes, ttl_seconds):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return cached {'channels', 'metadata'} for key, or None"""
+        entry = self.directory / key
+        meta_path = entry / METADATA_FILE
+
+        try:
+            with open(meta_path) as f:
+                record = json.load(f)
+
+            if time.time() - record['created'] > self.ttl_seconds:
+                self._remove(entry)
+                self._count_miss()
+                return None
+
+            channels = {
+                name: np.load(entry / f"{name}.npy", mmap_mode='r')
+                for name in record['channels']
+            }
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            # Missing, half-evicted or corrupt entries are plain misses
+            self._count_miss()
+            return None
+
+        with self._lock:
+            self.hits += 1
+        record_cache('tile', True)
+
+        return {'channels': channels, 'metadata': record['metadata']}
+
+    def put(self, key, data):
+        """Store a channel stack under key and enforce the size budget"""
+        staging = Path(tempfile.mkdtemp(prefix=f".{key}-", dir=self.directory))
+
+        try:
+            for name, array in data['channels'].items():
+                np.save(staging / f"{name}.npy", np.asarray(array))
+
+            with open(staging / METADATA_FILE, 'w') as f:
+                json.dump({
+                    'created': time.time(),
+                    'channels': list(data['channels']),
+                    'metadata': data['metadata']
+                }, f)
+
+            try:
+                os.rename(staging, self.directory / key)
+            except OSError:
+                # Another request or worker stored the same key first
+                self._remove(staging)
+        except Exception:
+            self._remove(staging)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over budget"""
+        now = time.time()
+        entries = []
+
+        with self._lock:
+            for entry in self.directory.iterdir():
+                if entry.name.startswith('.') or not entry.is_dir():
+                    continue
+                try:
+                    accessed = (entry / METADATA_FILE).stat().st_mtime
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                except OSError:
+                    continue
+                entries.append((accessed, size, entry))
+
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+
+            for accessed, size, entry in entries:
+                if total <= self.max_bytes and now - accessed <= self.ttl_seconds:
+                    continue
+                self._remove(entry)
+                self.evictions += 1
+                total -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+        record_cache('tile', False)
+
+    def _remove(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+
+def make_cache_key(lat, lon, options=None, cell_size_km=None, pixels_per_km=None):
+    """Content key from quantized coordinates and extraction settings"""
+    gee_config = Config.GEE_CONFIG
+    decimals = Config.TILE_CACHE['coordinate_decimals']
+    cell_size_km, pixels_per_km = resolve_grid(cell_size_km, pixels_per_km)
+
+    key_fields = {
+        'lat': round(float(lat), decimals),
+        'lon': round(float(lon), decimals),
+        'cell_size_km': cell_size_km,
+        'pixels_per_km': pixels_per_km,
+        'sentinel2': gee_config['sentinel2'],
+        'dem': gee_config['dem']['collection'],
+        'options': options or {}
+    }
+
+    encoded = json.dumps(key_fields, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def extraction_cache_key(lat, lon, cell_size_km=None, pixels_per_km=None, indices=None,
+                         profile='full'):
+    """Cache key of one extract_gee_data result.
+
+    Every path that caches extractions builds its key here, so /download_gee,
+    /preview_gee and /gee_batch share entries for the same cell and options.
+    """
+    return make_cache_key(
+        lat, lon,
+        options={'indices': resolve_index_names(indices), 'profile': profile},
+        cell_size_km=cell_size_km,
+        pixels_per_km=pixels_per_km
+    )
+
+_tile_cache = None
+_tile_cache_lock = threading.Lock()
+
+def get_tile_cache():
+    """Return the process-wide tile cache, or None when disabled"""
+    global _tile_cache
+
+    settings = Config.TILE_CACHE
+    if not settings['enabled']:
+        return None
+
+    with _tile_cache_lock:
+        if _tile_cache is None:
+            _tile_cache = TileCache(
+                settings['directory'],
+                settings['max_bytes'],
+                settings['ttl_seconds']
+            )
+
+    return _tile_cache
+
+def cached_extract_gee_data(lat, lon, site_name="site", cell_size_km=None,
+                            pixels_per_km=None, report=None, indices=None, profile='full'):
+    """Read-through wrapper around extract_gee_data"""
+    extract_options = {
+        'cell_size_km': cell_size_km,
+        'pixels_per_km': pixels_per_km,
+        'report': report,
+        'indices': indices,
+        'profile': profile
+    }
+
+    cache = get_tile_cache()
+    if cache is None:
+        return extract_gee_data(lat, lon, site_name, **extract_options)
+
+    key = extraction_cache_key(lat, lon, cell_size_km, pixels_per_km, indices, profile)
+    data = cache.get(key)
+
+    if data is None:
+        data = extract_gee_data(lat, lon, site_name, **extract_options)
+        try:
+            cache.put(key, data)
+        except OSError as e:
+            print(f"WARNING: Could not write tile cache entry: {str(e)}")
+        return data
+
+    data['metadata'].update({
+        'site_name': site_name,
+        'latitude': lat,
+        'longitude': lon
+    })
+
+    return data
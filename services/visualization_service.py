@@ -1,24 +1,51 @@
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import tempfile
-import zipfile
-import os
-import json
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
 
-def create_overview_visualization(channels, site_name, output_path):
-    """Create 2x3 grid visualization of all channels"""
+from config import Config
+from utils.lazy_import import LazyModule
+from utils.metrics import record_cache, timed
+
+# Only needed for colormaps and the pyplot renderer, so not loaded at startup
+matplotlib = LazyModule('matplotlib', 'matplotlib')
+
+# (channel, title, colormap, vmin, vmax); None limits autoscale like imshow
+OVERVIEW_PANELS = [
+    ('RGB', 'RGB Composite (B4-B3-B2)', None, None, None),
+    ('NDVI', 'NDVI', 'RdYlGn', -0.5, 0.8),
+    ('NDWI', 'NDWI', 'Blues', -0.5, 0.5),
+    ('BSI', 'BSI', 'YlOrBr', -0.5, 0.5),
+    ('DEM', 'DEM (Elevation)', 'terrain', None, None),
+    ('Slope', 'Slope', 'plasma', None, None),
+]
+
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
+
+def normalize_rgb(channels):
+    """B4/B3/B2 stretched to the 2nd-98th percentile, as float in [0, 1]"""
+    rgb = np.stack([channels['B4'], channels['B3'], channels['B2']], axis=-1)
+    
+    p2, p98 = np.percentile(rgb, [2, 98])
+    return np.clip((rgb - p2) / (p98 - p2), 0, 1)
+
+def _import_pyplot():
+    """pyplot on the non-interactive Agg backend"""
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def _render_matplotlib(channels, site_name, output):
+    """Original pyplot renderer; output is a path or binary file object"""
+    plt = _import_pyplot()
     fig, axes = plt.subplots(2, 3, figsize=(15, 10))
     fig.suptitle(f'Site: {site_name}', fontsize=16)
     
-    r = channels['B4']
-    g = channels['B3']
-    b = channels['B2']
-    rgb = np.stack([r, g, b], axis=-1)
-    
-    p2, p98 = np.percentile(rgb, [2, 98])
-    rgb_norm = np.clip((rgb - p2) / (p98 - p2), 0, 1)
+    rgb_norm = normalize_rgb(channels)
     
     axes[0, 0].imshow(rgb_norm)
     axes[0, 0].set_title('RGB Composite (B4-B3-B2)')
@@ -55,42 +82,144 @@ def create_overview_visualization(channels, site_name, output_path):
     plt.colorbar(im5, ax=axes[1, 2], fraction=0.046)
     
     plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
-
-def package_data_as_zip(data, site_name, output_path):
-    """Package extracted data as a ZIP file"""
-    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for channel_name, array in data['channels'].items():
-            temp_npy = tempfile.NamedTemporaryFile(delete=False, suffix='.npy')
-            np.save(temp_npy.name, array)
-            temp_npy.close()
-            
-            zipf.write(temp_npy.name, 
-                      f"{site_name}/channels/{channel_name}.npy")
-            
-            os.unlink(temp_npy.name)
+    plt.savefig(output, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+
+@lru_cache(maxsize=None)
+def colormap_lut(name):
+    """256-entry uint8 RGB lookup table for a matplotlib colormap"""
+    cmap = matplotlib.colormaps[name]
+    return (cmap(np.linspace(0, 1, 256))[:, :3] * 255).round().astype(np.uint8)
+
+@lru_cache(maxsize=8)
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError, ImportError):
+        return ImageFont.load_default()
+
+def apply_colormap(array, name, vmin=None, vmax=None):
+    """Map a 2-D array to uint8 RGB through a colormap lookup table"""
+    if vmin is None:
+        vmin = float(np.nanmin(array))
+    if vmax is None:
+        vmax = float(np.nanmax(array))
+    
+    # Same 256-bin quantisation as matplotlib's Colormap
+    scale = 256.0 / (vmax - vmin) if vmax > vmin else 0.0
+    index = np.nan_to_num((array - vmin) * scale, nan=0.0)
+    np.clip(index, 0, 255, out=index)
+    
+    return colormap_lut(name)[index.astype(np.uint8)], vmin, vmax
+
+def _fit_panel(image, size):
+    """Scale a panel to fit size x size; nearest when enlarging, box when shrinking"""
+    scale = size / max(image.size)
+    target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    resample = Image.NEAREST if scale >= 1 else Image.BOX
+    return image.resize(target, resample)
+
+def _colorbar(name, height, vmin, vmax, font):
+    """Vertical colour bar with min/max labels"""
+    gradient = colormap_lut(name)[np.linspace(255, 0, height).astype(np.uint8)]
+    bar = np.repeat(gradient[:, None, :], 18, axis=1)
+    
+    canvas = Image.new('RGB', (80, height), 'white')
+    canvas.paste(Image.fromarray(bar), (0, 0))
+    draw = ImageDraw.Draw(canvas)
+    draw.text((22, 0), f"{vmax:.2f}", fill='black', font=font, anchor='la')
+    draw.text((22, height), f"{vmin:.2f}", fill='black', font=font, anchor='ld')
+    return canvas
+
+def _render_fast(channels, site_name, output):
+    """Pillow renderer: colour lookup tables and a tiled canvas, no pyplot"""
+    settings = Config.RENDER_CONFIG
+    panel_size = settings['panel_size']
+    margin = 20
+    title_height = 34
+    bar_width = 80
+    
+    title_font = _font(22)
+    label_font = _font(14)
+    
+    cell_width = panel_size + bar_width + margin
+    cell_height = panel_size + title_height + margin
+    header = 50
+    
+    canvas = Image.new(
+        'RGB',
+        (3 * cell_width + margin, 2 * cell_height + header + margin),
+        'white'
+    )
+    draw = ImageDraw.Draw(canvas)
+    draw.text((canvas.width // 2, 12), f'Site: {site_name}', fill='black',
+              font=_font(28), anchor='ma')
+    
+    for position, (channel, title, cmap, vmin, vmax) in enumerate(OVERVIEW_PANELS):
+        if channel == 'RGB':
+            pixels = (normalize_rgb(channels) * 255).round().astype(np.uint8)
+        else:
+            pixels, vmin, vmax = apply_colormap(channels[channel], cmap, vmin, vmax)
         
-        temp_png = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-        temp_png.close()
+        panel = _fit_panel(Image.fromarray(pixels), panel_size)
         
-        try:
-            create_overview_visualization(
-                data['channels'], 
-                site_name, 
-                temp_png.name
-            )
-            
-            zipf.write(temp_png.name, 
-                      f"{site_name}/visualizations/overview.png")
-            
-            os.unlink(temp_png.name)
-        except Exception as e:
-            print(f"ERROR: Failed to create visualization - {str(e)}")
-            try:
-                os.unlink(temp_png.name)
-            except:
-                pass
+        x = margin + (position % 3) * cell_width
+        y = header + (position // 3) * cell_height
+        
+        draw.text((x + panel.width // 2, y), title, fill='black', font=title_font, anchor='ma')
+        canvas.paste(panel, (x, y + title_height))
         
-        metadata_str = json.dumps(data['metadata'], indent=2)
-        zipf.writestr(f"{site_name}/metadata.json", metadata_str)
\ No newline at end of file
+        if cmap is not None:
+            canvas.paste(
+                _colorbar(cmap, panel.height, vmin, vmax, label_font),
+                (x + panel.width + 10, y + title_height)
+            )
+    
+    canvas.save(output, format='PNG', compress_level=settings['png_compress_level'])
+
+def _channel_stack_hash(channels, site_name, renderer):
+    digest = hashlib.sha256()
+    digest.update(f"{renderer}\0{site_name}\0{Config.RENDER_CONFIG['panel_size']}".encode('utf-8'))
+    
+    for name in ('B4', 'B3', 'B2', 'NDVI', 'NDWI', 'BSI', 'DEM', 'Slope'):
+        array = np.ascontiguousarray(channels[name])
+        digest.update(f"{name}{array.shape}{array.dtype}".encode('utf-8'))
+        digest.update(array.data)
+    
+    return digest.hexdigest()
+
+def render_overview_png(channels, site_name):
+    """Render the 2x3 overview panel to PNG bytes, reusing cached renders"""
+    renderer = Config.RENDER_CONFIG['renderer']
+    key = _channel_stack_hash(channels, site_name, renderer)
+    
+    with _render_cache_lock:
+        png = _render_cache.get(key)
+        if png is not None:
+            _render_cache.move_to_end(key)
+    
+    record_cache('render', png is not None)
+    if png is not None:
+        return png
+    
+    buffer = io.BytesIO()
+    with timed(f'render.{renderer}'):
+        if renderer == 'matplotlib':
+            _render_matplotlib(channels, site_name, buffer)
+        else:
+            _render_fast(channels, site_name, buffer)
+    png = buffer.getvalue()
+    
+    with _render_cache_lock:
+        _render_cache[key] = png
+        while len(_render_cache) > Config.RENDER_CONFIG['cache_entries']:
+            _render_cache.popitem(last=False)
+    
+    return png
+
+def create_overview_visualization(channels, site_name, output_path):
+    """Create 2x3 grid visualization of all channels"""
+    png = render_overview_png(channels, site_name)
+    
+    with open(output_path, 'wb') as f:
+        f.write(png)
@@ -29,7 +29,7 @@ async function previewGEEData(siteName, coordinatesRaw, lat, lon) {
     return result;
 }
 
-async function downloadGEEData(siteName, coordinatesRaw, lat, lon) {
+async function downloadGEEData(siteName, coordinatesRaw, lat, lon, format = 'npy') {
     const response = await fetch('/download_gee', {
         method: 'POST',
         headers: {
@@ -39,7 +39,8 @@ async function downloadGEEData(siteName, coordinatesRaw, lat, lon) {
             site_name: siteName,
             coordinates_raw: coordinatesRaw,
             latitude: lat,
-            longitude: lon
+            longitude: lon,
+            format: format
         })
     });
 
@@ -70,10 +71,10 @@ async function downloadGEEData(siteName, coordinatesRaw, lat, lon) {
     document.body.removeChild(a);
 }
 
-async function performAIAnalysis(siteIndex, siteName, coordinatesRaw, lat, lon) {
+async function performAIAnalysis(siteIndex, siteName, coordinatesRaw, lat, lon, onProgress) {
     const siteData = extractedData.sites[siteIndex];
     
-    const response = await fetch('/ai_analysis', {
+    const response = await fetch('/ai_analysis/jobs', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -86,11 +87,71 @@ async function performAIAnalysis(siteIndex, siteName, coordinatesRaw, lat, lon)
         })
     });
 
-    const result = await response.json();
+    const submission = await response.json();
 
-    if (!response.ok || result.error) {
-        throw new Error(result.error || 'AI analysis failed');
+    if (!response.ok || submission.error) {
+        throw new Error(submission.error || 'AI analysis failed');
     }
 
-    return result;
-}
\ No newline at end of file
+    const job = window.EventSource
+        ? await waitForJobEvents(submission.events_url, onProgress)
+        : await pollJobStatus(submission.status_url, onProgress);
+
+    if (job.status !== 'completed') {
+        throw new Error(job.error || 'AI analysis failed');
+    }
+
+    return { success: true, data: job.result };
+}
+
+function waitForJobEvents(eventsUrl, onProgress) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(eventsUrl);
+
+        source.addEventListener('stage', (e) => {
+            if (onProgress) {
+                onProgress(JSON.parse(e.data));
+            }
+        });
+
+        source.addEventListener('done', (e) => {
+            source.close();
+            resolve(JSON.parse(e.data));
+        });
+
+        source.addEventListener('error', (e) => {
+            source.close();
+            if (e.data) {
+                reject(new Error(JSON.parse(e.data).error));
+            } else {
+                // Connection dropped; fall back to polling the same job
+                pollJobStatus(eventsUrl.replace(/\/events$/, ''), onProgress)
+                    .then(resolve, reject);
+            }
+        });
+    });
+}
+
+async function pollJobStatus(statusUrl, onProgress, intervalMs = 2000) {
+    let seen = 0;
+
+    while (true) {
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+
+        if (!response.ok || (job.error && !job.status)) {
+            throw new Error(job.error || 'AI analysis failed');
+        }
+
+        if (onProgress) {
+            job.events.slice(seen).forEach(onProgress);
+        }
+        seen = job.events.length;
+
+        if (job.status === 'completed' || job.status === 'failed') {
+            return job;
+        }
+
+        await new Promise(r => setTimeout(r, intervalMs));
+    }
+}
@@ -67,7 +67,23 @@ async function handleAIAnalysis(siteIndex, siteName, coordinatesRaw, lat, lon, b
     buttonElement.textContent = '⏳ Analyzing...';
     
     try {
-        const result = await performAIAnalysis(siteIndex, siteName, coordinatesRaw, lat, lon);
+        const stageLabels = {
+            satellite_data: 'Extracting satellite imagery',
+            satellite_tiles: 'Fetching satellite tiles',
+            render: 'Rendering satellite panels',
+            visual_analysis: 'Analyzing imagery with Gemini Vision',
+            contextual_enrichment: 'Researching site context'
+        };
+        const onProgress = (event) => {
+            if (event.status !== 'running' && event.status !== 'progress') {
+                return;
+            }
+            const label = stageLabels[event.stage] || event.stage;
+            const count = event.total ? ` (${event.completed}/${event.total})` : '';
+            analysisContent.innerHTML = `<div class="ai-loading">⏳ ${label}${count}...</div>`;
+        };
+
+        const result = await performAIAnalysis(siteIndex, siteName, coordinatesRaw, lat, lon, onProgress);
 
         displayAIAnalysis(result.data, analysisContent);
 
@@ -0,0 +1,35 @@
+import importlib
+import threading
+
+class LazyModule:
+    """Stand-in for a heavy module that is only imported on first attribute access.
+
+    Lets services keep module-level names like ``ee`` or ``genai`` without
+    paying for the import until a request actually needs it.
+    """
+
+    def __init__(self, name, install_hint=None):
+        self._name = name
+        self._install_hint = install_hint
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                try:
+                    self._module = importlib.import_module(self._name)
+                except ImportError:
+                    if not self._install_hint:
+                        raise
+                    raise ImportError(
+                        f"{self._name} not installed. Run: pip install {self._install_hint}"
+                    )
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
@@ -0,0 +1,372 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from config import Config
+
+# Seconds; spans cache hits (ms) up to the slowest analysis branch
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                   30.0, 60.0, 120.0, 300.0)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._registry = registry
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    def _copy(self, value):
+        return value
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not self._registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._registry.mark_dirty()
+
+class Gauge(_Metric):
+    """Current value per process; /metrics sums live processes"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+        self._registry.mark_dirty()
+
+    def inc(self, amount=1, **labels):
+        if not self._registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._registry.mark_dirty()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class _Timer:
+    """Context manager, or decorator, observing elapsed seconds into a histogram"""
+
+    def __init__(self, histogram, labels):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start, **self._labels)
+        return False
+
+    def __call__(self, func):
+        # A fresh timer per call, so concurrent calls never share a start time
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(self._histogram, self._labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not self._registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+        self._registry.mark_dirty()
+
+    def time(self, **labels):
+        """Context manager / decorator that observes the elapsed seconds"""
+        return _Timer(self, labels)
+
+    def _copy(self, value):
+        return [list(value[0]), value[1]]
+
+class Registry:
+    """Process-local metrics, periodically written to a directory shared by
+    every worker so any one of them can report totals for the whole server.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._flusher_pid = None
+
+    @property
+    def enabled(self):
+        return Config.METRICS_CONFIG['enabled']
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(self, name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def mark_dirty(self):
+        """Note an update; a background thread writes it out within flush_seconds"""
+        self._dirty = True
+        # The pid check restarts the flusher in forked worker processes
+        if self._flusher_pid != os.getpid() and Config.METRICS_CONFIG['directory']:
+            self._start_flusher()
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(Config.METRICS_CONFIG['flush_seconds'])
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        """Write this process's values to <directory>/<pid>.json"""
+        directory = Config.METRICS_CONFIG['directory']
+        if not directory or not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._dirty = False
+            directory = Path(directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{os.getpid()}.json"
+            staging = path.with_suffix('.tmp')
+            staging.write_text(json.dumps(self.snapshot()))
+            os.replace(staging, path)
+        except OSError as e:
+            print(f"WARNING: Could not write metrics - {str(e)}")
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Values merged across every process that wrote to the directory.
+
+        Counters and histograms from exited workers are kept so totals never
+        go backwards; gauges only count processes that are still running.
+        """
+        self.flush()
+        directory = Config.METRICS_CONFIG['directory']
+        snapshots = {os.getpid(): self.snapshot()}
+
+        if directory and Path(directory).is_dir():
+            for path in Path(directory).glob('*.json'):
+                pid = int(path.stem) if path.stem.isdigit() else None
+                if pid is None or pid == os.getpid():
+                    continue
+                try:
+                    snapshots[pid] = json.loads(path.read_text())
+                except (OSError, ValueError):
+                    continue
+
+        merged = {}
+        for pid, snapshot in snapshots.items():
+            alive = pid == os.getpid() or _process_alive(pid)
+            for name, series in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                values = merged.setdefault(name, {})
+                for key, value in series:
+                    key = tuple(key)
+                    values[key] = _merge(metric.kind, values.get(key), value)
+
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        merged = self.collect()
+        lines = []
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            for key, value in sorted(merged.get(metric.name, {}).items()):
+                labels = dict(zip(metric.labelnames, key))
+                if metric.kind != 'histogram':
+                    lines.append(f"{metric.name}{_labels(labels)} {_number(value)}")
+                    continue
+
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip((*metric.buckets, float('inf')), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(
+                        f"{metric.name}_bucket{_labels(dict(labels, le=le))} {cumulative}"
+                    )
+                lines.append(f"{metric.name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{metric.name}_count{_labels(labels)} {cumulative}")
+
+        return '\n'.join(lines) + '\n'
+
+def _merge(kind, current, value):
+    if current is None:
+        return [list(value[0]), value[1]] if kind == 'histogram' else value
+    if kind == 'histogram':
+        return [[a + b for a, b in zip(current[0], value[0])], current[1] + value[1]]
+    return current + value
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def reset_metrics_directory():
+    """Remove files left by earlier server runs; call once before workers start"""
+    directory = Config.METRICS_CONFIG['directory']
+    if not directory or not Path(directory).is_dir():
+        return
+    for path in Path(directory).iterdir():
+        if path.suffix in ('.json', '.tmp'):
+            path.unlink(missing_ok=True)
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'geoflow_stage_seconds', 'Time spent in each pipeline stage', ['stage']
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'geoflow_http_request_seconds', 'HTTP request latency until the response starts',
+    ['endpoint', 'method', 'status']
+)
+GEE_REQUESTS = REGISTRY.counter(
+    'geoflow_gee_requests_total', 'Earth Engine getInfo round trips', ['outcome']
+)
+GEE_REQUEST_SECONDS = REGISTRY.histogram(
+    'geoflow_gee_request_seconds', 'Earth Engine getInfo round-trip latency'
+)
+GEE_RESPONSE_BYTES = REGISTRY.counter(
+    'geoflow_gee_response_bytes_total',
+    'Approximate JSON bytes received from Earth Engine (sampled band rows)'
+)
+LLM_REQUESTS = REGISTRY.counter(
+    'geoflow_llm_requests_total', 'Gemini generate_content calls', ['operation', 'outcome']
+)
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    'geoflow_llm_request_seconds', 'Gemini generate_content latency', ['operation']
+)
+LLM_TOKENS = REGISTRY.counter(
+    'geoflow_llm_tokens_total', 'Gemini tokens from response usage metadata',
+    ['operation', 'kind']
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'geoflow_cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result']
+)
+BACKEND_QUEUE_DEPTH = REGISTRY.gauge(
+    'geoflow_backend_queue_depth',
+    'Calls waiting for a rate-limit token or concurrency slot', ['backend']
+)
+BACKEND_IN_FLIGHT = REGISTRY.gauge(
+    'geoflow_backend_in_flight', 'Calls currently running against the backend', ['backend']
+)
+BACKEND_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    'geoflow_backend_concurrency_limit',
+    'Adaptive concurrency limit (summed over worker processes)', ['backend']
+)
+BACKEND_WAIT_SECONDS = REGISTRY.histogram(
+    'geoflow_backend_wait_seconds', 'Time a call spent queued before it started', ['backend']
+)
+BACKEND_THROTTLED = REGISTRY.counter(
+    'geoflow_backend_throttled_total',
+    'Quota errors (429, too many concurrent aggregations) by whether they were retried',
+    ['backend', 'outcome']
+)
+
+def timed(stage):
+    """Time a block or function into geoflow_stage_seconds{stage=...}"""
+    return STAGE_SECONDS.time(stage=stage)
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+# usage_metadata field -> token kind label
+_TOKEN_FIELDS = {
+    'prompt_token_count': 'prompt',
+    'candidates_token_count': 'output',
+    'thoughts_token_count': 'thinking',
+    'cached_content_token_count': 'cached',
+    'tool_use_prompt_token_count': 'tool_prompt'
+}
+
+def record_llm_usage(operation, response):
+    """Count the token usage Gemini reports on a response"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    for field, kind in _TOKEN_FIELDS.items():
+        count = getattr(usage, field, None)
+        if count:
+            LLM_TOKENS.inc(count, operation=operation, kind=kind)
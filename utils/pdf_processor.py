@@ -1,18 +1,232 @@
-def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF file"""
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import Config
+from utils.metrics import record_cache, timed
+
+def _import_pypdf():
     try:
         import pypdf
     except ImportError:
         raise ImportError("pypdf not installed. Run: pip install pypdf")
-    
-    text = ""
-    with open(pdf_path, 'rb') as file:
+    return pypdf
+
+@contextmanager
+def _opened(source):
+    """Binary file object for a path, bytes or file-like source.
+
+    Files opened here are closed afterwards; caller-owned streams are only
+    rewound.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            yield file
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    else:
+        source.seek(0)
+        yield source
+
+def hash_pdf(source):
+    """SHA-256 of the PDF bytes, used to key cached page text"""
+    digest = hashlib.sha256()
+    with _opened(source) as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class PageCache:
+    """SQLite store of extracted page text keyed by (file hash, page index)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            'file_hash TEXT PRIMARY KEY, num_pages INTEGER NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'file_hash TEXT NOT NULL, page_index INTEGER NOT NULL, text TEXT NOT NULL, '
+            'PRIMARY KEY (file_hash, page_index))'
+        )
+        self._conn.commit()
+
+    def get_document(self, file_hash):
+        """Return (num_pages, {page_index: text}) for what is cached"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT num_pages FROM documents WHERE file_hash = ?', (file_hash,)
+            ).fetchone()
+            pages = dict(self._conn.execute(
+                'SELECT page_index, text FROM pages WHERE file_hash = ?', (file_hash,)
+            ).fetchall())
+        return (row[0] if row else None), pages
+
+    def put_document(self, file_hash, num_pages):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO documents (file_hash, num_pages) VALUES (?, ?)',
+                (file_hash, num_pages)
+            )
+            self._conn.commit()
+
+    def put_pages(self, file_hash, pages):
+        """Store an iterable of (page_index, text) pairs"""
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO pages (file_hash, page_index, text) VALUES (?, ?, ?)',
+                [(file_hash, index, text) for index, text in pages]
+            )
+            self._conn.commit()
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+def get_page_cache():
+    """Return the process-wide page cache, or None when disabled"""
+    global _page_cache
+
+    path = Config.PDF_CONFIG['page_cache_path']
+    if not path:
+        return None
+
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache(path)
+
+    return _page_cache
+
+def _extract_page_range(source, start, stop):
+    """Process-pool worker: extract text for pages [start, stop)"""
+    pypdf = _import_pypdf()
+    with _opened(source) as file:
         reader = pypdf.PdfReader(file)
-        num_pages = len(reader.pages)
-        
-        for i, page in enumerate(reader.pages):
-            page_text = page.extract_text() or ""
-            text += f"\n--- Page {i+1} ---\n"
-            text += page_text
-    
-    return text
\ No newline at end of file
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def _get_process_pool():
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn: forking a multi-threaded server process is not safe
+            _process_pool = ProcessPoolExecutor(
+                max_workers=Config.PDF_CONFIG['workers'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+    return _process_pool
+
+def _iter_parsed_pages(source, reader, indices):
+    """Yield (page_index, text) for sorted indices, in parallel for big PDFs"""
+    settings = Config.PDF_CONFIG
+
+    if len(indices) < settings['parallel_min_pages'] or settings['workers'] < 2:
+        for i in indices:
+            yield i, reader.pages[i].extract_text() or ""
+        return
+
+    # Workers reopen the PDF themselves. Uploads are spilled to one temp
+    # file so each task pickles a path rather than the whole document
+    spilled = None
+    if not isinstance(source, (str, os.PathLike)):
+        with _opened(source) as file, tempfile.NamedTemporaryFile(
+            suffix='.pdf', delete=False
+        ) as spill:
+            shutil.copyfileobj(file, spill, 1024 * 1024)
+        source = spilled = spill.name
+
+    # One contiguous range per worker, so each parses the PDF only once
+    wanted = set(indices)
+    batch = max(1, -(-len(indices) // settings['workers']))
+    pool = _get_process_pool()
+    pending = []
+
+    try:
+        for offset in range(0, len(indices), batch):
+            start = indices[offset]
+            stop = indices[min(offset + batch, len(indices)) - 1] + 1
+            pending.append((start, pool.submit(_extract_page_range, source, start, stop)))
+
+        for start, future in pending:
+            for i, text in enumerate(future.result(), start):
+                if i in wanted:
+                    yield i, text
+    finally:
+        if spilled:
+            # Nothing may still be reading the file when it is removed
+            for _, future in pending:
+                future.cancel()
+            for _, future in pending:
+                if not future.cancelled():
+                    future.exception()
+            os.unlink(spilled)
+
+def iter_pdf_pages(source, file_hash=None):
+    """Yield (page_number, text) for each page as soon as it is available.
+
+    source can be a path, bytes or a binary file object. Page text is
+    cached by file hash and page index, so a PDF seen before is served
+    without parsing. Pass file_hash when the caller already computed it.
+    """
+    cache = get_page_cache()
+    if cache and file_hash is None:
+        file_hash = hash_pdf(source)
+    num_pages, cached = cache.get_document(file_hash) if cache else (None, {})
+
+    fully_cached = num_pages is not None and len(cached) == num_pages
+    if cache:
+        record_cache('pdf_pages', fully_cached)
+
+    if fully_cached:
+        for i in range(num_pages):
+            yield i + 1, cached[i]
+        return
+
+    pypdf = _import_pypdf()
+    fresh = []
+
+    try:
+        with _opened(source) as file:
+            reader = pypdf.PdfReader(file)
+            num_pages = len(reader.pages)
+            if cache:
+                cache.put_document(file_hash, num_pages)
+
+            missing = [i for i in range(num_pages) if i not in cached]
+            parsed = _iter_parsed_pages(source, reader, missing)
+
+            for i in range(num_pages):
+                if i in cached:
+                    text = cached[i]
+                else:
+                    _, text = next(parsed)
+                    fresh.append((i, text))
+                yield i + 1, text
+    finally:
+        # Also runs when the consumer stops early, keeping what was parsed
+        if cache and fresh:
+            cache.put_pages(file_hash, fresh)
+
+@timed('pdf.extract_text')
+def extract_text_from_pdf(pdf_path, file_hash=None):
+    """Extract text from PDF file (a path, bytes or binary stream)"""
+    return ''.join(
+        f"\n--- Page {number} ---\n{page_text}"
+        for number, page_text in iter_pdf_pages(pdf_path, file_hash)
+    )
@@ -0,0 +1,321 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import Config
+from utils.metrics import (
+    BACKEND_CONCURRENCY_LIMIT, BACKEND_IN_FLIGHT, BACKEND_QUEUE_DEPTH, BACKEND_THROTTLED,
+    BACKEND_WAIT_SECONDS
+)
+
+# Exact phrases meaning "slow down" rather than "broken", from Earth Engine
+# ("Too many concurrent aggregations") and Gemini ("429 RESOURCE_EXHAUSTED").
+# Bare status digits are not matched: they also occur in asset ids, pixel
+# counts and coordinates.
+QUOTA_ERROR_MARKERS = (
+    'too many concurrent aggregations',
+    'too many requests',
+    'resource_exhausted',
+    'quota exceeded',
+    'rate limit exceeded'
+)
+
+def is_quota_error(error):
+    """True for errors that ask the caller to back off and retry"""
+    for attribute in ('code', 'status_code'):
+        if getattr(error, attribute, None) == 429:
+            return True
+    if str(getattr(error, 'status', '')).upper() == 'RESOURCE_EXHAUSTED':
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in QUOTA_ERROR_MARKERS)
+
+def backoff_delay(attempt, base_seconds, max_seconds):
+    """Jittered exponential backoff for the given retry attempt (0-based)"""
+    return min(max_seconds, base_seconds * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by threads and event loops.
+
+    Each call reserves a token up front and then sleeps until it is due,
+    so waiting callers are served in arrival order. A rate of 0 disables
+    limiting.
+    """
+
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate = rate_per_second
+        self.capacity = capacity or max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """Take tokens and return how many seconds to wait before using them"""
+        if not self.rate:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket whose balance lives in SQLite, so every worker process
+    draws from one budget. Without a path it is a per-process bucket.
+    """
+
+    def __init__(self, name, rate_per_second, capacity=None, path=None):
+        super().__init__(rate_per_second, capacity)
+        self.name = name
+        self.path = path
+        self._conn = None
+        self._conn_pid = None
+
+    def _connection(self):
+        # A connection inherited across fork must not be reused
+        if self._conn is None or self._conn_pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS token_buckets ('
+                'name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def reserve(self, tokens=1):
+        if not self.rate or not self.path:
+            return super().reserve(tokens)
+
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    row = conn.execute(
+                        'SELECT tokens, updated FROM token_buckets WHERE name = ?', (self.name,)
+                    ).fetchone()
+                    # Wall-clock time, since monotonic clocks are not comparable
+                    # between processes on every platform
+                    now = time.time()
+                    if row is None:
+                        available = self.capacity
+                    else:
+                        available = min(self.capacity, row[0] + (now - row[1]) * self.rate)
+                    available -= tokens
+                    conn.execute(
+                        'INSERT OR REPLACE INTO token_buckets (name, tokens, updated) '
+                        'VALUES (?, ?, ?)', (self.name, available, now)
+                    )
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error as e:
+            print(f"WARNING: Shared rate limit {self.name} unavailable, "
+                  f"limiting per process - {str(e)}")
+            self.path = None
+            return super().reserve(tokens)
+
+        return 0.0 if available >= 0 else -available / self.rate
+
+    async def acquire_async(self, tokens=1):
+        # The shared reserve can wait on another process's SQLite lock, so it
+        # runs off the event loop; only the in-memory bucket runs inline
+        if self.rate and self.path:
+            delay = await asyncio.to_thread(self.reserve, tokens)
+        else:
+            delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+class AdaptiveConcurrencyLimit:
+    """AIMD concurrency limit.
+
+    Each successful call grows the limit by 1/limit (about one slot per
+    limit's worth of calls); a quota error multiplies it by decrease. Only
+    calls that started after the last decrease can shrink it again, so one
+    overload that rejects a whole burst halves the limit once.
+    """
+
+    def __init__(self, maximum, minimum=1, decrease=0.5, poll_seconds=0.01):
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.decrease = decrease
+        self.poll_seconds = poll_seconds
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._epoch = 0
+        self._condition = threading.Condition()
+
+    def _available(self):
+        return self.in_flight < max(int(self.limit), self.minimum)
+
+    def try_acquire(self):
+        """Take a slot if one is free; returns the slot's epoch or None"""
+        with self._condition:
+            if not self._available():
+                return None
+            self.in_flight += 1
+            return self._epoch
+
+    def acquire(self):
+        """Block until a slot is free; returns the epoch to pass to release()"""
+        with self._condition:
+            self._condition.wait_for(self._available)
+            self.in_flight += 1
+            return self._epoch
+
+    async def acquire_async(self):
+        # Polls rather than blocking the event loop on the condition
+        while True:
+            epoch = self.try_acquire()
+            if epoch is not None:
+                return epoch
+            await asyncio.sleep(self.poll_seconds)
+
+    def release(self, epoch, outcome):
+        """Free a slot; outcome is 'ok', 'throttled' or 'error' (no change)"""
+        with self._condition:
+            self.in_flight -= 1
+            if outcome == 'ok':
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif outcome == 'throttled' and epoch == self._epoch:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._epoch += 1
+            self._condition.notify_all()
+
+class Throttle:
+    """Rate limit, adaptive concurrency and quota retries for one backend.
+
+    Every attempt takes a token from the rate bucket, then a slot from the
+    concurrency limit. Quota errors shrink the limit and are retried with
+    jittered exponential backoff; other errors are raised at once.
+    """
+
+    def __init__(self, backend, rate, concurrency, max_retries, backoff_seconds,
+                 max_backoff_seconds):
+        self.backend = backend
+        self.rate = rate
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+    def _queued(self, waiting):
+        BACKEND_QUEUE_DEPTH.inc(1 if waiting else -1, backend=self.backend)
+
+    def _started(self, queued_at):
+        BACKEND_WAIT_SECONDS.observe(time.perf_counter() - queued_at, backend=self.backend)
+        BACKEND_IN_FLIGHT.inc(backend=self.backend)
+
+    def _finished(self, epoch, outcome):
+        self.concurrency.release(epoch, outcome)
+        BACKEND_IN_FLIGHT.dec(backend=self.backend)
+        BACKEND_CONCURRENCY_LIMIT.set(round(self.concurrency.limit, 2), backend=self.backend)
+
+    def _should_retry(self, error, attempt):
+        if not is_quota_error(error):
+            return False
+        retry = attempt < self.max_retries
+        BACKEND_THROTTLED.inc(backend=self.backend, outcome='retried' if retry else 'failed')
+        return retry
+
+    def _delay(self, attempt):
+        return backoff_delay(attempt, self.backoff_seconds, self.max_backoff_seconds)
+
+    def call(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) within the backend's limits"""
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter()
+            self._queued(True)
+            try:
+                self.rate.acquire()
+                epoch = self.concurrency.acquire()
+            finally:
+                self._queued(False)
+            self._started(queued_at)
+
+            outcome = 'error'
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'ok'
+                return result
+            except Exception as e:
+                if is_quota_error(e):
+                    outcome = 'throttled'
+                if not self._should_retry(e, attempt):
+                    raise
+            finally:
+                self._finished(epoch, outcome)
+
+            time.sleep(self._delay(attempt))
+            attempt += 1
+
+    async def call_async(self, func, *args, **kwargs):
+        """Async variant of call(); func returns an awaitable"""
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter()
+            self._queued(True)
+            try:
+                await self.rate.acquire_async()
+                epoch = await self.concurrency.acquire_async()
+            finally:
+                self._queued(False)
+            self._started(queued_at)
+
+            outcome = 'error'
+            try:
+                result = await func(*args, **kwargs)
+                outcome = 'ok'
+                return result
+            except Exception as e:
+                if is_quota_error(e):
+                    outcome = 'throttled'
+                if not self._should_retry(e, attempt):
+                    raise
+            finally:
+                self._finished(epoch, outcome)
+
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+def make_throttle(backend, rate_per_second, settings):
+    """Throttle from a backend's config dict (max/min_concurrent_requests,
+    max_retries, backoff_seconds, max_backoff_seconds)"""
+    return Throttle(
+        backend,
+        SharedTokenBucket(
+            backend, rate_per_second, path=Config.RATE_LIMIT_CONFIG['state_path'] or None
+        ),
+        AdaptiveConcurrencyLimit(
+            settings['max_concurrent_requests'], settings.get('min_concurrent_requests', 1)
+        ),
+        settings['max_retries'],
+        settings['backoff_seconds'],
+        settings['max_backoff_seconds']
+    )
@@ -0,0 +1,88 @@
+def _normalize(value):
+    if not isinstance(value, str):
+        return None
+    normalized = ' '.join(value.lower().split())
+    return normalized or None
+
+def _site_names(site):
+    names = {_normalize(site.get('site_name'))}
+    names.update(_normalize(name) for name in site.get('alternative_names') or [])
+    names.discard(None)
+    return names
+
+def _site_coordinates(site):
+    coords = site.get('coordinates') or {}
+    lat = coords.get('latitude')
+    lon = coords.get('longitude')
+    
+    if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+        return round(lat, 4), round(lon, 4)
+    
+    return _normalize(coords.get('raw_text'))
+
+def is_same_site(a, b):
+    """Match sites by site code, any shared name, or identical coordinates"""
+    code_a = _normalize(a.get('site_code'))
+    code_b = _normalize(b.get('site_code'))
+    if code_a and code_b:
+        return code_a == code_b
+    
+    if _site_names(a) & _site_names(b):
+        return True
+    
+    coords_a = _site_coordinates(a)
+    return coords_a is not None and coords_a == _site_coordinates(b)
+
+def _is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+def fill_missing(target, source):
+    """Fill empty fields of target from source, recursing into dicts"""
+    for key, value in source.items():
+        current = target.get(key)
+        
+        if _is_empty(current):
+            target[key] = value
+        elif isinstance(current, dict) and isinstance(value, dict):
+            fill_missing(current, value)
+        elif isinstance(current, list) and isinstance(value, list):
+            current.extend(item for item in value if item not in current)
+    
+    return target
+
+def merge_sites(site_lists):
+    """Merge per-chunk site lists, deduplicating repeated sites.
+
+    Each site's metadata.source_pages lists every page it was found on.
+    """
+    merged = []
+    
+    for sites in site_lists:
+        for site in sites:
+            pages = site.get('metadata', {}).get('source_pages', [])
+            match = next((existing for existing in merged if is_same_site(existing, site)), None)
+            
+            if match is None:
+                merged.append(site)
+                continue
+            
+            fill_missing(match, site)
+            match_meta = match.setdefault('metadata', {})
+            match_meta['source_pages'] = sorted(
+                set(match_meta.get('source_pages', [])) | set(pages)
+            )
+    
+    return merged
+
+def summarize_sites(sites):
+    """Recompute the extraction_summary counts for a merged site list"""
+    with_coordinates = sum(
+        1 for site in sites
+        if (site.get('coordinates') or {}).get('has_explicit_coordinates')
+    )
+    
+    return {
+        'total_sites_found': len(sites),
+        'sites_with_explicit_coordinates': with_coordinates,
+        'sites_with_descriptions_only': len(sites) - with_coordinates
+    }
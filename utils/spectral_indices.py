@@ -0,0 +1,132 @@
+import numpy as np
+
+# Sentinel-2 surface reflectance is stored as reflectance * 10000
+REFLECTANCE_SCALE = 10000
+
+SPECTRAL_INDICES = {}
+
+def register_index(name, numerator, denominator, numerator_offset=0.0,
+                   denominator_offset=0.0, gain=1.0, description=''):
+    """Register an index of the form gain * (n . bands + n0) / (d . bands + d0).
+
+    numerator and denominator map band names to coefficients. Offsets are
+    in reflectance units (0-1) and are rescaled to the stored band values,
+    so bands never need a separate scaling pass.
+    """
+    SPECTRAL_INDICES[name] = {
+        'numerator': dict(numerator),
+        'denominator': dict(denominator),
+        'numerator_offset': numerator_offset,
+        'denominator_offset': denominator_offset,
+        'gain': gain,
+        'description': description
+    }
+
+def register_normalized_difference(name, positive, negative, description=''):
+    """Register (sum(positive) - sum(negative)) / (sum(positive) + sum(negative))"""
+    numerator = {band: 1.0 for band in positive}
+    numerator.update({band: -1.0 for band in negative})
+    denominator = {band: 1.0 for band in (*positive, *negative)}
+    register_index(name, numerator, denominator, description=description)
+
+register_normalized_difference('NDVI', ['B8'], ['B4'], 'Vegetation')
+register_normalized_difference('NDWI', ['B3'], ['B8'], 'Open water (McFeeters)')
+register_normalized_difference('BSI', ['B11', 'B4'], ['B8', 'B2'], 'Bare soil')
+register_normalized_difference('NDMI', ['B8'], ['B11'], 'Vegetation moisture')
+register_normalized_difference('NBR', ['B8'], ['B12'], 'Burn severity')
+register_index('SAVI', {'B8': 1.0, 'B4': -1.0}, {'B8': 1.0, 'B4': 1.0},
+               denominator_offset=0.5, gain=1.5,
+               description='Soil-adjusted vegetation (L = 0.5)')
+register_index('EVI', {'B8': 1.0, 'B4': -1.0}, {'B8': 1.0, 'B4': 6.0, 'B2': -7.5},
+               denominator_offset=1.0, gain=2.5,
+               description='Enhanced vegetation')
+
+def resolve_indices(names):
+    """Validate requested index names, keeping order and dropping duplicates"""
+    unknown = [name for name in names if name not in SPECTRAL_INDICES]
+    if unknown:
+        raise ValueError(
+            f"Unknown indices: {', '.join(map(str, unknown))}. "
+            f"Available: {', '.join(SPECTRAL_INDICES)}"
+        )
+    return list(dict.fromkeys(names))
+
+def required_bands(names):
+    """Bands the given indices read, in first-use order"""
+    bands = {}
+    for name in names:
+        spec = SPECTRAL_INDICES[name]
+        bands.update(dict.fromkeys(spec['numerator']))
+        bands.update(dict.fromkeys(spec['denominator']))
+    return list(bands)
+
+def _linear_combination(bands, coefficients, offset, out, scratch):
+    """out = sum(coefficient * band) + offset without per-term temporaries"""
+    terms = iter(coefficients.items())
+    band, coefficient = next(terms)
+    if coefficient == 1:
+        np.copyto(out, bands[band])
+    else:
+        np.multiply(bands[band], coefficient, out=out)
+
+    for band, coefficient in terms:
+        if coefficient == 1:
+            np.add(out, bands[band], out=out)
+        elif coefficient == -1:
+            np.subtract(out, bands[band], out=out)
+        else:
+            np.multiply(bands[band], coefficient, out=scratch)
+            np.add(out, scratch, out=out)
+
+    if offset:
+        np.add(out, offset, out=out)
+
+def compute_indices(bands, names, reflectance_scale=REFLECTANCE_SCALE):
+    """Compute the named indices from a band dict as float32 arrays.
+
+    The numerator is built directly in each result array and divided in
+    place; the denominator, coefficient products and zero mask reuse
+    buffers allocated once per call. Pixels with a zero denominator come
+    out as 0, as before.
+    """
+    names = resolve_indices(names)
+    if not names:
+        return {}
+
+    needed = required_bands(names)
+    bands = {band: np.asarray(bands[band], dtype=np.float32) for band in needed}
+    shape = bands[needed[0]].shape
+
+    # Only weighted terms after the first need a buffer for their product
+    weighted = any(
+        abs(coefficient) != 1
+        for name in names
+        for part in ('numerator', 'denominator')
+        for coefficient in list(SPECTRAL_INDICES[name][part].values())[1:]
+    )
+
+    denominator = np.empty(shape, dtype=np.float32)
+    scratch = np.empty(shape, dtype=np.float32) if weighted else None
+    zero = np.empty(shape, dtype=bool)
+
+    results = {}
+    for name in names:
+        spec = SPECTRAL_INDICES[name]
+        result = np.empty(shape, dtype=np.float32)
+
+        _linear_combination(bands, spec['numerator'],
+                            spec['numerator_offset'] * reflectance_scale, result, scratch)
+        _linear_combination(bands, spec['denominator'],
+                            spec['denominator_offset'] * reflectance_scale, denominator, scratch)
+
+        # x / inf == 0, which avoids a masked divide and a fill pass
+        np.equal(denominator, 0, out=zero)
+        np.copyto(denominator, np.inf, where=zero)
+
+        np.divide(result, denominator, out=result)
+        if spec['gain'] != 1:
+            np.multiply(result, spec['gain'], out=result)
+
+        results[name] = result
+
+    return results
@@ -0,0 +1,47 @@
+import re
+
+PAGE_MARKER = re.compile(r'\n--- Page (\d+) ---\n')
+
+def split_pages(text):
+    """Split extract_text_from_pdf output into (page_number, page_text) pairs"""
+    parts = PAGE_MARKER.split(text)
+    
+    if len(parts) == 1:
+        return [(1, text)]
+    
+    pages = []
+    if parts[0].strip():
+        pages.append((0, parts[0]))
+    
+    for i in range(1, len(parts), 2):
+        pages.append((int(parts[i]), parts[i + 1]))
+    
+    return pages
+
+def join_pages(pages):
+    """Rebuild marked-up text from (page_number, page_text) pairs"""
+    return ''.join(f"\n--- Page {number} ---\n{page_text}" for number, page_text in pages)
+
+def build_page_windows(pages, window_chars, overlap_pages):
+    """Group pages into windows of roughly window_chars characters.
+
+    Consecutive windows share overlap_pages pages so sites described across
+    a page break are seen whole by at least one window.
+    """
+    windows = []
+    start = 0
+    
+    while start < len(pages):
+        end = start
+        size = 0
+        while end < len(pages) and (end == start or size + len(pages[end][1]) <= window_chars):
+            size += len(pages[end][1])
+            end += 1
+        
+        windows.append(pages[start:end])
+        
+        if end >= len(pages):
+            break
+        start = max(end - overlap_pages, start + 1)
+    
+    return windows